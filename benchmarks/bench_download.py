@@ -0,0 +1,97 @@
+# File Name : benchmarks/bench_download.py
+"""
+Worker baru menarik dataset: download ZIP utuh ke disk lalu extractall (mode lama, shard satu
+per satu) vs vast_tools.download_and_extract (ekstrak selagi byte datang, shard paralel),
+melawan FakeHfServer dengan batas kecepatan per koneksi. Juga filter --include dan upload
+incremental (manifest). Hasil ekstrak dibandingkan dengan folder sumber.
+
+    python benchmarks/bench_download.py --images 5000 --size-kb 48 --rate-mb 40
+"""
+import argparse
+import filecmp
+import os
+import shutil
+import sys
+import tempfile
+import time
+import urllib.request
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import vast_tools  # noqa: E402
+from bench_zip import make_folder  # noqa: E402
+from fake_hf_server import FakeHfServer  # noqa: E402
+from fake_upload_target import FakeUploadTarget  # noqa: E402
+
+
+def same_tree(a, b, names=None):
+    """True jika semua file (atau `names`) di a ada dan identik di b."""
+    if names is None:
+        names = [os.path.relpath(os.path.join(r, f), a) for r, _, files in os.walk(a) for f in files]
+    match, mismatch, errors = filecmp.cmpfiles(a, b, names, shallow=False)
+    return not mismatch and not errors and len(match) == len(names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark download + extract")
+    parser.add_argument("--images", type=int, default=5000)
+    parser.add_argument("--size-kb", type=int, default=48)
+    parser.add_argument("--shard-mb", type=float, default=32)
+    parser.add_argument("--rate-mb", type=float, default=40, help="batas MB/s per koneksi")
+    parser.add_argument("--parallel", type=int, default=4)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_download_")
+    src = os.path.join(workdir, "dataset")
+    make_folder(src, args.images, args.size_kb)
+    target = FakeUploadTarget(os.path.join(workdir, "repo"))
+    stats = vast_tools.upload_sharded(src, target, args.shard_mb, 2)
+    name = target.uploads[-1][0].split("/")[0]
+    vast_tools.upload_incremental(src, target)
+    try:
+        with FakeHfServer(target.root, rate_mb=args.rate_mb) as server:
+            source = vast_tools.RepoSource("user/repo", endpoint=server.endpoint)
+            print(f"\n{stats['shards']} shard, {stats['uploaded_bytes'] / 1e6:.0f} MB, "
+                  f"{args.rate_mb:.0f} MB/s per koneksi")
+
+            # ----- mode lama: tiap shard didownload utuh ke disk, lalu extractall -----
+            dest = os.path.join(workdir, "old")
+            t0 = time.perf_counter()
+            for i in range(stats["shards"]):
+                zip_path = os.path.join(workdir, "tmp.zip")
+                urllib.request.urlretrieve(source.url(f"{name}/part_{i:05d}.zip"), zip_path)
+                with zipfile.ZipFile(zip_path) as zf:
+                    zf.extractall(dest)
+                os.remove(zip_path)
+            old_s = time.perf_counter() - t0
+            print(f"download lalu unzip : {old_s:5.1f}s {'OK' if same_tree(src, dest) else 'BEDA'}")
+
+            # ----- streaming, shard paralel -----
+            dest = os.path.join(workdir, "stream")
+            t0 = time.perf_counter()
+            vast_tools.download_and_extract(source, name, dest, parallel=args.parallel)
+            new_s = time.perf_counter() - t0
+            print(f"streaming paralel   : {new_s:5.1f}s {'OK' if same_tree(src, dest) else 'BEDA'}, "
+                  f"speedup {old_s / new_s:.1f}x")
+
+            # ----- include: hanya satu folder karakter -----
+            dest = os.path.join(workdir, "include")
+            before = server.sent
+            totals = vast_tools.download_and_extract(source, name, dest, include=["char_001/*.png"])
+            wanted = [os.path.join("char_001", f) for f in os.listdir(os.path.join(src, "char_001")) if f.endswith(".png")]
+            print(f"include char_001/*.png: {totals['files']} file, {totals['archives']} shard, "
+                  f"{(server.sent - before) / 1e6:.0f} MB didownload "
+                  f"{'OK' if same_tree(src, dest, wanted) and totals['files'] == len(wanted) else 'BEDA'}")
+
+            # ----- folder upload incremental (manifest + delta) -----
+            dest = os.path.join(workdir, "incremental")
+            vast_tools.download_and_extract(source, "dataset", dest)
+            print(f"incremental         : {'OK' if same_tree(src, dest) else 'BEDA'}")
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
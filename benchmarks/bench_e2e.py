@@ -0,0 +1,162 @@
+# File Name : benchmarks/bench_e2e.py
+"""
+Benchmark end-to-end worker: loop start() -> start_generate_sd()/start_generate_hd() yang asli
+dijalankan melawan FakeComfyUI + FakeJobServer (tanpa GPU, tanpa jaringan).
+Tiap skenario jalan di proses terpisah supaya RSS/thread tidak saling tercampur.
+
+Output JSON (jobs/s, fraksi GPU idle, p50/p99 per fase, peak RSS, peak thread) untuk dibandingkan
+antar commit:
+
+    python benchmarks/bench_e2e.py --jobs 200 --delay 0.02 --json results.json
+    python benchmarks/bench_e2e.py --mode hd --output-mode ws --compare results.json --tolerance 0.1
+    python benchmarks/bench_e2e.py --mode sd --gpus 2   # ComfyPool, satu FakeComfyUI per "GPU"
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_scenario(mode, jobs, delay, size, depth, batch, output_mode, gpus=1, verbose=False):
+    """Jalankan satu skenario di proses ini, return dict hasil."""
+    os.environ.pop("VAST_CONTAINERLABEL", None)  # jangan sampai destroy_instance jalan
+    workdir = tempfile.mkdtemp(prefix=f"bench_e2e_{mode}_")
+    os.chdir(workdir)
+
+    import client
+    from fake_comfyui import FakeComfyUI
+    from fake_job_server import FakeJobServer
+
+    # HD: workflow menghasilkan 2 gambar (SD + HD), SD: 1 gambar
+    sizes = [(size, size), (size * 2, size * 2)] if mode == "hd" else [(size, size)]
+    peak_threads = [threading.active_count()]
+    sampling = threading.Event()
+
+    def sample_threads():
+        while not sampling.wait(0.01):
+            peak_threads[0] = max(peak_threads[0], threading.active_count())
+
+    fakes = [FakeComfyUI(exec_delay=delay, image_sizes=sizes, ws_images=output_mode == "ws").start()
+             for _ in range(gpus)]
+    with contextlib.ExitStack() as stack, FakeJobServer(jobs=jobs, mode=mode) as server:
+        for fake in fakes:
+            stack.callback(fake.stop)
+        client.COMFYUI_SERVERS = [fake.address for fake in fakes]
+        client.COMFYUI_SERVER = fakes[0].address
+        client.HOST_MY_PC_LOCAL = server.host
+        client.script_path = workdir
+        client.PIPELINE_DEPTH = depth
+        client.JOB_BATCH = batch
+        client.OUTPUT_MODE = output_mode
+        client.METRICS = client.WorkerMetrics()
+        client.IDLE_GRACE_S = 0  # job habis = selesai, jangan tunggu job baru
+
+        sampler = threading.Thread(target=sample_threads, daemon=True)
+        sampler.start()
+        out = sys.stderr if verbose else io.StringIO()  # stdout child hanya untuk JSON hasil
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(out):
+            client.start()
+        elapsed = time.perf_counter() - t0
+        sampling.set()
+        sampler.join()
+        busy = sum(fake.stats["busy_s"] for fake in fakes) / gpus
+        done = len(server.done)
+        snapshot = client.METRICS.snapshot()
+
+    return {
+        "scenario": f"{mode}-{output_mode}" + (f"-{gpus}gpu" if gpus > 1 else ""),
+        "params": {"jobs": jobs, "delay_s": delay, "image_size": size, "depth": depth, "batch": batch,
+                   "gpus": gpus},
+        "prompts_per_gpu": [fake.stats["prompt"] for fake in fakes],
+        "jobs_done": done,
+        "elapsed_s": round(elapsed, 3),
+        "jobs_per_s": round(done / elapsed, 3),
+        "gpu_busy_s": round(busy, 3),
+        "gpu_idle_fraction": round(max(0.0, 1 - busy / elapsed), 4),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "peak_threads": peak_threads[0],
+        "phases_ms": {phase: {"count": st["count"], "p50": round(st["p50"] * 1000, 2),
+                              "p99": round(st["p99"] * 1000, 2)}
+                      for phase, st in sorted(snapshot["phases"].items())},
+        "counters": snapshot["counters"],
+    }
+
+
+def run_child(args, mode):
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", "--mode", mode,
+           "--jobs", str(args.jobs), "--delay", str(args.delay), "--size", str(args.size),
+           "--depth", str(args.depth), "--batch", str(args.batch), "--output-mode", args.output_mode,
+           "--gpus", str(args.gpus)]
+    if args.verbose:
+        cmd.append("--verbose")
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def compare(results, baseline_path, tolerance):
+    """Return True jika tidak ada regresi jobs/s lebih dari `tolerance` dibanding baseline."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {r["scenario"]: r for r in json.load(f)["results"]}
+    ok = True
+    for result in results:
+        base = baseline.get(result["scenario"])
+        if base is None:
+            continue
+        ratio = result["jobs_per_s"] / max(base["jobs_per_s"], 1e-9)
+        regressed = ratio < 1 - tolerance
+        ok &= not regressed
+        print(f"{result['scenario']:10s}: {base['jobs_per_s']:.2f} -> {result['jobs_per_s']:.2f} job/s "
+              f"({(ratio - 1) * 100:+.1f}%){'  REGRESI' if regressed else ''}", file=sys.stderr)
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark end-to-end worker")
+    parser.add_argument("--mode", choices=["sd", "hd", "both"], default="both")
+    parser.add_argument("--jobs", type=int, default=100)
+    parser.add_argument("--delay", type=float, default=0.02, help="waktu eksekusi palsu per prompt (detik)")
+    parser.add_argument("--size", type=int, default=512, help="sisi gambar SD (HD = 2x)")
+    parser.add_argument("--depth", type=int, default=2, help="PIPELINE_DEPTH")
+    parser.add_argument("--batch", type=int, default=4, help="JOB_BATCH")
+    parser.add_argument("--output-mode", choices=["http", "ws"], default="http")
+    parser.add_argument("--gpus", type=int, default=1, help="jumlah FakeComfyUI (satu per GPU)")
+    parser.add_argument("--json", help="tulis hasil ke file ini")
+    parser.add_argument("--compare", help="file JSON baseline; exit 1 jika jobs/s turun > tolerance")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    parser.add_argument("--verbose", action="store_true", help="tampilkan log worker")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        result = run_scenario(args.mode, args.jobs, args.delay, args.size, args.depth, args.batch,
+                              args.output_mode, gpus=args.gpus, verbose=args.verbose)
+        sys.stdout.flush()
+        print(json.dumps(result))
+        return
+
+    modes = ["sd", "hd"] if args.mode == "both" else [args.mode]
+    results = [run_child(args, mode) for mode in modes]
+    report = {"python": sys.version.split()[0], "results": results}
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    if args.compare and not compare(results, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
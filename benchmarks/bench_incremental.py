@@ -0,0 +1,90 @@
+# File Name : benchmarks/bench_incremental.py
+"""
+Upload folder dataset yang terus bertambah: zip + upload penuh tiap run (mode lama) vs
+vast_tools.upload_incremental (delta + manifest), melawan FakeUploadTarget. Setelah tiap run
+isi repo di-replay (manifest + delta) dan dibandingkan dengan folder sumber.
+
+    python benchmarks/bench_incremental.py --images 5000 --size-kb 48 --change 50
+"""
+import argparse
+import filecmp
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import vast_tools  # noqa: E402
+from bench_zip import make_folder  # noqa: E402
+from fake_upload_target import FakeUploadTarget  # noqa: E402
+
+
+def restore(target, prefix, dest):
+    """Rekonstruksi folder dari repo: ambil versi terakhir tiap file dari archive di manifest."""
+    with open(target._path(f"{prefix}/{vast_tools.MANIFEST_NAME}"), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    by_archive = {}
+    for name, entry in manifest["files"].items():
+        by_archive.setdefault(entry["archive"], []).append(name)
+    for archive, names in by_archive.items():
+        with zipfile.ZipFile(target._path(f"{prefix}/{archive}")) as zf:
+            zf.extractall(dest, members=names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark upload incremental")
+    parser.add_argument("--images", type=int, default=5000)
+    parser.add_argument("--size-kb", type=int, default=48)
+    parser.add_argument("--change", type=int, default=50, help="file baru + berubah per run")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_incremental_")
+    src = os.path.join(workdir, "dataset")
+    make_folder(src, args.images, args.size_kb)
+    target = FakeUploadTarget(os.path.join(workdir, "repo"))
+    full_zip = os.path.join(workdir, "full")
+    try:
+        for run in range(3):
+            if run == 1:
+                # file baru + sebagian file lama ditimpa
+                extra = os.path.join(src, "char_new")
+                os.makedirs(extra, exist_ok=True)
+                for i in range(args.change // 2):
+                    with open(os.path.join(extra, f"new_{i}.png"), "wb") as f:
+                        f.write(os.urandom(args.size_kb * 1024))
+                for i in range(args.change - args.change // 2):
+                    with open(os.path.join(src, "char_000", f"{i:06d}.json"), "w", encoding="utf-8") as f:
+                        f.write(json.dumps({"edited": i}))
+
+            t0 = time.perf_counter()
+            path = shutil.make_archive(full_zip, "zip", root_dir=src)
+            full_s, full_mb = time.perf_counter() - t0, os.path.getsize(path) / 1e6
+            os.remove(path)
+
+            before = target.uploaded_bytes()
+            t0 = time.perf_counter()
+            stats = vast_tools.upload_incremental(src, target)
+            inc_s = time.perf_counter() - t0
+            inc_mb = (target.uploaded_bytes() - before) / 1e6
+
+            restored = os.path.join(workdir, f"restored_{run}")
+            restore(target, "dataset", restored)
+            cmp = filecmp.dircmp(src, restored)
+            same = not (cmp.left_only or cmp.right_only or cmp.diff_files) and all(
+                not (c.left_only or c.right_only or c.diff_files) for c in cmp.subdirs.values())
+            shutil.rmtree(restored)
+            label = ["awal", "berubah", "tanpa perubahan"][run]
+            print(f"run {run + 1} ({label:15s}): penuh {full_s:5.1f}s {full_mb:7.1f} MB | incremental "
+                  f"{inc_s:5.1f}s {inc_mb:7.1f} MB {'dilewati' if stats is None else ''} "
+                  f"| restore {'OK' if same else 'BEDA'}")
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# File Name : benchmarks/bench_leasing.py
+"""
+Cek offline JobPrefetcher terhadap fake job server: request per job (get_job vs lease batch),
+heartbeat menjaga lease tetap hidup, dan release mengembalikan job yang belum dimulai.
+
+    python benchmarks/bench_leasing.py --jobs 200
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import client  # noqa: E402
+from fake_job_server import FakeJobServer  # noqa: E402
+
+
+def drain(server, batch, lease_seconds=None, consume_delay=0.0, limit=None):
+    url = f"http://{server.host}/vastai_server/get_job"
+    # grace=0: berhenti di jawaban "empty" pertama (tanpa menunggu grace period / poll idle)
+    prefetcher = client.JobPrefetcher(url, {"WORKER_ID": "bench"}, depth=2, batch=batch,
+                                      lease_seconds=lease_seconds, idle=client.IdlePolicy(grace=0))
+    taken = []
+    while limit is None or len(taken) < limit:
+        data = prefetcher.get()
+        if data is None:
+            break
+        time.sleep(consume_delay)
+        job_id = client.JobPrefetcher.job_id(data)
+        taken.append(job_id)
+        prefetcher.finished(job_id)
+        server._finish(job_id, 0)  # anggap langsung ter-upload
+    prefetcher.close()
+    return taken
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark lease job")
+    parser.add_argument("--jobs", type=int, default=200)
+    args = parser.parse_args()
+
+    for batch in (1, 4, 16):
+        with FakeJobServer(jobs=args.jobs) as server:
+            t0 = time.perf_counter()
+            taken = drain(server, batch)
+            elapsed = time.perf_counter() - t0
+            print(f"batch={batch:<3d}: {len(taken)} job, {server.request_count()} request "
+                  f"({server.request_count() / max(len(taken), 1):.2f}/job), {elapsed:.2f}s")
+
+    # Lease 3 detik, konsumsi lambat: heartbeat harus mencegah job kembali ke antrian
+    with FakeJobServer(jobs=12, lease_s=3) as server:
+        taken = drain(server, 8, lease_seconds=3, consume_delay=0.5)
+        dup = len(taken) - len(set(taken))
+        print(f"heartbeat : {len(taken)} job, {dup} duplikat, {server.request_count('heartbeat')} heartbeat")
+
+    # Berhenti setelah 2 job: sisa batch harus dikembalikan
+    with FakeJobServer(jobs=8) as server:
+        drain(server, 8, limit=2)
+        print(f"release   : {len(server.todo)} job kembali ke antrian, {len(server.leases)} lease tersisa")
+
+    # Server tanpa endpoint lease -> fallback get_job
+    with FakeJobServer(jobs=5, lease_support=False) as server:
+        taken = drain(server, 8)
+        print(f"fallback  : {len(taken)} job lewat get_job ({server.request_count('get_job')} request)")
+
+
+if __name__ == "__main__":
+    main()
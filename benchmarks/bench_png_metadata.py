@@ -0,0 +1,67 @@
+# File Name : benchmarks/bench_png_metadata.py
+"""
+Simpan PNG + metadata workflow: Pillow decode/encode ulang vs sisip chunk langsung (embed_png_metadata).
+
+    python benchmarks/bench_png_metadata.py --size 2048 --repeat 10
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import client  # noqa: E402
+from PIL import Image  # noqa: E402
+
+
+def make_source_png(size):
+    # Gradasi + noise supaya ukuran/kompresi mendekati output SD/HD asli
+    img = Image.effect_noise((size, size), 64).convert("RGB")
+    buf = io.BytesIO()
+    img.save(buf, "PNG")
+    return buf.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark metadata PNG")
+    parser.add_argument("--size", type=int, default=2048, help="sisi gambar (px)")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    png = make_source_png(args.size)
+    workflow = {str(i): {"class_type": "Node", "inputs": {"text": "x" * 50}} for i in range(300)}
+    target = tempfile.mkdtemp()
+
+    results = {}
+    for label, fmt_fast in (("pillow re-encode", False), ("chunk splice", True)):
+        cg = client.ComfyGenerator(target_folder=target, image_format="PNG")
+        cg.workflow = workflow
+        original = client.embed_png_metadata
+        if not fmt_fast:
+            client.embed_png_metadata = lambda *a, **k: None  # paksa jalur Pillow lama
+        try:
+            path = os.path.join(target, f"{fmt_fast}.png")
+            t0 = time.perf_counter()
+            for _ in range(args.repeat):
+                cg.save_images({"9": [png]}, img_path=path)
+            results[label] = (time.perf_counter() - t0) / args.repeat
+        finally:
+            client.embed_png_metadata = original
+        with Image.open(path) as img:
+            assert json.loads(img.text["workflow"]) == workflow
+            assert json.loads(img.text["prompt"]) == workflow
+        print(f"{label:17s}: {results[label] * 1000:.1f} ms/gambar ({os.path.getsize(path) / 1e6:.1f} MB)")
+
+    # Pixel harus identik
+    with Image.open(os.path.join(target, "True.png")) as a, Image.open(io.BytesIO(png)) as b:
+        assert a.tobytes() == b.tobytes()
+    print(f"speedup          : {results['pillow re-encode'] / results['chunk splice']:.1f}x "
+          f"({args.size}x{args.size}, {len(png) / 1e6:.1f} MB sumber)")
+
+
+if __name__ == "__main__":
+    main()
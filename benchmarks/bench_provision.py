@@ -0,0 +1,115 @@
+# File Name : benchmarks/bench_provision.py
+"""
+Provisioning model untuk instance baru: download berurutan satu stream per file (seperti
+`wget -c` di dl_model.sh) vs model_provisioner (chunk Range paralel), melawan FakeModelServer
+dengan batas kecepatan per koneksi. Juga cek resume (server putus di tengah) dan sha256.
+
+    python benchmarks/bench_provision.py --rate-mb 40 --connections 8
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import model_provisioner  # noqa: E402
+from fake_model_server import FakeModelServer  # noqa: E402
+
+# Komposisi mirip workflow Wan 2.1 (diperkecil): diffusion model besar + encoder + VAE + LoRA
+FILES = {
+    "diffusion_models/wan_i2v.safetensors": 160,
+    "text_encoders/umt5_xxl.safetensors": 64,
+    "clip_vision/clip_vision_h.safetensors": 24,
+    "vae/wan_vae.safetensors": 8,
+    "loras/char.safetensors": 4,
+}
+WORKFLOW = {
+    "1": {"class_type": "WanVideoModelLoader", "inputs": {"model": "wan_i2v.safetensors"}},
+    "2": {"class_type": "LoadWanVideoT5TextEncoder", "inputs": {"model_name": "umt5_xxl.safetensors"}},
+    "3": {"class_type": "CLIPVisionLoader", "inputs": {"clip_name": "clip_vision_h.safetensors"}},
+    "4": {"class_type": "WanVideoVAELoader", "inputs": {"model_name": "wan_vae.safetensors"}},
+    "5": {"class_type": "Power Lora Loader (rgthree)", "_meta": {"title": "Power Lora Loader (rgthree)"},
+          "inputs": {"lora_1": {"on": True, "lora": "char.safetensors", "strength": 1.0}}},
+}
+
+
+def run(server, manifest, connections, chunk_mb, workdir, quiet=True):
+    provisioner, specs, results = model_provisioner.provision_workflow(
+        WORKFLOW, manifest, comfy_dir=os.path.join(workdir, "ComfyUI"), store=os.path.join(workdir, "store"),
+        connections=connections, chunk_mb=chunk_mb, log=(lambda *a: None) if quiet else print,
+    )
+    return provisioner, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark provisioning model")
+    parser.add_argument("--rate-mb", type=float, default=40, help="batas MB/s per koneksi di server palsu")
+    parser.add_argument("--connections", type=int, default=8)
+    parser.add_argument("--chunk-mb", type=float, default=8)
+    parser.add_argument("--scale", type=float, default=1.0, help="pengali ukuran file (MB)")
+    args = parser.parse_args()
+
+    sizes = {path: int(mb * args.scale * 1e6) for path, mb in FILES.items()}
+    with FakeModelServer(sizes, rate_mb=args.rate_mb) as server:
+        manifest = {"models": [{"name": os.path.basename(path), "folder": os.path.dirname(path),
+                                "url": server.url(path), "sha256": server.sha256[path]}
+                               for path in sizes]}
+        largest = max(sizes.values()) / 1e6
+        total = sum(sizes.values()) / 1e6
+        print(f"{len(sizes)} file, total {total:.0f} MB, terbesar {largest:.0f} MB, "
+              f"{args.rate_mb:.0f} MB/s per koneksi")
+        print(f"  batas bawah berurutan : {total / args.rate_mb:.1f}s (jumlah semua file)")
+        print(f"  satu file terbesar    : {largest / args.rate_mb:.1f}s (satu koneksi)")
+
+        timings = {}
+        for label, connections, chunk_mb in (("berurutan (wget -c)", 1, 1e9),
+                                             (f"paralel ({args.connections} koneksi)", args.connections,
+                                              args.chunk_mb)):
+            workdir = tempfile.mkdtemp(prefix="bench_provision_")
+            t0 = time.perf_counter()
+            _, results = run(server, manifest, connections, chunk_mb, workdir)
+            timings[label] = time.perf_counter() - t0
+            ok = all(r["status"] == "download" for r in results.values())
+            print(f"{label:24s}: {timings[label]:.1f}s {'OK' if ok else 'GAGAL ' + str(results)}")
+            shutil.rmtree(workdir)
+        first, second = timings.values()
+        print(f"speedup                 : {first / second:.1f}x")
+
+        # ----- resume: server mati setelah ~40% data, run kedua hanya mengambil sisanya -----
+        workdir = tempfile.mkdtemp(prefix="bench_provision_resume_")
+        server.sent = 0
+        server.fail_after = int(total * 1e6 * 0.4)
+        model_provisioner.RETRIES = 0
+        provisioner, results = run(server, manifest, args.connections, args.chunk_mb, workdir)
+        partial = provisioner.bytes_downloaded
+        server.fail_after = None
+        provisioner, results = run(server, manifest, args.connections, args.chunk_mb, workdir)
+        ok = all(r["status"] in ("download", "ada") for r in results.values())
+        print(f"resume                  : run 1 {partial / 1e6:.0f} MB lalu putus, run 2 "
+              f"{provisioner.bytes_downloaded / 1e6:.0f} MB {'OK' if ok else 'GAGAL ' + str(results)}")
+
+        # ----- store content-addressed: instance/folder lain dengan store sama -> tanpa download -----
+        shutil.rmtree(os.path.join(workdir, "ComfyUI"))
+        provisioner, results = run(server, manifest, args.connections, args.chunk_mb, workdir)
+        print(f"dari store              : {provisioner.bytes_downloaded} byte didownload, "
+              f"{sorted(set(r['status'] for r in results.values()))}")
+        shutil.rmtree(workdir)
+
+        # ----- server tanpa Range (sha256 + size dari manifest, tanpa HEAD): satu stream per file -----
+        workdir = tempfile.mkdtemp(prefix="bench_provision_norange_")
+        server.ranges = False
+        sized = {"models": [dict(m, size=sizes[f"{m['folder']}/{m['name']}"]) for m in manifest["models"]]}
+        provisioner, results = run(server, sized, args.connections, args.chunk_mb, workdir)
+        server.ranges = True
+        ok = all(r["status"] == "download" for r in results.values())
+        print(f"server tanpa Range      : {provisioner.bytes_downloaded / 1e6:.0f} MB untuk {total:.0f} MB "
+              f"{'OK' if ok else 'GAGAL ' + str(results)}")
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
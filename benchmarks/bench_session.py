@@ -0,0 +1,79 @@
+# File Name : benchmarks/bench_session.py
+"""
+Overhead per job: ComfyGenerator baru per job (cara lama) vs satu session untuk semua job.
+
+    python benchmarks/bench_session.py --jobs 200 --delay 0.01
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import client  # noqa: E402
+from fake_comfyui import FakeComfyUI  # noqa: E402
+
+WORKFLOW = {"9": {"class_type": "SaveImage", "inputs": {}, "_meta": {"title": "Save Image"}}}
+
+
+def bench_per_job(jobs, delay, target):
+    with FakeComfyUI(exec_delay=delay, image_sizes=[(64, 64)]) as fake:
+        generators = []
+        t0 = time.perf_counter()
+        for _ in range(jobs):
+            # Cara lama: client_id + websocket baru per job, tidak pernah ditutup
+            cg = client.ComfyGenerator(server_address=fake.address, target_folder=target, ping_interval=0)
+            cg.run_prompt(WORKFLOW)
+            generators.append(cg)
+        elapsed = time.perf_counter() - t0
+        threads = threading.active_count()
+        for cg in generators:
+            cg.close()
+        return elapsed, fake.stats["ws_connect"], threads
+
+
+def bench_session(jobs, delay, target):
+    with FakeComfyUI(exec_delay=delay, image_sizes=[(64, 64)]) as fake:
+        with client.ComfyGenerator(server_address=fake.address, target_folder=target) as cg:
+            t0 = time.perf_counter()
+            for _ in range(jobs):
+                cg.run_prompt(WORKFLOW)
+            elapsed = time.perf_counter() - t0
+            threads = threading.active_count()
+        return elapsed, fake.stats["ws_connect"], threads
+
+
+def check_reconnect(jobs, delay, target):
+    """Putuskan websocket di tengah antrian, semua prompt harus tetap selesai."""
+    with FakeComfyUI(exec_delay=delay, image_sizes=[(64, 64)]) as fake:
+        with client.ComfyGenerator(server_address=fake.address, target_folder=target) as cg:
+            futures = [cg.submit_prompt(WORKFLOW) for _ in range(jobs)]
+            time.sleep(delay * jobs / 3)
+            fake.drop_websockets()
+            results = [f.result(timeout=30) for f in futures]
+        return sum(1 for r in results if r), cg.reconnect_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark session ComfyGenerator")
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--delay", type=float, default=0.01, help="waktu eksekusi palsu per prompt (detik)")
+    parser.add_argument("--target", default="/tmp/bench_session")
+    args = parser.parse_args()
+
+    exec_total = args.jobs * args.delay
+    for label, fn in (("per-job generator", bench_per_job), ("session", bench_session)):
+        elapsed, sockets, threads = fn(args.jobs, args.delay, args.target)
+        overhead_ms = (elapsed - exec_total) / args.jobs * 1000
+        print(f"{label:18s}: {elapsed:.2f}s total, overhead {overhead_ms:.2f} ms/job, "
+              f"websocket dibuka {sockets}, thread aktif {threads}")
+
+    ok, reconnects = check_reconnect(20, 0.05, args.target)
+    print(f"reconnect         : {ok}/20 prompt selesai setelah socket diputus ({reconnects} reconnect)")
+
+
+if __name__ == "__main__":
+    main()
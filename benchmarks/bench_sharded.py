@@ -0,0 +1,74 @@
+# File Name : benchmarks/bench_sharded.py
+"""
+Upload folder besar: satu ZIP penuh lalu satu upload (mode lama) vs vast_tools.upload_sharded
+(zip shard k+1 selagi shard k diupload), melawan FakeUploadTarget dengan bandwidth terbatas.
+Juga: upload yang putus di tengah dilanjutkan dari shard yang belum, dan peak disk sementara.
+
+    python benchmarks/bench_sharded.py --images 5000 --size-kb 48 --shard-mb 32 --rate-mb 100
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import vast_tools  # noqa: E402
+from bench_zip import make_folder  # noqa: E402
+from fake_upload_target import FakeUploadTarget  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark upload sharded")
+    parser.add_argument("--images", type=int, default=5000)
+    parser.add_argument("--size-kb", type=int, default=48)
+    parser.add_argument("--shard-mb", type=float, default=32)
+    parser.add_argument("--parallel", type=int, default=2)
+    parser.add_argument("--rate-mb", type=float, default=100, help="bandwidth upload palsu (MB/s)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_sharded_")
+    src = os.path.join(workdir, "dataset")
+    make_folder(src, args.images, args.size_kb)
+    total = sum(os.path.getsize(os.path.join(r, f)) for r, _, files in os.walk(src) for f in files)
+    print(f"folder: {total / 1e6:.0f} MB, shard {args.shard_mb:.0f} MB, {args.parallel} upload paralel, "
+          f"link {args.rate_mb:.0f} MB/s")
+    try:
+        # ----- mode lama: zip penuh ke disk, baru upload -----
+        target = FakeUploadTarget(os.path.join(workdir, "repo_full"), rate_mb=args.rate_mb)
+        t0 = time.perf_counter()
+        zip_path = shutil.make_archive(os.path.join(workdir, "full"), "zip", root_dir=src)
+        zip_s = time.perf_counter() - t0
+        peak_full = os.path.getsize(zip_path)
+        target.upload_file(zip_path, "full.zip")
+        full_s = time.perf_counter() - t0
+        os.remove(zip_path)
+        print(f"zip penuh + upload : {full_s:5.1f}s (zip {zip_s:.1f}s, link idle selama itu), "
+              f"disk sementara {peak_full / 1e6:.0f} MB")
+
+        # ----- sharded -----
+        target = FakeUploadTarget(os.path.join(workdir, "repo_sharded"), rate_mb=args.rate_mb)
+        t0 = time.perf_counter()
+        stats = vast_tools.upload_sharded(src, target, args.shard_mb, args.parallel)
+        sharded_s = time.perf_counter() - t0
+        print(f"sharded            : {sharded_s:5.1f}s, disk sementara maks {stats['peak_tmp_bytes'] / 1e6:.0f} MB "
+              f"({stats['shards']} shard), speedup {full_s / sharded_s:.1f}x")
+
+        # ----- resume: upload ke-4 putus (setelah retry habis), run ulang melanjutkan -----
+        vast_tools.UPLOAD_RETRIES = 0
+        target = FakeUploadTarget(os.path.join(workdir, "repo_resume"), rate_mb=args.rate_mb, fail_uploads={3})
+        first = vast_tools.upload_sharded(src, target, args.shard_mb, args.parallel)
+        sent_first = len(target.uploads)
+        second = vast_tools.upload_sharded(src, target, args.shard_mb, args.parallel)
+        ok = first is None and second is not None and second["uploaded"] + sent_first == stats["shards"]
+        print(f"resume             : run 1 putus setelah {sent_first} shard, run 2 upload {second['uploaded']} "
+              f"shard (dilewati {second['skipped']}) {'OK' if ok else 'GAGAL'}")
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# File Name : benchmarks/bench_startup.py
+"""
+Budget waktu import (python -X importtime): client.py dan vast_tools.py harus start cepat
+dan tidak boleh memuat modul berat / menjalankan pip saat import.
+Exit code 1 jika melewati budget -> bisa dipakai sebagai gate di CI / provisioning.
+
+    python benchmarks/bench_startup.py --budget-ms 150 --repeat 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modul yang hanya boleh di-load saat benar-benar dipakai
+LAZY_MODULES = ("PIL", "websocket", "aiohttp", "asyncio", "socketio", "huggingface_hub", "pyminizip",
+                "model_provisioner")
+
+PROBE = (
+    "import sys; sys.argv = ['probe']; import {module}; "
+    "print(','.join(m for m in {lazy!r} if m in sys.modules))"
+)
+
+
+def import_time(module):
+    """(total_us, import paling lama, modul lazy yang ikut ter-load) untuk satu proses baru."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE.format(module=module, lazy=LAZY_MODULES)],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    rows = []  # (cumulative_us, depth, nama); anak modul dicetak sebelum induknya
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((int(cumulative_us), depth, name.strip()))
+    end = next(i for i, row in enumerate(rows) if row[1] == 0 and row[2] == module)
+    start = max((i for i, row in enumerate(rows[:end]) if row[1] == 0), default=-1) + 1
+    total = rows[end][0]
+    slowest = sorted((cum, name) for cum, depth, name in rows[start:end] if depth == 1)[::-1][:5]
+    loaded = [m for m in proc.stdout.strip().split(",") if m]
+    return total, slowest, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Budget waktu import")
+    parser.add_argument("--budget-ms", type=float, default=150, help="batas median waktu import per modul")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--modules", nargs="+", default=["client", "vast_tools"])
+    args = parser.parse_args()
+
+    failed = False
+    for module in args.modules:
+        runs = [import_time(module) for _ in range(args.repeat)]
+        median_ms = statistics.median(total for total, _, _ in runs) / 1000
+        _, slowest, loaded = runs[-1]
+        ok = median_ms <= args.budget_ms and not loaded
+        failed |= not ok
+        print(f"{module:11s}: {median_ms:.1f} ms (budget {args.budget_ms:.0f} ms) {'OK' if ok else 'GAGAL'}")
+        print("             terlama   : " + ", ".join(f"{name} {cum / 1000:.1f}ms" for cum, name in slowest))
+        if loaded:
+            print(f"             modul lazy ter-load saat import: {', '.join(loaded)}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
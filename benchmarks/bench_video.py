@@ -0,0 +1,126 @@
+# File Name : benchmarks/bench_video.py
+"""
+Output video (Wan 2.1 I2V / VHS_VideoCombine "gifs") ratusan MB: peak RSS worker untuk
+jalur in-memory (bytes /view -> base64 -> JSON, seperti upload lama) vs jalur streaming
+(/view -> disk per chunk -> upload_chunk resumable), melawan FakeComfyUI + FakeJobServer.
+Worker jalan di proses terpisah supaya peak RSS terukur bersih. Juga cek resume: server
+menjawab 500 di tengah upload, retry melanjutkan dari offset server (tidak kirim ulang).
+
+    python benchmarks/bench_video.py --video-mb 300 --jobs 3
+"""
+import argparse
+import base64
+import contextlib
+import io
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_comfyui import FakeComfyUI, video_sha256  # noqa: E402
+from fake_job_server import FakeJobServer  # noqa: E402
+
+
+def peak_rss_mb():
+    # VmHWM milik proses ini saja (ru_maxrss di Linux ikut mewarisi puncak proses induk)
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def child(mode, comfy, host, jobs):
+    """Jalankan worker di proses ini; print JSON hasil di baris terakhir stdout."""
+    os.environ.pop("VAST_CONTAINERLABEL", None)  # jangan sampai destroy_instance jalan
+    workdir = tempfile.mkdtemp(prefix=f"bench_video_{mode}_")
+    os.chdir(workdir)
+    import client
+
+    client.COMFYUI_SERVERS = [comfy]
+    client.COMFYUI_SERVER = comfy
+    client.HOST_MY_PC_LOCAL = host
+    client.script_path = workdir
+    client.IDLE_GRACE_S = 0
+    client.WARMUP = False
+    client.JOURNAL_FILE = None
+    client.RESULT_CACHE_DIR = None
+    base_rss = peak_rss_mb()
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if mode == "memory":
+            # Jalur in-memory: seluruh video di RAM, base64, lalu body JSON
+            cg = client.ComfyGenerator(server_address=comfy, target_folder=workdir)
+            for i in range(1, jobs + 1):
+                prompt_id = cg.queue_prompt({})["prompt_id"]
+                while not cg.get_history(prompt_id):
+                    time.sleep(0.01)
+                video = cg.get_image(f"{prompt_id}_v0.mp4", "", "output")
+                payload = {"WORKER_ID": "bench", "job_id": f"job-{i}", "filename": "video.mp4",
+                           "IMAGE_BASE64": base64.b64encode(video).decode("ascii")}
+                client.HTTP.post(f"http://{host}/vastai_server/receive_files_image", json_body=payload,
+                                 timeout=client.UPLOAD_TIMEOUT, retries=0)
+                del video, payload
+        else:
+            client.start()
+    elapsed = time.perf_counter() - t0
+    shutil.rmtree(workdir)
+    print(json.dumps({"elapsed_s": elapsed, "base_rss_mb": base_rss, "peak_rss_mb": peak_rss_mb()}))
+
+
+def run(mode, video_mb, jobs, fail_chunks=()):
+    size = int(video_mb * 1024 * 1024)
+    with FakeComfyUI(exec_delay=0.01, image_sizes=[(64, 64)], video_sizes=[size]) as fake, \
+            FakeJobServer(jobs=jobs, mode="sd", fail_chunks=fail_chunks) as server:
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", mode,
+                               fake.address, server.host, str(jobs)],
+                              stdout=subprocess.PIPE, text=True, check=True)
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        result["done"] = len(server.done)
+        result["uploaded_mb"] = server.upload_bytes / (1024 * 1024)
+        result["verified"] = [u["verified"] for u in server.chunk_uploads.values()]
+        result["expected_sha256"] = video_sha256(0, size)
+        result["sha_ok"] = all(u["sha256"] == result["expected_sha256"] and u["verified"]
+                               for u in server.chunk_uploads.values())
+    return result
+
+
+def main():
+    if sys.argv[1:2] == ["--child"]:
+        return child(sys.argv[2], sys.argv[3], sys.argv[4], int(sys.argv[5]))
+    parser = argparse.ArgumentParser(description="Benchmark output video: in-memory vs streaming")
+    parser.add_argument("--video-mb", type=float, default=300)
+    parser.add_argument("--jobs", type=int, default=3)
+    args = parser.parse_args()
+
+    total = args.video_mb * args.jobs
+    print(f"{args.jobs} job x video {args.video_mb:.0f} MB")
+    memory = run("memory", args.video_mb, args.jobs)
+    print(f"in-memory + base64 : peak RSS {memory['peak_rss_mb']:6.0f} MB, "
+          f"{total / memory['elapsed_s']:6.1f} MB/s, {memory['done']} job")
+    stream = run("stream", args.video_mb, args.jobs)
+    print(f"streaming + chunk  : peak RSS {stream['peak_rss_mb']:6.0f} MB, "
+          f"{total / stream['elapsed_s']:6.1f} MB/s, {stream['done']} job, "
+          f"sha256 {'OK' if stream['sha_ok'] and len(stream['verified']) == args.jobs else 'GAGAL'}")
+
+    # Memori jalur streaming tidak tergantung panjang clip
+    for video_mb in (args.video_mb / 4, args.video_mb * 2):
+        result = run("stream", video_mb, 1)
+        print(f"streaming {video_mb:5.0f} MB : peak RSS {result['peak_rss_mb']:6.0f} MB")
+
+    # Resume: chunk 3 dan 4 dijawab 500 -> UploadQueue retry, lanjut dari offset server
+    resume = run("stream", args.video_mb, 1, fail_chunks=(3, 4))
+    print(f"resume (chunk 3-4 gagal): server menerima {resume['uploaded_mb']:.0f} MB untuk video "
+          f"{args.video_mb:.0f} MB, {resume['done']} job, sha256 {'OK' if resume['sha_ok'] else 'GAGAL'}")
+
+
+if __name__ == "__main__":
+    main()
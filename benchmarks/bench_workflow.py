@@ -0,0 +1,94 @@
+# File Name : benchmarks/bench_workflow.py
+"""
+Microbenchmark instansiasi workflow per job:
+cara lama (json.load dari disk + linear scan) vs WorkflowTemplate (parse sekali + copy-on-write).
+
+    python benchmarks/bench_workflow.py --jobs 10000 --nodes 400
+    python benchmarks/bench_workflow.py --workflow workflow.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import client  # noqa: E402
+
+
+def synthetic_workflow(nodes, loras=30):
+    wf = {
+        "1": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": "model.safetensors"},
+              "_meta": {"title": "Load Checkpoint"}},
+        "2": {"class_type": "CLIPTextEncode", "inputs": {"text": "", "clip": ["1", 1]},
+              "_meta": {"title": "POSITIVE_PROMPT"}},
+        "3": {"class_type": "CLIPTextEncode", "inputs": {"text": "", "clip": ["1", 1]},
+              "_meta": {"title": "NEGATIVE_PROMPT"}},
+        "4": {"class_type": "Power Lora Loader (rgthree)",
+              "inputs": {f"lora_{i}": {"on": True, "lora": f"lora_{i}.safetensors", "strength": 1.0}
+                         for i in range(1, loras + 1)},
+              "_meta": {"title": "Power Lora Loader (rgthree)"}},
+    }
+    for i in range(5, nodes):
+        wf[str(i)] = {"class_type": f"Node{i % 17}", "inputs": {"a": [str(i - 1), 0], "v": i, "s": f"x{i}"},
+                      "_meta": {"title": f"node {i}"}}
+    wf[str(nodes)] = {"class_type": "easy seed", "inputs": {"seed": 0}, "_meta": {"title": "Seed"}}
+    return wf
+
+
+def legacy_job(path, seed, prompt):
+    # Salinan jalur lama: buka + json.load per job, lalu linear scan per setter
+    with open(path, "r", encoding="utf-8") as f:
+        wf = json.load(f)
+    for node in wf.values():
+        if node.get("class_type") == "easy seed" and "seed" in node.get("inputs", {}):
+            node["inputs"]["seed"] = seed
+            break
+    for node in wf.values():
+        if node.get("_meta", {}).get("title") == "POSITIVE_PROMPT":
+            node["inputs"]["text"] = prompt
+            break
+    return wf
+
+
+def template_job(path, seed, prompt):
+    wf = client.LoadWorkFlow(template=client.WorkflowTemplate.from_file(path), resolution="SD")
+    wf.seed(seed)
+    wf.positive_prompt(prompt)
+    return wf.workflow()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark instansiasi workflow")
+    parser.add_argument("--jobs", type=int, default=10000)
+    parser.add_argument("--nodes", type=int, default=400)
+    parser.add_argument("--workflow", help="pakai workflow.json asli, bukan graph sintetis")
+    args = parser.parse_args()
+
+    path = args.workflow
+    if not path:
+        fd, path = tempfile.mkstemp(suffix=".json")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(synthetic_workflow(args.nodes), f)
+
+    # Hasil kedua jalur harus identik
+    assert json.dumps(legacy_job(path, 42, "hello")) == json.dumps(template_job(path, 42, "hello"))
+
+    results = {}
+    for label, fn in (("legacy", legacy_job), ("template", template_job)):
+        t0 = time.perf_counter()
+        for i in range(args.jobs):
+            fn(path, i, f"prompt {i}")
+        results[label] = time.perf_counter() - t0
+        print(f"{label:9s}: {results[label]:.3f}s untuk {args.jobs} job "
+              f"({results[label] / args.jobs * 1e6:.1f} us/job)")
+    print(f"speedup  : {results['legacy'] / results['template']:.1f}x")
+
+    if not args.workflow:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# File Name : benchmarks/bench_workflow_cache.py
+"""
+Job upscale (HD): workflow lengkap (zlib+base64) di setiap job vs WorkflowCache
+(job cukup membawa WORKFLOW_HASH + WORKFLOW_PATCH, workflow di-parse sekali).
+
+1. Microbenchmark prepare job: decode + parse + LoadWorkFlow per job vs lookup hash + patch.
+2. End-to-end start() mode HD melawan FakeJobServer + FakeComfyUI: byte response job server
+   per job dengan dan tanpa cache.
+
+    python benchmarks/bench_workflow_cache.py --jobs 2000 --nodes 400
+"""
+import argparse
+import base64
+import contextlib
+import hashlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import client  # noqa: E402
+from bench_workflow import synthetic_workflow  # noqa: E402
+from fake_comfyui import FakeComfyUI  # noqa: E402
+from fake_job_server import FakeJobServer  # noqa: E402
+
+
+def legacy_prepare(data):
+    # Salinan jalur lama start_generate_hd: decode + parse + index workflow per job
+    wf = client.LoadWorkFlow(workflow_json=client.decode_workflow_from_zb64(data["WORKFLOW"]), resolution="HD")
+    wf.seed(data["task"]["number"])
+    return wf.workflow()
+
+
+def cached_prepare(cache, data):
+    wf = client.LoadWorkFlow(template=cache.template(data), resolution="HD")
+    wf.apply_patch(data["WORKFLOW_PATCH"])
+    return wf.workflow()
+
+
+def run_worker(workflow, jobs, server_cache, worker_cache):
+    """start() mode HD dengan worker asli; return (job selesai, byte response job per job, counters)."""
+    workdir = tempfile.mkdtemp(prefix="bench_wf_cache_")
+    with FakeComfyUI(exec_delay=0.001, image_sizes=[(64, 64), (128, 128)]) as fake, \
+            FakeJobServer(jobs=jobs, mode="hd", workflow=workflow, workflow_cache=server_cache) as server:
+        client.COMFYUI_SERVERS = [fake.address]
+        client.COMFYUI_SERVER = fake.address
+        client.HOST_MY_PC_LOCAL = server.host
+        client.script_path = workdir
+        client.METRICS = client.WorkerMetrics()
+        client.IDLE_GRACE_S = 0
+        client.JOURNAL_FILE = None
+        client.WORKFLOW_CACHE_DIR = "workflow_cache" if worker_cache else None
+        with contextlib.redirect_stdout(io.StringIO()):
+            client.start()
+        result = (len(server.done), server.job_bytes / jobs, server.request_count("get_workflow"),
+                  client.METRICS.snapshot()["counters"])
+    shutil.rmtree(workdir)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cache workflow HD")
+    parser.add_argument("--jobs", type=int, default=2000)
+    parser.add_argument("--nodes", type=int, default=400)
+    parser.add_argument("--e2e-jobs", type=int, default=200)
+    args = parser.parse_args()
+    os.environ.pop("VAST_CONTAINERLABEL", None)  # jangan sampai destroy_instance jalan
+
+    workflow = synthetic_workflow(args.nodes)
+    raw = json.dumps(workflow).encode("utf-8")
+    full = {"status": "ok", "WORKFLOW": base64.b64encode(zlib.compress(raw)).decode("ascii")}
+    key = hashlib.sha256(raw).hexdigest()
+
+    # ----- 1. prepare job -----
+    workdir = tempfile.mkdtemp(prefix="bench_wf_cache_")
+    cache = client.WorkflowCache(workdir)
+    cache.template(dict(full, WORKFLOW_HASH=key))
+    job = {"status": "ok", "task": {"number": 42}, "WORKFLOW_HASH": key, "WORKFLOW_PATCH": {"seed": 42}}
+    assert json.dumps(legacy_prepare(dict(full, task={"number": 42}))) == json.dumps(cached_prepare(cache, job))
+    print(f"workflow {args.nodes} node: {len(raw) / 1024:.0f} KB JSON, "
+          f"{len(full['WORKFLOW']) / 1024:.0f} KB zlib+base64")
+
+    timings = {}
+    for label, fn in (("full workflow", legacy_prepare), ("hash + patch", lambda data: cached_prepare(cache, data))):
+        t0 = time.perf_counter()
+        for i in range(args.jobs):
+            data = dict(full, task={"number": i}) if fn is legacy_prepare else \
+                dict(job, task={"number": i}, WORKFLOW_PATCH={"seed": i})
+            fn(data)
+        timings[label] = time.perf_counter() - t0
+        print(f"{label:14s}: {timings[label] / args.jobs * 1e6:8.1f} us/job")
+    first, second = timings.values()
+    print(f"speedup       : {first / second:.1f}x")
+    shutil.rmtree(workdir)
+
+    # ----- 2. end-to-end: byte dari job server -----
+    # "server lama": job server belum mengenal WORKFLOW_HASH, worker tetap tidak parse ulang
+    for label, server_cache, worker_cache in (("tanpa cache", False, False), ("server lama", False, True),
+                                              ("dengan cache", True, True)):
+        done, per_job, fetched, counters = run_worker(workflow, args.e2e_jobs, server_cache, worker_cache)
+        print(f"{label:14s}: {done}/{args.e2e_jobs} job, {per_job / 1024:6.1f} KB response per job, "
+              f"hit {counters.get('workflow_cache_hits', 0)}, miss {counters.get('workflow_cache_misses', 0)}, "
+              f"get_workflow {fetched}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# File Name : benchmarks/bench_zip.py
+"""
+ZIP folder output: shutil.make_archive (deflate semua, satu thread) vs vast_tools.zip_folder_fast
+(media STORED, sisanya deflate paralel). Folder sintetis: gambar PNG/JPEG (isi acak, tidak bisa
+dikompres lagi) + sidecar JSON per beberapa gambar. Hasil ZIP dicek dengan testzip().
+
+    python benchmarks/bench_zip.py --images 50000 --size-kb 48
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import vast_tools  # noqa: E402
+
+
+def make_folder(root, images, size_kb, per_dir=1000):
+    """Struktur seperti output worker: <char>/<nomor>.png|jpg + metadata json tiap 10 gambar."""
+    noise = os.urandom(size_kb * 1024 + 4096)
+    for i in range(images):
+        folder = os.path.join(root, f"char_{i // per_dir:03d}")
+        if i % per_dir == 0:
+            os.makedirs(folder, exist_ok=True)
+        ext = ".png" if i % 3 else ".jpg"
+        offset = (i * 131) % 4096
+        with open(os.path.join(folder, f"{i:06d}{ext}"), "wb") as f:
+            f.write(noise[offset:offset + size_kb * 1024])
+        if i % 10 == 0:
+            meta = {"job_id": f"job-{i}", "prompt": "masterpiece, 1girl, " * 20, "seed": i}
+            with open(os.path.join(folder, f"{i:06d}.json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+
+
+def timed(label, fn, total_bytes):
+    t0 = time.perf_counter()
+    zip_path = fn()
+    seconds = time.perf_counter() - t0
+    with zipfile.ZipFile(zip_path) as zf:
+        bad = zf.testzip()
+        count = len(zf.infolist())
+    size = os.path.getsize(zip_path)
+    print(f"{label:13s}: {seconds:6.1f}s  {total_bytes / 1e6 / seconds:6.0f} MB/s  "
+          f"zip {size / 1e6:.0f} MB, {count} entry {'OK' if bad is None else 'RUSAK: ' + bad}")
+    os.remove(zip_path)
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark zip_folder")
+    parser.add_argument("--images", type=int, default=50000)
+    parser.add_argument("--size-kb", type=int, default=48, help="ukuran per gambar")
+    parser.add_argument("--workers", type=int, default=None, help="default: jumlah core")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_zip_")
+    src = os.path.join(workdir, "output")
+    t0 = time.perf_counter()
+    make_folder(src, args.images, args.size_kb)
+    total = sum(os.path.getsize(os.path.join(r, f)) for r, _, files in os.walk(src) for f in files)
+    print(f"folder sintetis: {args.images} gambar, {total / 1e6:.0f} MB ({time.perf_counter() - t0:.0f}s), "
+          f"{args.workers or vast_tools.ZIP_WORKERS} worker")
+    out = os.path.join(workdir, "out")
+    try:
+        legacy = timed("make_archive", lambda: shutil.make_archive(out, "zip", root_dir=src), total)
+        fast = timed("zip_fast", lambda: (vast_tools.zip_folder_fast(out + ".zip", src, workers=args.workers),
+                                          out + ".zip")[1], total)
+        print(f"speedup      : {legacy / fast:.1f}x")
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+# File Name : benchmarks/fake_comfyui.py
+"""
+Stand-in lokal untuk ComfyUI (hanya stdlib): /prompt, /history, /view, /queue, /system_stats, /ws.
+Dipakai benchmark supaya worker client.py bisa diukur tanpa GPU.
+video_sizes: output video seperti VHS_VideoCombine ("gifs"), isi deterministik di-stream dari /view.
+missing_images: index gambar yang dijawab 404 oleh /view (download sebagian gagal).
+
+    with FakeComfyUI(exec_delay=0.05, image_sizes=[(512, 512)]) as fake:
+        client.COMFYUI_SERVER = fake.address
+"""
+import base64
+import hashlib
+import json
+import os
+import queue
+import socket
+import struct
+import threading
+import time
+import uuid
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+VIDEO_PATTERN_LEN = 1048573  # prima: chunk di offset berbeda tidak identik
+
+
+def video_content(seed, size, chunk=1 << 20):
+    """Isi file video palsu sebesar `size` byte, per potongan (tidak dimuat penuh ke memori)."""
+    pattern = hashlib.sha256(str(seed).encode()).digest() * (VIDEO_PATTERN_LEN // 32 + 1)
+    pattern = pattern[:VIDEO_PATTERN_LEN] * 2
+    start = 0
+    while start < size:
+        offset = start % VIDEO_PATTERN_LEN
+        n = min(size - start, chunk, VIDEO_PATTERN_LEN)
+        yield pattern[offset:offset + n]
+        start += n
+
+
+def video_sha256(seed, size):
+    digest = hashlib.sha256()
+    for data in video_content(seed, size):
+        digest.update(data)
+    return digest.hexdigest()
+
+
+def make_png(width, height, seed=0):
+    """PNG RGB valid dengan isi pseudo-random (ukuran file mendekati output asli)."""
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    row_len = width * 3
+    noise = hashlib.sha256(str(seed).encode()).digest() * (row_len // 32 + 2)
+    raw = b"".join(b"\x00" + noise[(y * 7) % 32:(y * 7) % 32 + row_len] for y in range(height))
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr) + chunk(b"IDAT", zlib.compress(raw, 1)) + chunk(b"IEND", b"")
+
+
+# -------------------------------
+# WebSocket framing (server side)
+# -------------------------------
+def ws_frame(payload, opcode):
+    header = bytes([0x80 | opcode])
+    n = len(payload)
+    if n < 126:
+        header += bytes([n])
+    elif n < 65536:
+        header += bytes([126]) + struct.pack(">H", n)
+    else:
+        header += bytes([127]) + struct.pack(">Q", n)
+    return header + payload
+
+
+def ws_read_frame(rfile):
+    head = rfile.read(2)
+    if len(head) < 2:
+        return None, None
+    opcode = head[0] & 0x0F
+    n = head[1] & 0x7F
+    if n == 126:
+        n = struct.unpack(">H", rfile.read(2))[0]
+    elif n == 127:
+        n = struct.unpack(">Q", rfile.read(8))[0]
+    mask = rfile.read(4) if head[1] & 0x80 else b"\x00\x00\x00\x00"
+    data = bytearray(rfile.read(n))
+    for i in range(len(data)):
+        data[i] ^= mask[i % 4]
+    return opcode, bytes(data)
+
+
+class _WsClient:
+    def __init__(self, wfile, sock):
+        self.wfile = wfile
+        self.sock = sock
+        self.lock = threading.Lock()
+        self.alive = True
+
+    def send(self, payload, opcode=1):
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        with self.lock:
+            try:
+                self.wfile.write(ws_frame(payload, opcode))
+                self.wfile.flush()
+            except OSError:
+                self.alive = False
+
+    def send_json(self, message):
+        self.send(json.dumps(message), 1)
+
+
+class FakeComfyUI:
+    def __init__(self, exec_delay=0.05, image_sizes=((512, 512),), output_node="9",
+                 ws_images=False, video_sizes=(), missing_images=(), port=0):
+        self.exec_delay = exec_delay
+        self.image_sizes = list(image_sizes)
+        self.video_sizes = list(video_sizes)
+        self.missing_images = set(missing_images)
+        self.output_node = output_node
+        self.ws_images = ws_images
+        self.history = {}
+        self.clients = {}
+        self.stats = {"prompt": 0, "history": 0, "view": 0, "view_bytes": 0, "ws_connect": 0, "interrupt": 0,
+                      "busy_s": 0.0}
+        self.cancelled = set()
+        self.running = None
+        self.started_at = None
+        self._images = {}
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self.address = f"127.0.0.1:{self._server.server_address[1]}"
+
+    # ----- lifecycle -----
+    def start(self):
+        self.started_at = time.time()
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        threading.Thread(target=self._gpu_loop, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._queue.put(None)
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def drop_websockets(self):
+        """Putuskan semua websocket (simulasi jaringan putus / restart proxy)."""
+        with self._lock:
+            clients = list(self.clients.values())
+        for client in clients:
+            client.alive = False
+            try:
+                client.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def queue_remaining(self):
+        return self._queue.qsize()
+
+    # ----- eksekusi prompt (satu "GPU", serial) -----
+    def _image(self, index):
+        size = self.image_sizes[index % len(self.image_sizes)]
+        if size not in self._images:
+            self._images[size] = make_png(size[0], size[1], seed=index)
+        return self._images[size]
+
+    def _gpu_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            prompt_id, client_id = item
+            if prompt_id in self.cancelled:
+                continue
+            self.running = prompt_id
+            t0 = time.time()
+            self._emit(client_id, "execution_start", {"prompt_id": prompt_id})
+            self._emit(client_id, "executing", {"node": self.output_node, "prompt_id": prompt_id})
+            time.sleep(self.exec_delay)
+            self._emit(client_id, "progress", {"value": 1, "max": 1, "prompt_id": prompt_id, "node": self.output_node})
+            images = []
+            for i in range(len(self.image_sizes)):
+                images.append({"filename": f"{prompt_id}_{i}.png", "subfolder": "", "type": "output"})
+                client = self.clients.get(client_id)
+                if self.ws_images and client is not None and client.alive:
+                    # format SaveImageWebsocket: 4 byte event type + 4 byte format + PNG
+                    client.send(struct.pack(">II", 1, 2) + self._image(i), 2)
+            output = {"images": images}
+            if self.video_sizes:
+                output["gifs"] = [{"filename": f"{prompt_id}_v{i}.mp4", "subfolder": "", "type": "output",
+                                   "format": "video/h264-mp4", "frame_rate": 16}
+                                  for i in range(len(self.video_sizes))]
+            self.history[prompt_id] = {"outputs": {self.output_node: output}, "status": {"completed": True}}
+            self.stats["busy_s"] += time.time() - t0
+            self._emit(client_id, "executed", {"node": self.output_node, "output": output, "prompt_id": prompt_id})
+            self.running = None
+            self._emit(client_id, "executing", {"node": None, "prompt_id": prompt_id})
+
+    def _emit(self, client_id, msg_type, data):
+        # client bisa reconnect di tengah eksekusi -> selalu cari ulang berdasarkan client_id
+        with self._lock:
+            client = self.clients.get(client_id)
+        if client is not None and client.alive:
+            client.send_json({"type": msg_type, "data": data})
+
+    # ----- HTTP -----
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+            wbufsize = 1 << 16  # header + body satu write (hindari delay Nagle/delayed-ACK)
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, code, body=b"", content_type="application/json"):
+                if isinstance(body, (dict, list)):
+                    body = json.dumps(body).encode("utf-8")
+                self.send_response(code)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                path = urlparse(self.path).path
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if path == "/queue":
+                    fake.cancelled.update(body.get("delete", []))
+                    return self._send(200, {})
+                if path == "/interrupt":
+                    fake.stats["interrupt"] += 1
+                    return self._send(200, {})
+                if path != "/prompt":
+                    return self._send(404, {})
+                prompt_id = str(uuid.uuid4())
+                fake.stats["prompt"] += 1
+                fake._queue.put((prompt_id, body.get("client_id")))
+                self._send(200, {"prompt_id": prompt_id, "number": fake.stats["prompt"], "node_errors": {}})
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path == "/ws":
+                    return self._websocket(parse_qs(url.query).get("clientId", [""])[0])
+                if url.path == "/prompt":
+                    return self._send(200, {"exec_info": {"queue_remaining": fake.queue_remaining()}})
+                if url.path == "/queue":
+                    running = fake.running
+                    pending = [item[0] for item in list(fake._queue.queue) if item]
+                    return self._send(200, {"queue_running": [[0, running, {}, {}, []]] if running else [],
+                                            "queue_pending": [[i + 1, p, {}, {}, []] for i, p in enumerate(pending)]})
+                if url.path == "/system_stats":
+                    return self._send(200, {"system": {"os": "fake"}, "devices": [{"name": "fake-gpu"}]})
+                if url.path.startswith("/history/"):
+                    fake.stats["history"] += 1
+                    prompt_id = url.path.rsplit("/", 1)[1]
+                    entry = fake.history.get(prompt_id)
+                    return self._send(200, {prompt_id: entry} if entry else {})
+                if url.path == "/view":
+                    fake.stats["view"] += 1
+                    filename = parse_qs(url.query).get("filename", ["_0.png"])[0]
+                    if filename.endswith(".mp4"):
+                        return self._send_video(filename)
+                    index = int(os.path.splitext(filename)[0].rsplit("_", 1)[1])
+                    if index in fake.missing_images:
+                        return self._send(404, {})
+                    return self._send(200, fake._image(index), "image/png")
+                self._send(404, {})
+
+            def _send_video(self, filename):
+                index = int(os.path.splitext(filename)[0].rsplit("_v", 1)[1])
+                size = fake.video_sizes[index]
+                self.send_response(200)
+                self.send_header("Content-Type", "video/mp4")
+                self.send_header("Content-Length", str(size))
+                self.end_headers()
+                try:
+                    for data in video_content(index, size):
+                        self.wfile.write(data)
+                        fake.stats["view_bytes"] += len(data)
+                except OSError:
+                    self.close_connection = True
+
+            def _websocket(self, client_id):
+                key = self.headers.get("Sec-WebSocket-Key", "")
+                accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+                self.send_response(101)
+                self.send_header("Upgrade", "websocket")
+                self.send_header("Connection", "Upgrade")
+                self.send_header("Sec-WebSocket-Accept", accept)
+                self.end_headers()
+                self.wfile.flush()
+
+                client = _WsClient(self.wfile, self.connection)
+                with fake._lock:
+                    fake.clients[client_id] = client
+                    fake.stats["ws_connect"] += 1
+                client.send_json({"type": "status", "data": {"sid": client_id}})
+                try:
+                    while client.alive:
+                        opcode, data = ws_read_frame(self.rfile)
+                        if opcode is None or opcode == 8:
+                            break
+                        if opcode == 9:
+                            client.send(data, 10)
+                except (OSError, ValueError):
+                    pass
+                client.alive = False
+                self.close_connection = True
+
+        return Handler
+
+
+if __name__ == "__main__":
+    with FakeComfyUI() as fake:
+        print(f"Fake ComfyUI di {fake.address} (Ctrl+C untuk berhenti)")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,81 @@
+# File Name : benchmarks/fake_hf_server.py
+"""
+Stand-in lokal untuk URL resolve/ Hugging Face (hanya stdlib): file di folder `root`
+(mis. FakeUploadTarget.root) dilayani di /<datasets/><repo_id>/resolve/<revision>/<path>,
+dengan batas kecepatan per koneksi seperti CDN.
+
+    with FakeHfServer(target.root, rate_mb=20) as server:
+        source = vast_tools.RepoSource("user/repo", endpoint=server.endpoint)
+"""
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+
+class FakeHfServer:
+    def __init__(self, root, rate_mb=0, port=0):
+        self.root = root
+        self.rate = rate_mb * 1e6
+        self.requests = []
+        self.sent = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self.endpoint = f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                match = re.match(r"/(?:datasets/|spaces/)?[^/]+/[^/]+/resolve/[^/]+/(.+)", self.path)
+                path = os.path.join(fake.root, *unquote(match.group(1)).split("/")) if match else None
+                fake.requests.append(self.path)
+                if path is None or not os.path.isfile(path):
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                size = os.path.getsize(path)
+                self.send_response(200)
+                self.send_header("Content-Length", str(size))
+                self.end_headers()
+                t0 = time.time()
+                sent = 0
+                try:
+                    with open(path, "rb") as f:
+                        for data in iter(lambda: f.read(1 << 16), b""):
+                            self.wfile.write(data)
+                            sent += len(data)
+                            with fake._lock:
+                                fake.sent += len(data)
+                            if fake.rate:
+                                ahead = sent / fake.rate - (time.time() - t0)
+                                if ahead > 0:
+                                    time.sleep(ahead)
+                except OSError:
+                    self.close_connection = True
+
+        return Handler
@@ -0,0 +1,270 @@
+# File Name : benchmarks/fake_job_server.py
+"""
+Stand-in lokal untuk API /vastai_server (hanya stdlib):
+get_job, lease_jobs, heartbeat, release_jobs, get_workflow,
+receive_files_image, receive_files_image_hd, upload_chunk, generate_type.
+Mode hd dengan workflow_cache=True: job membawa WORKFLOW_HASH + WORKFLOW_PATCH, dan
+WORKFLOW hanya dikirim jika hash belum ada di WORKFLOW_HASHES worker.
+upload_chunk: upload video resumable (offset per upload_id, sha256 dicek saat lengkap);
+fail_chunks = nomor urut chunk yang dijawab 500 (fault injection).
+
+    with FakeJobServer(jobs=100, mode="sd") as server:
+        client.HOST_MY_PC_LOCAL = server.host
+"""
+import base64
+import hashlib
+import json
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+DEFAULT_WORKFLOW = {
+    "3": {"class_type": "easy seed", "inputs": {"seed": 0}, "_meta": {"title": "Seed"}},
+    "6": {"class_type": "CLIPTextEncode", "inputs": {"text": ""}, "_meta": {"title": "POSITIVE_PROMPT"}},
+    "7": {"class_type": "CLIPTextEncode", "inputs": {"text": ""}, "_meta": {"title": "NEGATIVE_PROMPT"}},
+    "9": {"class_type": "SaveImage", "inputs": {"images": ["8", 0], "filename_prefix": "x"},
+          "_meta": {"title": "Save Image"}},
+}
+
+
+class FakeJobServer:
+    def __init__(self, jobs=10, mode="sd", workflow=None, lease_support=True, lease_s=300,
+                 multipart_support=True, job_delay=0.0, workflow_cache=False, chunked_upload=True,
+                 fail_chunks=(), port=0):
+        self.mode = mode
+        self.workflow = workflow or DEFAULT_WORKFLOW
+        self.workflow_cache = workflow_cache
+        self.workflow_raw = json.dumps(self.workflow).encode("utf-8")
+        self.workflow_hash = hashlib.sha256(self.workflow_raw).hexdigest()
+        self.workflow_zb64 = base64.b64encode(zlib.compress(self.workflow_raw)).decode("ascii")
+        self.job_bytes = 0  # total byte response get_job / lease_jobs
+        self.chunked_upload = chunked_upload
+        self.fail_chunks = set(fail_chunks)
+        self.chunks = 0
+        self.chunk_uploads = {}  # upload_id -> {"received", "total", "sha256", "digest", "verified"}
+        self.lease_support = lease_support
+        self.lease_s = lease_s
+        self.multipart_support = multipart_support
+        self.job_delay = job_delay
+        self.todo = [self._make_task(i) for i in range(1, jobs + 1)]
+        self.leases = {}  # job_id -> (worker, deadline, task)
+        self.done = {}
+        self.requests = {}
+        self.upload_bytes = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self.host = f"127.0.0.1:{self._server.server_address[1]}"
+
+    # ----- lifecycle -----
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def add_jobs(self, count):
+        with self._lock:
+            start = len(self.todo) + len(self.leases) + len(self.done) + 1
+            self.todo.extend(self._make_task(i) for i in range(start, start + count))
+
+    def request_count(self, endpoint=None):
+        if endpoint:
+            return self.requests.get(endpoint, 0)
+        return sum(self.requests.values())
+
+    # ----- job -----
+    def _make_task(self, i):
+        task = {"job_id": f"job-{i}", "number": i}
+        if self.mode == "hd":
+            task["png_file"] = f"/data/char/char_{i}.png"
+        else:
+            task.update({"text_prompt": f"prompt {i}", "char_name_input": "char", "seed": i})
+        return task
+
+    def _job_response(self, task, known=()):
+        data = {"status": "ok", "task": task}
+        if self.mode == "hd":
+            if not self.workflow_cache:
+                data["WORKFLOW"] = self.workflow_zb64
+                return data
+            data["WORKFLOW_HASH"] = self.workflow_hash
+            data["WORKFLOW_PATCH"] = {"seed": task["number"]}
+            if self.workflow_hash not in known:
+                data["WORKFLOW"] = self.workflow_zb64
+                known.add(self.workflow_hash)  # satu response lease: WORKFLOW cukup sekali
+        return data
+
+    def _take(self, worker, count):
+        now = time.time()
+        with self._lock:
+            # Lease kedaluwarsa (worker mati / tidak heartbeat) -> kembali ke antrian
+            for job_id, (_, deadline, task) in list(self.leases.items()):
+                if deadline < now:
+                    del self.leases[job_id]
+                    self.todo.insert(0, task)
+            tasks = self.todo[:count]
+            del self.todo[:count]
+            for task in tasks:
+                self.leases[task["job_id"]] = (worker, now + self.lease_s, task)
+        return tasks
+
+    def _finish(self, job_id, nbytes):
+        with self._lock:
+            self.leases.pop(job_id, None)
+            self.done[job_id] = self.done.get(job_id, 0) + 1
+            self.upload_bytes += nbytes
+
+    def _chunk(self, fields):
+        """Return (status, body) untuk satu request upload_chunk."""
+        with self._lock:
+            upload = self.chunk_uploads.setdefault(fields["upload_id"], {
+                "received": 0, "total": int(fields["total_size"]), "sha256": fields["sha256"],
+                "digest": hashlib.sha256(), "verified": None})
+            if "CHUNK" not in fields:
+                return 200, {"status": "ok", "received": upload["received"]}
+            self.chunks += 1
+            if self.chunks in self.fail_chunks:
+                return 500, {"error": "fault injection"}
+            if int(fields["offset"]) != upload["received"]:
+                return 409, {"status": "offset", "received": upload["received"]}
+            upload["digest"].update(fields["CHUNK"])
+            upload["received"] += len(fields["CHUNK"])
+            self.upload_bytes += len(fields["CHUNK"])
+            done = upload["received"] >= upload["total"]
+            if done:
+                upload["verified"] = upload["digest"].hexdigest() == upload["sha256"]
+        if done:
+            self._finish(fields.get("job_id"), 0)
+        return 200, {"status": "done" if done else "ok", "received": upload["received"]}
+
+    # ----- HTTP -----
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+            wbufsize = 1 << 16
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, code, body, count=False):
+                if isinstance(body, (dict, list)):
+                    body = json.dumps(body).encode("utf-8")
+                if count:
+                    with fake._lock:
+                        fake.job_bytes += len(body)
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _body(self):
+                raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if self.headers.get("Content-Encoding") == "gzip":
+                    raw = zlib.decompress(raw, 16 + zlib.MAX_WBITS)
+                return raw
+
+            def _fields(self, raw):
+                ctype = self.headers.get("Content-Type", "")
+                if ctype.startswith("multipart/form-data"):
+                    boundary = ctype.split("boundary=", 1)[1].encode()
+                    fields = {}
+                    for part in raw.split(b"--" + boundary)[1:-1]:
+                        head, _, value = part[2:-2].partition(b"\r\n\r\n")
+                        name = head.split(b'name="', 1)[1].split(b'"', 1)[0].decode()
+                        fields[name] = value if b"filename=" in head else value.decode()
+                    return fields
+                return json.loads(raw or b"{}")
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                endpoint = url.path.rsplit("/", 1)[-1]
+                fake.requests[endpoint] = fake.requests.get(endpoint, 0) + 1
+                if endpoint == "get_workflow":
+                    wanted = parse_qs(url.query).get("hash", [fake.workflow_hash])[0]
+                    if wanted != fake.workflow_hash:
+                        return self._send(404, {})
+                    return self._send(200, fake.workflow_raw)
+                self._send(404, {})
+
+            def do_POST(self):
+                endpoint = self.path.rsplit("/", 1)[-1]
+                fake.requests[endpoint] = fake.requests.get(endpoint, 0) + 1
+                raw = self._body()
+
+                if endpoint in ("receive_files_image", "receive_files_image_hd"):
+                    multipart = self.headers.get("Content-Type", "").startswith("multipart")
+                    if multipart and not fake.multipart_support:
+                        return self._send(415, {"error": "multipart tidak didukung"})
+                    fields = self._fields(raw)
+                    fake._finish(fields.get("job_id"), len(raw))
+                    return self._send(200, {"status": "ok"})
+
+                if endpoint == "upload_chunk":
+                    if not fake.chunked_upload:
+                        return self._send(404, {})
+                    return self._send(*fake._chunk(self._fields(raw)))
+
+                body = json.loads(raw or b"{}")
+                worker = body.get("WORKER_ID")
+                known = set(body.get("WORKFLOW_HASHES") or ())
+                if fake.job_delay:
+                    time.sleep(fake.job_delay)
+                if endpoint == "generate_type":
+                    return self._send(200, {"is_upscale": fake.mode == "hd"})
+                if endpoint == "get_job":
+                    tasks = fake._take(worker, 1)
+                    return self._send(200, fake._job_response(tasks[0], known) if tasks else {"status": "empty"},
+                                      count=True)
+                if not fake.lease_support:
+                    return self._send(404, {})
+                if endpoint == "lease_jobs":
+                    tasks = fake._take(worker, int(body.get("count", 1)))
+                    if not tasks:
+                        return self._send(200, {"status": "empty"})
+                    return self._send(200, {"status": "ok", "jobs": [fake._job_response(t, known) for t in tasks]},
+                                      count=True)
+                if endpoint == "heartbeat":
+                    lost = []
+                    with fake._lock:
+                        for job_id in body.get("job_ids", []):
+                            lease = fake.leases.get(job_id)
+                            if lease and lease[0] == worker:
+                                fake.leases[job_id] = (worker, time.time() + float(body.get("lease_s", fake.lease_s)), lease[2])
+                            else:
+                                lost.append(job_id)
+                    return self._send(200, {"status": "ok", "lost": lost})
+                if endpoint == "release_jobs":
+                    with fake._lock:
+                        for job_id in body.get("job_ids", []):
+                            lease = fake.leases.pop(job_id, None)
+                            if lease:
+                                fake.todo.insert(0, lease[2])
+                    return self._send(200, {"status": "ok"})
+                self._send(404, {})
+
+        return Handler
+
+
+if __name__ == "__main__":
+    with FakeJobServer(jobs=100) as server:
+        print(f"Fake job server di {server.host} (Ctrl+C untuk berhenti)")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,157 @@
+# File Name : benchmarks/fake_model_server.py
+"""
+Stand-in lokal untuk host model (Hugging Face resolve/, hanya stdlib): HEAD dengan
+Content-Length + X-Linked-Etag (sha256), GET dengan Range, batas kecepatan per koneksi
+(seperti CDN) dan fault injection untuk menguji resume.
+
+    with FakeModelServer({"vae/vae.safetensors": 64 << 20}, rate_mb=20) as server:
+        url = server.url("vae/vae.safetensors")
+"""
+import hashlib
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PATTERN_LEN = 1048573  # prima: chunk di offset berbeda tidak identik
+
+
+class FakeModelServer:
+    def __init__(self, files, rate_mb=0, port=0):
+        """files: {path: ukuran byte}; rate_mb: batas MB/s per koneksi (0 = tanpa batas)."""
+        self.files = dict(files)
+        self.rate = rate_mb * 1e6
+        self.fail_after = None  # total byte terkirim sebelum server mulai menjawab 503
+        self.ranges = True  # False = header Range diabaikan (selalu 200 + file utuh)
+        self.sent = 0
+        self.stats = {"head": 0, "get": 0, "range": 0, "503": 0}
+        self._patterns = {path: self._pattern(path) for path in self.files}
+        self.sha256 = {path: self._digest(path) for path in self.files}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def url(self, path):
+        return f"{self.base_url}/{path}"
+
+    # ----- isi file: deterministik, tidak disimpan di memori selain satu pola per file -----
+    @staticmethod
+    def _pattern(path):
+        seed = hashlib.sha256(path.encode("utf-8")).digest()
+        return (seed * (PATTERN_LEN // 32 + 1))[:PATTERN_LEN] * 2
+
+    def content(self, path, start, end):
+        """Byte [start, end] file `path`, dipotong per potongan <= PATTERN_LEN."""
+        pattern = self._patterns[path]
+        while start <= end:
+            offset = start % PATTERN_LEN
+            n = min(end - start + 1, PATTERN_LEN)
+            yield pattern[offset:offset + n]
+            start += n
+
+    def _digest(self, path):
+        digest = hashlib.sha256()
+        for data in self.content(path, 0, self.files[path] - 1):
+            digest.update(data)
+        return digest.hexdigest()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _lookup(self):
+                path = self.path.lstrip("/")
+                if path not in fake.files:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return None
+                return path
+
+            def do_HEAD(self):
+                fake.stats["head"] += 1
+                path = self._lookup()
+                if path is None:
+                    return
+                self.send_response(200)
+                self.send_header("Content-Length", str(fake.files[path]))
+                self.send_header("Accept-Ranges", "bytes")
+                self.send_header("X-Linked-Etag", f'"{fake.sha256[path]}"')
+                self.end_headers()
+
+            def do_GET(self):
+                fake.stats["get"] += 1
+                path = self._lookup()
+                if path is None:
+                    return
+                if fake.fail_after is not None and fake.sent >= fake.fail_after:
+                    fake.stats["503"] += 1
+                    self.send_response(503)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                size = fake.files[path]
+                start, end = 0, size - 1
+                match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+                if match and fake.ranges:
+                    fake.stats["range"] += 1
+                    start = int(match.group(1))
+                    end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+                else:
+                    self.send_response(200)
+                self.send_header("Content-Length", str(end - start + 1))
+                self.send_header("Accept-Ranges", "bytes")
+                self.end_headers()
+                t0 = time.time()
+                sent = 0
+                try:
+                    for data in fake.content(path, start, end):
+                        for i in range(0, len(data), 1 << 16):
+                            piece = data[i:i + (1 << 16)]
+                            if fake.fail_after is not None and fake.sent >= fake.fail_after:
+                                self.close_connection = True
+                                return  # putus di tengah response
+                            self.wfile.write(piece)
+                            sent += len(piece)
+                            with fake._lock:
+                                fake.sent += len(piece)
+                            if fake.rate:
+                                ahead = sent / fake.rate - (time.time() - t0)
+                                if ahead > 0:
+                                    time.sleep(ahead)
+                except OSError:
+                    self.close_connection = True
+
+        return Handler
+
+
+if __name__ == "__main__":
+    with FakeModelServer({"checkpoints/model.safetensors": 256 << 20}, rate_mb=20) as server:
+        print(f"Fake model server di {server.base_url} (Ctrl+C untuk berhenti)")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
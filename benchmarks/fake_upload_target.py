@@ -0,0 +1,55 @@
+# File Name : benchmarks/fake_upload_target.py
+"""
+Stand-in lokal untuk repo Hugging Face (HfTarget di vast_tools.py): file disimpan di folder
+biasa, semua upload/download dicatat supaya byte yang benar-benar dikirim bisa diukur.
+
+    target = FakeUploadTarget(tempfile.mkdtemp())
+    vast_tools.upload_incremental("/data/output", target)
+"""
+import os
+import shutil
+import threading
+import time
+
+
+class FakeUploadTarget:
+    def __init__(self, root, rate_mb=0, fail_uploads=()):
+        """rate_mb: bandwidth upload total (MB/s, 0 = tanpa batas); fail_uploads: nomor upload (0-based) yang gagal."""
+        self.root = root
+        self.rate = rate_mb * 1e6
+        self.fail_uploads = set(fail_uploads)
+        self.uploads = []  # (path_in_repo, byte)
+        self.downloads = []
+        self.attempts = 0
+        self._link = threading.Lock()  # satu link jaringan: upload bersamaan berbagi bandwidth
+
+    def _path(self, path_in_repo):
+        return os.path.join(self.root, *path_in_repo.split("/"))
+
+    def upload_file(self, local_path, path_in_repo):
+        attempt = self.attempts
+        self.attempts += 1
+        size = os.path.getsize(local_path)
+        if self.rate:
+            # kirim per 1 MB bergantian dengan upload lain
+            for _ in range(0, size, 1 << 20):
+                with self._link:
+                    time.sleep(min(size, 1 << 20) / self.rate)
+        if attempt in self.fail_uploads:
+            raise ConnectionError(f"upload {path_in_repo} terputus (simulasi)")
+        dest = self._path(path_in_repo)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        shutil.copyfile(local_path, dest)
+        self.uploads.append((path_in_repo, os.path.getsize(local_path)))
+        return f"file://{dest}"
+
+    def download_file(self, path_in_repo, local_path):
+        src = self._path(path_in_repo)
+        if not os.path.exists(src):
+            return False
+        shutil.copyfile(src, local_path)
+        self.downloads.append(path_in_repo)
+        return True
+
+    def uploaded_bytes(self):
+        return sum(size for _, size in self.uploads)
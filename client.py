@@ -6,45 +6,64 @@ import re
 import uuid
 import json
 import time
-from concurrent.futures import ThreadPoolExecutor
-from urllib import request as urllib_request
-from urllib import parse as urllib_parse
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+import queue
 import base64
 import platform
 import zlib
-# External libraries (install if missing)
+import gzip
+import random
+import struct
+import collections
+import signal
+import hashlib
+import shutil
+# External libraries: dicek/diinstall lewat `python client.py preflight`, bukan saat import
 import importlib
 import subprocess
 import threading
 is_upscale = False
 
-def install_dependencies():
-    required_packages = {
-        "websocket": "websocket-client",
-        "huggingface_hub": "huggingface-hub",
-        "pyminizip": "pyminizip",
-        "socketio": "python-socketio[client]",
-        "requests": "requests",
-        "PIL": "Pillow",
-        "colorama": "colorama"  # ✅ tambah colorama
-    }
-    for module_name, pip_name in required_packages.items():
-        try:
-            importlib.import_module(module_name)
-        except ImportError:
-            print(f"❌ Modul '{module_name}' tidak ditemukan. Menginstal '{pip_name}' ...")
-            subprocess.check_call([sys.executable, "-m", "pip", "install", pip_name])
+# modul -> nama paket pip. PIL/websocket/aiohttp di-import lazy di tempat dipakai.
+REQUIRED_PACKAGES = {
+    "websocket": "websocket-client",
+    "requests": "requests",
+    "PIL": "Pillow",
+    "colorama": "colorama",
+}
+OPTIONAL_PACKAGES = {
+    "aiohttp": "aiohttp",  # hanya untuk AsyncComfyGenerator
+}
+
+def install_dependencies(packages=None):
+    for module_name, pip_name in (packages or REQUIRED_PACKAGES).items():
+        ensure_module(module_name, pip_name)
+
+def ensure_module(module_name, pip_name):
+    """Import modul, install lewat pip dulu jika belum ada."""
+    try:
+        return importlib.import_module(module_name)
+    except ImportError:
+        print(f"❌ Modul '{module_name}' tidak ditemukan. Menginstal '{pip_name}' ...")
+        subprocess.check_call([sys.executable, "-m", "pip", "install", pip_name])
+        return importlib.import_module(module_name)
 
+def preflight(include_optional=False):
+    """Cek + install dependency sekali (dijalankan saat provisioning, bukan tiap start worker)."""
+    packages = dict(REQUIRED_PACKAGES, **(OPTIONAL_PACKAGES if include_optional else {}))
+    t0 = time.time()
+    install_dependencies(packages)
+    print(f"✅ Preflight OK: {', '.join(packages)} ({time.time() - t0:.1f}s)")
 
-# Pastikan dependencies terpasang sebelum import
-install_dependencies()
+
+# `python client.py preflight [all]` harus jalan sebelum import library eksternal di bawah
+if __name__ == "__main__" and sys.argv[1:2] == ["preflight"]:
+    preflight(include_optional=sys.argv[2:3] == ["all"])
+    sys.exit(0)
 
 import requests
-from PIL import Image, PngImagePlugin
-from websocket import create_connection, WebSocketException
+from requests.adapters import HTTPAdapter
 from colorama import Fore, Style, init
-import urllib.request
-import urllib.parse
 
 init(autoreset=True)
 
@@ -56,12 +75,283 @@ def get_open_button_token():
 OPEN_BUTTON_TOKEN = get_open_button_token()
 
 COMFYUI_SERVER = "127.0.0.1:8188"
+# Satu ComfyUI per GPU (mis. 127.0.0.1:8188,127.0.0.1:8189); lebih dari satu -> ComfyPool
+COMFYUI_SERVERS = [s for s in os.getenv("COMFYUI_SERVERS", "").split(",") if s] or [COMFYUI_SERVER]
+COMFYUI_SERVER = COMFYUI_SERVERS[0]
 script_path = os.path.dirname(os.path.abspath(sys.argv[0]))
 VASTAI_API_KEY = None
-upload_executor = ThreadPoolExecutor(max_workers=8)
+UPLOAD_WORKERS = 4  # worker upload tetap
+UPLOAD_QUEUE_SIZE = 8  # antrian upload penuh -> loop generate menunggu (backpressure)
+UPLOAD_MODE = "multipart"  # "multipart" = stream biner dari disk, "json" = base64 lama
+UPLOAD_CHUNK_MB = 8  # video diupload per chunk (resumable) lewat upload_chunk (override: CHUNK_MB=n)
+CHUNKED_UPLOAD = True  # False setelah server menjawab 404 untuk upload_chunk
+# Output video/animasi di history ComfyUI (VHS_VideoCombine -> "gifs"): di-stream ke disk, bukan ke RAM
+MEDIA_OUTPUT_KEYS = ("gifs", "videos")
+STREAM_CHUNK = 1 << 20
+PIPELINE_DEPTH = 2  # jumlah prompt yang dijaga tetap antri di ComfyUI (override: DEPTH=n)
+JOB_BATCH = 4  # jumlah task per lease (override: BATCH=n, 1 = get_job lama)
+LEASE_SECONDS = 300  # lama lease; heartbeat tiap LEASE_SECONDS / 3
+OUTPUT_MODE = "http"  # "ws" = terima gambar lewat websocket (SaveImageWebsocket), HTTP sebagai fallback
 WORKFLOW_FILE = "workflow.json"
 HOST_MY_PC_LOCAL = "aichanstudio.xyz"
 
+GZIP_JSON = False  # gzip body JSON ke job server (server harus menerima Content-Encoding: gzip)
+WARMUP = True  # queue workflow mini (1 step) untuk load model selagi job pertama diambil (WARMUP=no)
+JOB_TIMEOUT = (5, 60)  # (connect, read) detik
+UPLOAD_TIMEOUT = (5, 300)
+RESULT_CACHE_DIR = "result_cache"  # cache output SD (di script_path), key = hash workflow (CACHE=no)
+RESULT_CACHE_MB = 2048  # batas ukuran cache, LRU (override: CACHE_MB=n)
+WORKFLOW_CACHE_DIR = "workflow_cache"  # workflow HD per hash (di script_path), job cukup kirim hash + patch (WF_CACHE=no)
+WORKFLOW_CACHE_SIZE = 16  # jumlah workflow yang disimpan & diumumkan ke job server (LRU)
+JOURNAL_FILE = "job_journal.jsonl"  # journal state job (di script_path) untuk resume setelah crash (JOURNAL=no)
+SHUTDOWN = threading.Event()  # di-set oleh SIGTERM: berhenti ambil job, selesaikan yang sedang jalan
+METRICS_HOST = "127.0.0.1"  # endpoint /metrics (Prometheus) dan /metrics.json; METRICS_HOST=0.0.0.0 untuk scrape dari luar
+METRICS_PORT = 9101  # 0 / METRICS=no = tidak di-serve (override: METRICS=port)
+# Job server kosong -> tunggu job baru (poll backoff) sebelum destroy instance.
+# None = otomatis: selama waktu cold start (download + load model), karena menunggu lebih lama
+# dari itu lebih mahal daripada menyewa instance baru nanti. 0 = langsung berhenti (IDLE=auto|detik)
+IDLE_GRACE_S = None
+IDLE_GRACE_RANGE = (30, 900)  # batas grace otomatis (detik)
+IDLE_POLL_S = (1.0, 30.0)  # interval poll saat idle: mulai, lalu x2 sampai maksimum
+COLD_START_S = float(os.getenv("COLD_START_S", 0) or 0)  # waktu provisioning sebelum client.py (diekspor onstart)
+GPU_PRICE_PER_HOUR = float(os.getenv("GPU_PRICE_PER_HOUR", 0) or 0)  # $/jam instance (PRICE=)
+IDLE_MAX_COST = None  # batas biaya idle dalam $ per periode idle (IDLE_MAX_COST=)
+PROCESS_STARTED = time.time()
+COMFYUI_DIR = "/workspace/ComfyUI"
+# models.json (path / URL) untuk model_provisioner: model workflow yang belum ada didownload
+# paralel sebelum job pertama. None = model harus sudah ada (MODELS=path|url)
+MODEL_MANIFEST = os.getenv("MODEL_MANIFEST") or None
+
+
+class HttpTransport:
+    """
+    Satu requests.Session (pool keep-alive) yang dipakai bersama oleh ComfyGenerator
+    dan request ke job server: timeout per panggilan, retry dengan jittered backoff,
+    gzip opsional untuk body JSON, dan download paralel terbatas.
+    """
+    RETRY_STATUS = (429, 502, 503, 504)
+
+    def __init__(self, pool_size=16, timeout=JOB_TIMEOUT, retries=3, backoff=0.5, gzip_json=None):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.gzip_json = gzip_json
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def request(self, method, url, json_body=None, headers=None, timeout=None, retries=None, gzip_json=None, **kwargs):
+        headers = dict(headers or {})
+        if json_body is not None:
+            body = json.dumps(json_body).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+            use_gzip = next(v for v in (gzip_json, self.gzip_json, GZIP_JSON) if v is not None)
+            if use_gzip and len(body) > 1024:
+                body = gzip.compress(body, compresslevel=5)
+                headers["Content-Encoding"] = "gzip"
+            kwargs["data"] = body
+        # POST tidak di-retry kecuali diminta (hindari prompt/job dobel)
+        if retries is None:
+            retries = self.retries if method.upper() in ("GET", "HEAD", "DELETE") else 0
+
+        for attempt in range(retries + 1):
+            try:
+                resp = self.session.request(method, url, headers=headers, timeout=timeout or self.timeout, **kwargs)
+                if resp.status_code not in self.RETRY_STATUS or attempt == retries:
+                    return resp
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if attempt == retries:
+                    raise
+            # jitter supaya ratusan worker tidak retry bersamaan
+            time.sleep(self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5))
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, json_body=None, **kwargs):
+        return self.request("POST", url, json_body=json_body, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request("DELETE", url, **kwargs)
+
+    def download_many(self, fetchers, max_workers=4):
+        """
+        Jalankan fungsi download (tanpa argumen) paralel dengan konkurensi terbatas.
+        Return list (hasil, error) sesuai urutan input.
+        """
+        def run(fetch):
+            try:
+                return fetch(), None
+            except Exception as e:
+                return None, e
+
+        if len(fetchers) <= 1:
+            return [run(fetch) for fetch in fetchers]
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(fetchers))) as pool:
+            return list(pool.map(run, fetchers))
+
+
+HTTP = HttpTransport()
+
+
+class WorkerMetrics:
+    """
+    Metrik worker thread-safe: histogram waktu per fase job, counter, dan gauge.
+    Di-serve sebagai Prometheus text (/metrics) dan JSON (/metrics.json) dengan label worker_id,
+    supaya worker lambat di antara ratusan instance bisa dicari dari satu dashboard.
+
+    Fase: job_fetch, queue_wait, gpu_exec, gpu_idle, history_fetch, image_download,
+    image_save, upload, job_total.
+    """
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+    PREFIX = "vast_worker"
+
+    def __init__(self, recent=1024):
+        self.started = time.time()
+        self.counters = {}
+        self.phases = {}  # fase -> {"buckets": [...], "count", "sum", "recent": deque}
+        self.gauges = {}  # nama -> callable atau angka
+        self.recent = recent
+        self._lock = threading.Lock()
+        self._server = None
+
+    def observe(self, phase, seconds):
+        with self._lock:
+            hist = self.phases.get(phase)
+            if hist is None:
+                hist = self.phases[phase] = {"buckets": [0] * len(self.BUCKETS), "count": 0, "sum": 0.0,
+                                             "recent": collections.deque(maxlen=self.recent)}
+            for i, bound in enumerate(self.BUCKETS):
+                if seconds <= bound:
+                    hist["buckets"][i] += 1
+            hist["count"] += 1
+            hist["sum"] += seconds
+            hist["recent"].append(seconds)
+
+    def timer(self, phase):
+        """with METRICS.timer("fase"): ... -> observe(durasi)."""
+        metrics = self
+
+        class _Timer:
+            def __enter__(self):
+                self.t0 = time.perf_counter()
+                return self
+
+            def __exit__(self, *exc):
+                metrics.observe(phase, time.perf_counter() - self.t0)
+
+        return _Timer()
+
+    def inc(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def gauge(self, name, value):
+        """value boleh angka atau callable (dibaca saat scrape, mis. uploads.depth)."""
+        with self._lock:
+            self.gauges[name] = value
+
+    def _gauge_values(self):
+        uptime = max(time.time() - self.started, 1e-6)
+        values = {"uptime_seconds": uptime,
+                  "jobs_per_second": self.counters.get("jobs_completed", 0) / uptime}
+        for name, value in list(self.gauges.items()):
+            try:
+                values[name] = value() if callable(value) else value
+            except Exception:
+                continue
+        return values
+
+    def snapshot(self):
+        with self._lock:
+            phases = {}
+            for phase, hist in self.phases.items():
+                recent = sorted(hist["recent"])
+                phases[phase] = {
+                    "count": hist["count"],
+                    "sum": round(hist["sum"], 6),
+                    "avg": hist["sum"] / hist["count"],
+                    "p50": recent[len(recent) // 2],
+                    "p99": recent[min(len(recent) - 1, int(len(recent) * 0.99))],
+                }
+            counters = dict(self.counters)
+            gauges = self._gauge_values()
+        return {"worker_id": WORKER_ID, "counters": counters, "gauges": gauges, "phases": phases}
+
+    def prometheus(self):
+        label = 'worker_id="%s"' % str(WORKER_ID).replace('"', "'")
+        p = self.PREFIX
+        lines = []
+        with self._lock:
+            lines.append(f"# TYPE {p}_phase_seconds histogram")
+            for phase, hist in sorted(self.phases.items()):
+                labels = f'{label},phase="{phase}"'
+                for bound, count in zip(self.BUCKETS, hist["buckets"]):
+                    lines.append(f'{p}_phase_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'{p}_phase_seconds_bucket{{{labels},le="+Inf"}} {hist["count"]}')
+                lines.append(f"{p}_phase_seconds_sum{{{labels}}} {hist['sum']:.6f}")
+                lines.append(f"{p}_phase_seconds_count{{{labels}}} {hist['count']}")
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"# TYPE {p}_{name}_total counter")
+                lines.append(f"{p}_{name}_total{{{label}}} {value}")
+            for name, value in sorted(self._gauge_values().items()):
+                lines.append(f"# TYPE {p}_{name} gauge")
+                lines.append(f"{p}_{name}{{{label}}} {value}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port=None, host=None):
+        """Jalankan endpoint HTTP di thread daemon. Return alamat, atau None jika gagal bind."""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                path = self.path.split("?", 1)[0]
+                if path == "/metrics":
+                    body, ctype = metrics.prometheus().encode("utf-8"), "text/plain; version=0.0.4"
+                elif path == "/metrics.json":
+                    body, ctype = json.dumps(metrics.snapshot()).encode("utf-8"), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        port = METRICS_PORT if port is None else port
+        try:
+            self._server = ThreadingHTTPServer((host or METRICS_HOST, port), Handler)
+        except OSError as e:
+            print(f"{Fore.YELLOW}⚠ Endpoint metrics tidak bisa dibuka di port {port}: {e}{Style.RESET_ALL}")
+            return None
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        address = f"{self._server.server_address[0]}:{self._server.server_address[1]}"
+        print(f"{Fore.CYAN}📈 Metrics: http://{address}/metrics (JSON: /metrics.json){Style.RESET_ALL}")
+        return address
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def report(self):
+        snap = self.snapshot()
+        parts = [f"{phase} {st['avg'] * 1000:.0f}ms" for phase, st in sorted(snap["phases"].items())]
+        print(f"{Fore.CYAN}📈 Rata-rata per fase: {', '.join(parts) or '-'} | "
+              f"{snap['gauges']['jobs_per_second']:.2f} job/s{Style.RESET_ALL}")
+
+
+METRICS = WorkerMetrics()
+
+
 def my_instance_id():
     raw_instance = os.environ.get("VAST_CONTAINERLABEL")  # misal "C.25862941" atau "A.123456"
     if not raw_instance:
@@ -98,6 +388,46 @@ def get_lora_list(path_json_file: str):
 
     return sorted(lora_list)
 
+def ensure_models(workflow_path):
+    """
+    Pastikan model yang dibutuhkan workflow (ckpt, LoRA, VAE, CLIP, text encoder) ada sebelum
+    job pertama; yang belum ada didownload model_provisioner dari MODEL_MANIFEST.
+    Return False jika ada LoRA yang tetap tidak ada. Model lain yang hilang hanya diperingatkan
+    (bisa saja ada di extra_model_paths ComfyUI).
+    """
+    try:
+        import model_provisioner
+    except ImportError:
+        # client.py dipakai tanpa model_provisioner.py: cek LoRA saja seperti dulu
+        model_provisioner = None
+    if model_provisioner is None:
+        lora_dir = os.path.join(COMFYUI_DIR, "models", "loras")
+        missing = [name for name in get_lora_list(workflow_path) if not os.path.exists(os.path.join(lora_dir, name))]
+        for name in missing:
+            print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} File lora tidak ditemukan: {os.path.join(lora_dir, name)}")
+        return not missing
+
+    with open(workflow_path, "r", encoding="utf-8") as f:
+        workflow = json.load(f)
+    try:
+        manifest = model_provisioner.load_manifest(MODEL_MANIFEST)
+    except Exception as e:
+        print(f"{Fore.YELLOW}⚠ Manifest model tidak bisa dibaca ({e}), hanya cek file yang ada{Style.RESET_ALL}")
+        manifest = {"models": []}
+    _, specs, results = model_provisioner.provision_workflow(workflow, manifest, comfy_dir=COMFYUI_DIR)
+    ok = True
+    for spec in specs:
+        status = results[(spec["folder"], spec["name"])]["status"]
+        if status in ("ada", "store", "download"):
+            continue
+        path = os.path.join(COMFYUI_DIR, "models", spec["folder"], spec["name"])
+        if spec["folder"] == "loras":
+            print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} File lora tidak ditemukan: {path} ({status})")
+            ok = False
+        else:
+            print(f"{Fore.YELLOW}⚠ Model tidak ditemukan: {path} ({status}){Style.RESET_ALL}")
+    return ok
+
 def delete_workflow_json(file_path):
 
     if os.path.exists(file_path):
@@ -123,7 +453,7 @@ def destroy_instance(instance_id):
             "Accept": "application/json",
             "Content-Type": "application/json"
         }
-    response = requests.delete(url, headers=headers)
+    response = HTTP.delete(url, headers=headers)
 
     if response.status_code == 200:
         print(f"Instance {instance_id} berhasil dihancurkan.")
@@ -133,58 +463,272 @@ def destroy_instance(instance_id):
         print("Response:", response.text)
         return False
 
-def check_comfyui_ready(server_address, check_interval=5):
+def check_comfyui_ready(server_address, check_interval=5, min_interval=0.1):
     """
     Cek apakah server ComfyUI siap menerima request
-    Menunggu hingga siap, menampilkan waktu menunggu
+    Menunggu hingga siap, menampilkan waktu menunggu.
+
+    Poll cepat dulu (min_interval) lalu backoff x2 sampai check_interval, jadi server
+    yang baru siap langsung terdeteksi. /system_stats harus menjawab dengan device GPU,
+    lalu /prompt (endpoint yang butuh auth) dicek sekali untuk memastikan token valid.
+    Return dict system_stats (truthy) saat siap.
     """
     start_time = time.time()
-    url = f"http://{server_address}/prompt"  # endpoint yang butuh auth
     headers = {}
     if OPEN_BUTTON_TOKEN:
         headers["Authorization"] = f"Bearer {OPEN_BUTTON_TOKEN}"
 
+    interval = min_interval
+    last_status = None
+    last_print = 0.0
     while True:
         try:
-            resp = requests.get(url, headers=headers, timeout=10)
-            elapsed = int(time.time() - start_time)
-            m, s = divmod(elapsed, 60)
-
-            if resp.status_code == 200:
-                print(f"{Fore.GREEN}✅ ComfyUI ready at {server_address} ({m}m {s}s){Style.RESET_ALL}")
-                return True
-            elif resp.status_code == 401:
+            resp = HTTP.get(f"http://{server_address}/system_stats", headers=headers, timeout=10, retries=0)
+            stats = resp.json() if resp.status_code == 200 else None
+            if stats is not None and not stats.get("devices"):
+                status = "belum ada device GPU"
+            elif stats is not None:
+                resp = HTTP.get(f"http://{server_address}/prompt", headers=headers, timeout=10, retries=0)
+                status = resp.status_code
+            else:
+                status = resp.status_code
+        except (requests.exceptions.RequestException, ValueError) as e:
+            status = f"error koneksi: {e.__class__.__name__}"
+
+        elapsed = time.time() - start_time
+        m, s = divmod(int(elapsed), 60)
+        if status == 200:
+            device = stats["devices"][0]
+            vram = device.get("vram_total")
+            vram_info = f", VRAM {vram / 1024 ** 3:.1f} GB" if vram else ""
+            print(f"{Fore.GREEN}✅ ComfyUI ready at {server_address} ({elapsed:.1f}s, "
+                  f"{device.get('name', 'GPU')}{vram_info}){Style.RESET_ALL}")
+            return stats
+
+        # Jangan spam log saat poll cepat: print jika status berubah atau tiap check_interval
+        if status != last_status or time.time() - last_print >= check_interval:
+            if status == 401:
                 print(f"{Fore.YELLOW}⚠ ComfyUI not ready (401 Unauthorized). Menunggu... ({m}m {s}s){Style.RESET_ALL}")
+            elif isinstance(status, int):
+                print(f"{Fore.YELLOW}⚠ ComfyUI not ready (status {status}). Menunggu... ({m}m {s}s){Style.RESET_ALL}")
             else:
-                print(f"{Fore.YELLOW}⚠ ComfyUI not ready (status {resp.status_code}). Menunggu... ({m}m {s}s){Style.RESET_ALL}")
-        except requests.exceptions.RequestException as e:
-            elapsed = int(time.time() - start_time)
-            m, s = divmod(elapsed, 60)
-            print(f"{Fore.RED}❌ Error koneksi ke ComfyUI: {e}. Menunggu... ({m}m {s}s){Style.RESET_ALL}")
-
-        time.sleep(check_interval)
-    
-class LoadWorkFlow:
-    def __init__(self, workflow_path=None, workflow_json=None, resolution=None):
-        # Load workflow JSON
-        if workflow_json is not None:
-            json_data = workflow_json
-            workflow_path = workflow_path or None
+                print(f"{Fore.RED}❌ ComfyUI not ready ({status}). Menunggu... ({m}m {s}s){Style.RESET_ALL}")
+            last_status, last_print = status, time.time()
+
+        time.sleep(interval)
+        interval = min(interval * 2, check_interval)
+
+
+def start_warmup(cg, template):
+    """
+    Queue workflow mini (lihat WorkflowTemplate.warmup_workflow) tanpa menunggu,
+    supaya model di-load ke VRAM selagi job pertama diambil dari server.
+    Return Future; waktu warm-up dicetak terpisah dari latency job pertama.
+    """
+    t0 = time.time()
+    try:
+        # tanpa cache: warm-up harus benar-benar jalan di GPU supaya model ter-load
+        future = cg.submit_prompt(template.warmup_workflow(), use_cache=False)
+    except Exception as e:
+        print(f"{Fore.YELLOW}⚠ Warm-up dilewati: {e}{Style.RESET_ALL}")
+        return None
+
+    def report(f):
+        cg.warmup_seconds = time.time() - t0
+        if f.exception() is None and f.result() is not None:
+            print(f"{Fore.GREEN}🔥 Warm-up model selesai dalam {cg.warmup_seconds:.1f}s "
+                  f"({cg.server_address}){Style.RESET_ALL}")
         else:
-            if workflow_path is None:
-                raise ValueError("Workflow path tidak diberikan dan WORKFLOW_DEFAULT tidak ditemukan di config")
-            with open(workflow_path, "r", encoding="utf-8") as f:
-                json_data = json.load(f)
+            print(f"{Fore.YELLOW}⚠ Warm-up gagal setelah {cg.warmup_seconds:.1f}s (lanjut tanpa warm-up){Style.RESET_ALL}")
+
+    print(f"{Fore.CYAN}🔥 Warm-up model dimulai (1 step, latent kecil) di {cg.server_address}...{Style.RESET_ALL}")
+    future.add_done_callback(report)
+    return future
+
 
-        self.workflow_json = json_data
+class WorkflowTemplate:
+    """
+    Workflow yang di-parse sekali dan di-index (node id, _meta.title, class_type).
+    Instance per job dibuat lewat LoadWorkFlow(template=...) dengan copy-on-write:
+    hanya node yang diubah yang disalin, node lain dipakai bersama (read-only).
+    """
+    LORA_LOADER_TITLE = "Power Lora Loader (rgthree)"
+    _file_cache = {}
+
+    def __init__(self, workflow_json, workflow_path=None):
+        self.workflow_json = workflow_json
         self.workflow_path = workflow_path
+        self.by_title = {}
+        self.by_class = {}
+        self.slots = {}
+        self._value_index = None
+
+        for node_id, node in workflow_json.items():
+            if not isinstance(node, dict):
+                continue
+            title = node.get("_meta", {}).get("title")
+            if title is not None:
+                self.by_title.setdefault(title, []).append(node_id)
+            class_type = node.get("class_type")
+            if class_type is not None:
+                self.by_class.setdefault(class_type, []).append(node_id)
+        self._build_slots()
+
+    @classmethod
+    def from_file(cls, path):
+        """Parse file sekali; dipakai ulang selama file (mtime/size) tidak berubah."""
+        st = os.stat(path)
+        key = os.path.abspath(path)
+        cached = cls._file_cache.get(key)
+        if cached and cached[0] == (st.st_mtime_ns, st.st_size):
+            return cached[1]
+        with open(path, "r", encoding="utf-8") as f:
+            template = cls(json.load(f), workflow_path=path)
+        cls._file_cache[key] = ((st.st_mtime_ns, st.st_size), template)
+        return template
+
+    # ===== Slot parameter bernama: name -> [(node_id, input_key, sub_key)] =====
+    def _build_slots(self):
+        def first_with_input(node_ids, input_key):
+            for node_id in node_ids:
+                if input_key in self.workflow_json[node_id].get("inputs", {}):
+                    return [(node_id, input_key, None)]
+            return []
+
+        self.slots["seed"] = first_with_input(self.by_class.get("easy seed", []), "seed")
+        self.slots["positive_prompt"] = [(n, "text", None) for n in self.by_title.get("POSITIVE_PROMPT", [])[:1]]
+        self.slots["negative_prompt"] = [(n, "text", None) for n in self.by_title.get("NEGATIVE_PROMPT", [])[:1]]
+        self.slots["ckpt_name"] = first_with_input(self.by_class.get("CheckpointLoaderSimple", []), "ckpt_name")
+
+        # Toggle LoRA: slot "lora:<nama file>" -> inputs[lora_N]["on"]
+        for node_id in self.by_title.get(self.LORA_LOADER_TITLE, []):
+            for name, lora_data in self.workflow_json[node_id].get("inputs", {}).items():
+                if name.startswith("lora_") and isinstance(lora_data, dict) and lora_data.get("lora"):
+                    self.slots.setdefault(f"lora:{lora_data['lora']}", []).append((node_id, name, "on"))
+
+    def lora_names(self):
+        return sorted(name.split(":", 1)[1] for name in self.slots if name.startswith("lora:"))
+
+    def value_locations(self, value):
+        """Lokasi (node_id, input_key) dengan nilai input skalar == value (index dibuat sekali)."""
+        if self._value_index is None:
+            index = {}
+            for node_id, node in self.workflow_json.items():
+                if not isinstance(node, dict):
+                    continue
+                for key, v in node.get("inputs", {}).items():
+                    if isinstance(v, (str, int, float, bool)):
+                        index.setdefault((type(v), v), []).append((node_id, key))
+            self._value_index = index
+        return self._value_index.get((type(value), value), [])
+
+    def warmup_workflow(self, steps=1, size=64):
+        """
+        Versi mini workflow untuk warm-up: sampler 1 step, latent kecil, output PreviewImage.
+        Node loader (checkpoint/LoRA/VAE) tetap sama, jadi hasil load-nya di-cache ComfyUI
+        dan job pertama tidak perlu load model lagi.
+        """
+        wf = dict(self.workflow_json)
+        for node_id, node in self.workflow_json.items():
+            if not isinstance(node, dict):
+                continue
+            inputs = node.get("inputs", {})
+            patch = {}
+            if isinstance(inputs.get("steps"), int):
+                patch["steps"] = min(inputs["steps"], steps)
+            if "Latent" in node.get("class_type", "") and isinstance(inputs.get("width"), int):
+                patch.update(width=size, height=size)
+                if "batch_size" in inputs:
+                    patch["batch_size"] = 1
+            if node.get("class_type") in ("SaveImage", "SaveImageWebsocket"):
+                # PreviewImage menulis ke folder temp, bukan output
+                wf[node_id] = dict(node, class_type="PreviewImage",
+                                   inputs={"images": inputs.get("images")})
+            elif patch:
+                wf[node_id] = dict(node, inputs=dict(inputs, **patch))
+        return wf
+
+    def new_job(self, resolution=None, **params):
+        """LoadWorkFlow baru dari template; params = nama slot (seed, positive_prompt, ...)."""
+        wf = LoadWorkFlow(template=self, resolution=resolution)
+        for name, value in params.items():
+            if value is not None:
+                wf.set_param(name, value)
+        return wf
+
+
+class LoadWorkFlow:
+    def __init__(self, workflow_path=None, workflow_json=None, resolution=None, template=None):
+        # Load workflow JSON (template di-cache: file yang sama tidak di-parse ulang per job)
+        if template is None:
+            if workflow_json is not None:
+                template = WorkflowTemplate(workflow_json, workflow_path=workflow_path)
+            else:
+                if workflow_path is None:
+                    raise ValueError("Workflow path tidak diberikan dan WORKFLOW_DEFAULT tidak ditemukan di config")
+                template = WorkflowTemplate.from_file(workflow_path)
+
+        self.template = template
+        # Salinan dangkal: dict node dipakai bersama template sampai ditulis (copy-on-write)
+        self.workflow_json = dict(template.workflow_json)
+        self.workflow_path = workflow_path or template.workflow_path
+        self._owned = set()
 
         # Resolusi HD
         if resolution == "HD" and "24" in self.workflow_json:
-            self.workflow_json["24"]["inputs"]["image"] = ["7", 0]
+            self.set_input("24", "image", ["7", 0])
 
         # Set model
 
+    # ===== Copy-on-write: salin node (dan inputs) sebelum diubah =====
+    def _node_for_write(self, node_id):
+        node = self.workflow_json[node_id]
+        if node_id not in self._owned:
+            node = dict(node)
+            node["inputs"] = dict(node.get("inputs", {}))
+            self.workflow_json[node_id] = node
+            self._owned.add(node_id)
+        return node
+
+    def set_input(self, node_id, input_key, value, sub_key=None):
+        inputs = self._node_for_write(node_id)["inputs"]
+        if sub_key is None:
+            inputs[input_key] = value
+        else:
+            inputs[input_key] = dict(inputs[input_key])
+            inputs[input_key][sub_key] = value
+
+    def set_param(self, name, value):
+        """Isi slot bernama dari template (seed, positive_prompt, negative_prompt, ckpt_name, lora:<file>)."""
+        slots = self.template.slots.get(name)
+        if not slots:
+            return False
+        for node_id, input_key, sub_key in slots:
+            self.set_input(node_id, input_key, value, sub_key)
+        return True
+
+    def get_param(self, name):
+        slots = self.template.slots.get(name)
+        if not slots:
+            return None
+        node_id, input_key, sub_key = slots[0]
+        value = self.workflow_json[node_id].get("inputs", {}).get(input_key)
+        return value.get(sub_key) if sub_key is not None else value
+
+    def apply_patch(self, patch):
+        """
+        Patch parameter dari job: {node_id: {input_key: value}} atau {nama slot: value}.
+        Return jumlah key yang tidak dikenali (diabaikan).
+        """
+        unknown = 0
+        for key, value in (patch or {}).items():
+            if key in self.workflow_json and isinstance(value, dict):
+                for input_key, input_value in value.items():
+                    self.set_input(key, input_key, input_value)
+            elif not self.set_param(key, value):
+                unknown += 1
+        return unknown
+
     # ===== Load workflow dari file JSON =====
     def load_workflow(self, path=None):
         if self.workflow_json is None:
@@ -222,34 +766,31 @@ class LoadWorkFlow:
             raise ValueError("Workflow belum di-load")
 
         if new_seed is not None:
-            replaced = self.replace_easy_seed(self.workflow_json, new_seed)
-            if not replaced:
+            if not self.set_param("seed", new_seed):
                 raise ValueError("Tidak ditemukan node 'easy seed' di workflow")
             return new_seed
 
         # Ambil seed saat ini
-        for node in self.workflow_json.values():
-            if node.get("class_type") == "easy seed":
-                if "inputs" in node and "seed" in node["inputs"]:
-                    return node["inputs"]["seed"]
-        raise ValueError("Tidak ditemukan node 'easy seed' di workflow")
+        if not self.template.slots.get("seed"):
+            raise ValueError("Tidak ditemukan node 'easy seed' di workflow")
+        return self.get_param("seed")
 
     # ===== Model Handling =====
     def model(self, new_model_name=None):
         if self.workflow_json is None:
             raise ValueError("Workflow belum di-load")
 
-        replaced = False
-        for node in self.workflow_json.values():
-            if node.get("class_type") == "CheckpointLoaderSimple":
-                if "inputs" in node and "ckpt_name" in node["inputs"]:
-                    if new_model_name is None:
-                        return node["inputs"]["ckpt_name"]
-                    node["inputs"]["ckpt_name"] = new_model_name
-                    replaced = True
-                    break
-        if not replaced:
+        if not self.template.slots.get("ckpt_name"):
             raise ValueError("Tidak ditemukan node 'CheckpointLoaderSimple' di workflow")
+        if new_model_name is None:
+            return self.get_param("ckpt_name")
+        self.set_param("ckpt_name", new_model_name)
+
+    # ===== LoRA on/off (Power Lora Loader) =====
+    def lora(self, lora_name, enabled=None):
+        if enabled is None:
+            return self.get_param(f"lora:{lora_name}")
+        return self.set_param(f"lora:{lora_name}", bool(enabled))
 
     # ===== Ambil workflow JSON =====
     def workflow(self):
@@ -257,9 +798,9 @@ class LoadWorkFlow:
 
     # ===== Replace value by title (untuk prompt) =====
     def replace_value_by_title(self, title_to_find, new_text):
-        node = self.get_node_by_title(title_to_find)
-        if node and "inputs" in node:
-            node["inputs"]["text"] = new_text
+        node_ids = self.template.by_title.get(title_to_find)
+        if node_ids and "inputs" in self.workflow_json[node_ids[0]]:
+            self.set_input(node_ids[0], "text", new_text)
             return True
         return False
 
@@ -270,52 +811,477 @@ class LoadWorkFlow:
             return node.get("inputs", {}).get("text")
         return None
 
-    # ===== Cari node berdasarkan _meta['title'] =====
+    # ===== Cari node berdasarkan _meta['title'] (read-only, pakai set_input untuk mengubah) =====
     def get_node_by_title(self, title_to_find):
-        for node in self.workflow_json.values():
-            if node.get("_meta", {}).get("title") == title_to_find:
-                return node
+        node_ids = self.template.by_title.get(title_to_find)
+        if node_ids:
+            return self.workflow_json[node_ids[0]]
         return None
 
-    # ===== Static method untuk replace seed =====
+    # ===== Output lewat websocket: SaveImage -> SaveImageWebsocket =====
+    def use_websocket_output(self):
+        """Gambar dikirim sebagai frame biner websocket, tidak ditulis ke disk ComfyUI."""
+        node_ids = self.template.by_class.get("SaveImage", [])
+        for node_id in node_ids:
+            node = self._node_for_write(node_id)
+            node["class_type"] = "SaveImageWebsocket"
+            node["inputs"] = {"images": node["inputs"].get("images")}
+        return len(node_ids)
+
+    # ===== Replace nilai input skalar lewat index template (tanpa walk rekursif) =====
+    def replace_input_value(self, old_value, new_value):
+        locations = self.template.value_locations(old_value)
+        for node_id, input_key in locations:
+            self.set_input(node_id, input_key, new_value)
+        return len(locations)
+
+# ===== PNG metadata tanpa decode: sisipkan chunk tEXt/iTXt langsung ke stream PNG =====
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def png_chunk(tag, data):
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+
+def png_workflow_chunks(workflow_str):
+    """Chunk 'prompt' (tEXt + iTXt) dan 'workflow' (iTXt), sama seperti PngInfo yang dipakai sebelumnya."""
+    def itxt(key, value):
+        return png_chunk(b"iTXt", key + b"\0\0\0" + b"\0" + b"\0" + value.encode("utf-8"))
+
+    try:
+        text = png_chunk(b"tEXt", b"prompt\0" + workflow_str.encode("latin-1"))
+    except UnicodeEncodeError:
+        # Pillow juga jatuh ke iTXt jika teks bukan latin-1
+        text = itxt(b"prompt", workflow_str)
+    return text + itxt(b"prompt", workflow_str) + itxt(b"workflow", workflow_str)
+
+
+def embed_png_metadata(png_bytes, meta_chunks, replace_keys=(b"prompt", b"workflow")):
+    """
+    Sisipkan meta_chunks sebelum IDAT pertama tanpa menyentuh pixel.
+    Chunk teks lama dengan key yang sama dibuang. Return None jika bukan PNG valid.
+    """
+    if not png_bytes.startswith(PNG_SIGNATURE):
+        return None
+    view = memoryview(png_bytes)
+    out = [PNG_SIGNATURE]
+    pos = len(PNG_SIGNATURE)
+    inserted = False
+    while pos + 8 <= len(png_bytes):
+        length = struct.unpack_from(">I", png_bytes, pos)[0]
+        tag = bytes(view[pos + 4:pos + 8])
+        end = pos + 12 + length
+        if end > len(png_bytes):
+            return None
+        if tag in (b"tEXt", b"iTXt", b"zTXt"):
+            key = bytes(view[pos + 8:min(end - 4, pos + 8 + 80)]).split(b"\0", 1)[0]
+            if key in replace_keys:
+                pos = end
+                continue
+        if tag == b"IDAT" and not inserted:
+            out.append(meta_chunks)
+            inserted = True
+        out.append(view[pos:end])
+        pos = end
+        if tag == b"IEND":
+            break
+    return b"".join(out) if inserted else None
+
+
+class MediaOutput:
+    """
+    Output video/animasi yang sudah di-stream dari /view ke file (bukan bytes di memori).
+    Muncul di dict hasil run_prompt() menggantikan bytes gambar; sha256 dihitung saat download.
+    """
+    def __init__(self, path, filename, size, sha256, format=None):
+        self.path = path
+        self.filename = filename
+        self.size = size
+        self.sha256 = sha256
+        self.format = format
+
+    def __repr__(self):
+        return f"MediaOutput({self.filename!r}, {self.size} bytes)"
+
+
+class ResultCache:
+    """
+    Cache output ComfyUI di disk, content-addressed: key = sha256 dari workflow kanonik
+    (json sort_keys, tanpa _meta). Job yang di-issue ulang (workflow, seed, prompt sama)
+    langsung dapat bytes gambar tanpa GPU. Ukuran dibatasi, yang paling lama tidak dipakai
+    dibuang dulu (LRU, urutan dari mtime saat start).
+
+    Layout: <folder>/<key[:2]>/<key>/manifest.json + <node_id>_<n>.bin
+    """
+    def __init__(self, folder, max_bytes=2 * 1024 ** 3):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0, "stored": 0, "evicted": 0}
+        self._entries = collections.OrderedDict()  # key -> ukuran bytes (lama -> baru)
+        self._size = 0
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+        self._load()
+
     @staticmethod
-    def replace_easy_seed(workflow, new_seed):
-        for node in workflow.values():
-            if node.get("class_type") == "easy seed":
-                if "inputs" in node and "seed" in node["inputs"]:
-                    node["inputs"]["seed"] = new_seed
-                    return True
-        return False
+    def key(workflow):
+        canonical = {node_id: {k: v for k, v in node.items() if k != "_meta"} if isinstance(node, dict) else node
+                     for node_id, node in workflow.items()}
+        raw = json.dumps(canonical, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.folder, key[:2], key)
+
+    def _load(self):
+        found = []
+        for prefix in os.listdir(self.folder):
+            prefix_dir = os.path.join(self.folder, prefix)
+            if len(prefix) != 2 or not os.path.isdir(prefix_dir):
+                continue
+            for key in os.listdir(prefix_dir):
+                entry_dir = os.path.join(prefix_dir, key)
+                manifest = os.path.join(entry_dir, "manifest.json")
+                # <key>.tmp-xxxx = put() yang terputus sebelum rename, walau manifest sudah tertulis
+                if ".tmp-" in key or not os.path.exists(manifest):
+                    shutil.rmtree(entry_dir, ignore_errors=True)  # sisa tulis yang terputus
+                    continue
+                size = sum(e.stat().st_size for e in os.scandir(entry_dir))
+                found.append((os.stat(manifest).st_mtime, key, size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._size += size
+        self._evict()
+
+    def get(self, workflow):
+        """Return dict {node_id: [bytes]} jika ada di cache, None jika tidak."""
+        key = self.key(workflow)
+        with self._lock:
+            if key not in self._entries:
+                self.stats["misses"] += 1
+                METRICS.inc("cache_misses")
+                return None
+            self._entries.move_to_end(key)
+        entry_dir = self._path(key)
+        try:
+            with open(os.path.join(entry_dir, "manifest.json"), "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            images = {}
+            for node_id, names in manifest.items():
+                images[node_id] = []
+                for name in names:
+                    with open(os.path.join(entry_dir, name), "rb") as f:
+                        images[node_id].append(f.read())
+            os.utime(os.path.join(entry_dir, "manifest.json"))
+        except (OSError, ValueError):
+            # entry rusak / dihapus dari luar -> anggap miss
+            with self._lock:
+                self._size -= self._entries.pop(key, 0)
+                self.stats["misses"] += 1
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            METRICS.inc("cache_misses")
+            return None
+        with self._lock:
+            self.stats["hits"] += 1
+        METRICS.inc("cache_hits")
+        return images
+
+    def put(self, workflow, images):
+        if not images or not any(images.values()):
+            return
+        if any(isinstance(data, MediaOutput) for img_list in images.values() for data in img_list):
+            return  # video ratusan MB: tidak di-cache
+        key = self.key(workflow)
+        with self._lock:
+            if key in self._entries:
+                return
+        entry_dir = self._path(key)
+        tmp_dir = f"{entry_dir}.tmp-{uuid.uuid4().hex[:8]}"
+        os.makedirs(tmp_dir)
+        manifest, size = {}, 0
+        for node_id, img_list in images.items():
+            manifest[node_id] = []
+            for index, image_data in enumerate(img_list):
+                name = f"{node_id}_{index}.bin"
+                with open(os.path.join(tmp_dir, name), "wb") as f:
+                    f.write(image_data)
+                manifest[node_id].append(name)
+                size += len(image_data)
+        # manifest ditulis terakhir: entry tanpa manifest = belum lengkap
+        with open(os.path.join(tmp_dir, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+            size += f.tell()
+        try:
+            os.rename(tmp_dir, entry_dir)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)  # thread lain sudah menyimpan key yang sama
+            return
+        with self._lock:
+            self._entries[key] = size
+            self._size += size
+            self.stats["stored"] += 1
+        self._evict()
+
+    def _evict(self):
+        while True:
+            with self._lock:
+                if self._size <= self.max_bytes or len(self._entries) <= 1:
+                    return
+                key, size = self._entries.popitem(last=False)
+                self._size -= size
+                self.stats["evicted"] += 1
+            shutil.rmtree(self._path(key), ignore_errors=True)
+
+    def report(self):
+        st = self.stats
+        total = st["hits"] + st["misses"]
+        rate = st["hits"] / total * 100 if total else 0.0
+        print(f"{Fore.CYAN}🗄 Cache hasil: {st['hits']} hit, {st['misses']} miss ({rate:.0f}% hit), "
+              f"{st['stored']} disimpan, {st['evicted']} dibuang, "
+              f"{self._size / (1024 * 1024):.1f}/{self.max_bytes / (1024 * 1024):.0f} MB{Style.RESET_ALL}")
+
+
+class WorkflowCache:
+    """
+    Cache workflow kiriman job server, content-addressed: hash = sha256 dari JSON workflow
+    (bytes hasil decompress field WORKFLOW). Disimpan di disk (bertahan lintas restart) dan
+    di memori sebagai WorkflowTemplate yang sudah di-parse, jadi job dengan hash yang sama
+    tidak di-decode / di-parse ulang.
+
+    Protokol job server (semua field opsional, server lama tetap jalan):
+      request  : WORKFLOW_HASHES = hash yang sudah dipegang worker
+      response : WORKFLOW_HASH + WORKFLOW_PATCH ({node_id: {input: value}} / {slot: value});
+                 WORKFLOW (zlib+base64) boleh dihilangkan jika hash ada di WORKFLOW_HASHES,
+                 atau sudah dikirim di job sebelumnya dalam response lease yang sama
+      miss     : GET get_workflow?hash=<hash> -> JSON workflow
+    """
+    def __init__(self, folder, max_entries=16, url_workflow=None):
+        self.folder = folder
+        self.max_entries = max(1, max_entries)
+        self.url_workflow = url_workflow
+        self.stats = {"hits": 0, "misses": 0, "fetched": 0, "stored": 0}
+        self._templates = collections.OrderedDict()  # hash -> WorkflowTemplate (lama -> baru)
+        self._hashes = collections.OrderedDict()  # hash yang ada di disk (lama -> baru)
+        self._aliases = {}  # sha256 string WORKFLOW -> hash (server lama tanpa WORKFLOW_HASH)
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+        found = []
+        for name in os.listdir(folder):
+            key, ext = os.path.splitext(name)
+            if ext == ".json" and len(key) == 64:
+                found.append((os.stat(os.path.join(folder, name)).st_mtime, key))
+            elif ".tmp-" in name:
+                os.remove(os.path.join(folder, name))  # sisa tulis yang terputus
+        for _, key in sorted(found):
+            self._hashes[key] = True
+        self._evict()
 
-    # ===== Recursive static method untuk replace value generik =====
     @staticmethod
-    def replace_value(obj, old_value, new_value):
-        if isinstance(obj, dict):
-            for k, v in obj.items():
-                if isinstance(v, (dict, list)):
-                    LoadWorkFlow.replace_value(v, old_value, new_value)
-                elif v == old_value:
-                    obj[k] = new_value
-        elif isinstance(obj, list):
-            for i in range(len(obj)):
-                if isinstance(obj[i], (dict, list)):
-                    LoadWorkFlow.replace_value(obj[i], old_value, new_value)
-                elif obj[i] == old_value:
-                    obj[i] = new_value
+    def key(raw):
+        return hashlib.sha256(raw).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.folder, f"{key}.json")
+
+    def hashes(self):
+        """Hash yang diumumkan ke job server (paling baru dipakai dulu)."""
+        with self._lock:
+            return list(reversed(self._hashes))
+
+    def template(self, data):
+        """
+        WorkflowTemplate untuk job `data` (field WORKFLOW / WORKFLOW_HASH).
+        Return None jika workflow tidak dikirim dan tidak bisa didapat dari cache / server.
+        """
+        key = data.get("WORKFLOW_HASH")
+        alias = None
+        if not key and data.get("WORKFLOW"):
+            alias = hashlib.sha256(data["WORKFLOW"].encode("ascii")).hexdigest()
+            key = self._aliases.get(alias)
+        if key:
+            template = self._lookup(key)
+            if template is not None:
+                with self._lock:
+                    self.stats["hits"] += 1
+                METRICS.inc("workflow_cache_hits")
+                return template
+        with self._lock:
+            self.stats["misses"] += 1
+        METRICS.inc("workflow_cache_misses")
+        if data.get("WORKFLOW"):
+            with METRICS.timer("workflow_decode"):
+                raw = zlib.decompress(base64.b64decode(data["WORKFLOW"]))
+                template = self._store(raw, key)
+            if alias is not None:
+                if len(self._aliases) >= self.max_entries * 4:
+                    self._aliases.clear()
+                self._aliases[alias] = self.key(raw)
+            return template
+        if key and self.url_workflow:
+            return self._fetch(key)
+        return None
+
+    def _lookup(self, key):
+        with self._lock:
+            template = self._templates.get(key)
+            if template is not None:
+                self._templates.move_to_end(key)
+                self._hashes.move_to_end(key)
+                return template
+            if key not in self._hashes:
+                return None
+        try:
+            with open(self._path(key), "rb") as f:
+                raw = f.read()
+            os.utime(self._path(key))
+        except OSError:
+            with self._lock:
+                self._hashes.pop(key, None)
+            return None
+        if self.key(raw) != key:
+            # file rusak -> buang, nanti diambil ulang
+            with self._lock:
+                self._hashes.pop(key, None)
+            os.remove(self._path(key))
+            return None
+        return self._remember(key, WorkflowTemplate(json.loads(raw)))
+
+    def _fetch(self, key):
+        print(f"{Fore.CYAN}[REQ]{Style.RESET_ALL} Workflow {key[:12]} tidak ada di cache, request ke server...")
+        try:
+            response = HTTP.get(self.url_workflow, params={"hash": key})
+        except Exception as e:
+            print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} Exception saat download workflow:", e)
+            return None
+        if response.status_code != 200:
+            print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} Gagal download workflow {key[:12]} ({response.status_code})")
+            return None
+        with self._lock:
+            self.stats["fetched"] += 1
+        return self._store(response.content, key)
+
+    def _store(self, raw, expected=None):
+        key = self.key(raw)
+        template = WorkflowTemplate(json.loads(raw))
+        if expected and expected != key:
+            # Server meng-hash bytes lain: pakai untuk job ini saja, jangan di-cache dengan hash salah
+            print(f"{Fore.YELLOW}⚠ WORKFLOW_HASH {expected[:12]} tidak cocok dengan isi ({key[:12]}){Style.RESET_ALL}")
+            return template
+        self._write(raw, key)
+        return self._remember(key, template)
+
+    def _write(self, raw, key):
+        with self._lock:
+            known = key in self._hashes
+        if not known:
+            tmp_path = f"{self._path(key)}.tmp-{uuid.uuid4().hex[:8]}"
+            with open(tmp_path, "wb") as f:
+                f.write(raw)
+            os.replace(tmp_path, self._path(key))
+            with self._lock:
+                self.stats["stored"] += 1
+                self._hashes[key] = True
+
+    def journal_data(self, data):
+        """
+        Salinan job untuk record "leased" di journal: WORKFLOW diganti WORKFLOW_HASH setelah
+        bytes workflow ada di disk, jadi journal tidak fsync workflow lengkap per job.
+        Resume cukup lookup hash (atau get_workflow?hash= ke server).
+        """
+        if not data.get("WORKFLOW"):
+            return data
+        key = data.get("WORKFLOW_HASH")
+        with self._lock:
+            known = key in self._hashes
+        if not known:
+            try:
+                raw = zlib.decompress(base64.b64decode(data["WORKFLOW"]))
+                key = self.key(raw)
+                self._write(raw, key)
+            except (ValueError, zlib.error, OSError):
+                return data
+            self._evict()
+        slim = {k: v for k, v in data.items() if k != "WORKFLOW"}
+        slim["WORKFLOW_HASH"] = key
+        return slim
+
+    def _remember(self, key, template):
+        with self._lock:
+            self._templates[key] = template
+            self._templates.move_to_end(key)
+            self._hashes[key] = True
+            self._hashes.move_to_end(key)
+        self._evict()
+        return template
+
+    def _evict(self):
+        while True:
+            with self._lock:
+                while len(self._templates) > self.max_entries:
+                    self._templates.popitem(last=False)
+                if len(self._hashes) <= self.max_entries:
+                    return
+                key, _ = self._hashes.popitem(last=False)
+                self._templates.pop(key, None)
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def report(self):
+        st = self.stats
+        total = st["hits"] + st["misses"]
+        rate = st["hits"] / total * 100 if total else 0.0
+        print(f"{Fore.CYAN}🗂 Cache workflow: {st['hits']} hit, {st['misses']} miss ({rate:.0f}% hit), "
+              f"{st['fetched']} diambil dari server, {len(self._hashes)} tersimpan{Style.RESET_ALL}")
+
 
 class ComfyGenerator:
     def __init__(
         self,
         server_address="127.0.0.1:8188",
         target_folder="./target",
-        image_format="JPEG"
+        image_format="JPEG",
+        ping_interval=20,
+        max_reconnect_attempts=10,
+        output_mode="http",
+        transport=None,
+        download_workers=4,
+        client_id=None,
+        result_cache=None,
+        media_dir=None
     ):
         self.server_address = server_address
-        self.client_id = str(uuid.uuid4())
+        # client_id lama dipakai ulang saat resume -> event prompt dari session sebelumnya tetap sampai
+        self.client_id = client_id or str(uuid.uuid4())
         self.target_folder = target_folder
         self.image_format = image_format
         self.workflow = None
         self.ws = None
+        self.output_mode = output_mode
+        self.http = transport or HTTP
+        self.download_workers = download_workers
+        self.result_cache = result_cache
+        self.media_dir = media_dir or os.path.join(target_folder, "media")
+
+        # State pipelined: satu reader WebSocket, future per prompt_id
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._early_done = {}
+        self._current_prompt = None
+        self._current_node = None
+        self._reader = None
+        self._fetch_executor = ThreadPoolExecutor(max_workers=2)
+
+        # Session: satu websocket + satu client_id untuk seluruh umur worker
+        self.ping_interval = ping_interval
+        self.max_reconnect_attempts = max_reconnect_attempts
+        self.reconnect_count = 0
+        self.warmup_seconds = None
+        self._gpu_idle_since = None  # waktu prompt terakhir selesai (untuk metrik gpu_idle)
+        self._ws_lock = threading.Lock()
+        self._closing = threading.Event()
+        self._keepalive = None
 
         if "127.0.0.1" in server_address or "localhost" in server_address:
             self.use_https = False
@@ -331,97 +1297,458 @@ class ComfyGenerator:
     # -------------------------------
     # HTTP Helper Functions
     # -------------------------------
+    def _auth_headers(self):
+        if OPEN_BUTTON_TOKEN:
+            return {"Authorization": f"Bearer {OPEN_BUTTON_TOKEN}"}
+        return {}
+
     def queue_prompt(self, prompt):
         p = {"prompt": prompt, "client_id": self.client_id}
-        data = json.dumps(p).encode('utf-8')
-        req = urllib.request.Request(self._http_url("/prompt"), data=data)
-        req.add_header("Content-Type", "application/json")
-        if OPEN_BUTTON_TOKEN:
-            req.add_header("Authorization", f"Bearer {OPEN_BUTTON_TOKEN}")
-        with urllib.request.urlopen(req) as response:
-            return json.loads(response.read())
+        resp = self.http.post(self._http_url("/prompt"), json_body=p, headers=self._auth_headers(), gzip_json=False)
+        resp.raise_for_status()
+        return resp.json()
 
     def get_image(self, filename, subfolder, folder_type):
         data = {"filename": filename, "subfolder": subfolder, "type": folder_type}
-        url_values = urllib.parse.urlencode(data)
-        req = urllib.request.Request(self._http_url(f"/view?{url_values}"))
-        if OPEN_BUTTON_TOKEN:
-            req.add_header("Authorization", f"Bearer {OPEN_BUTTON_TOKEN}")
-        with urllib.request.urlopen(req) as response:
-            return response.read()
+        resp = self.http.get(self._http_url("/view"), params=data, headers=self._auth_headers(), timeout=(5, 120))
+        resp.raise_for_status()
+        return resp.content
 
     def get_history(self, prompt_id):
-        req = urllib.request.Request(self._http_url(f"/history/{prompt_id}"))
-        if OPEN_BUTTON_TOKEN:
-            req.add_header("Authorization", f"Bearer {OPEN_BUTTON_TOKEN}")
-        with urllib.request.urlopen(req) as response:
-            return json.loads(response.read())
+        resp = self.http.get(self._http_url(f"/history/{prompt_id}"), headers=self._auth_headers())
+        resp.raise_for_status()
+        return resp.json()
+
+    def _media_path(self, prompt_id, filename):
+        os.makedirs(self.media_dir, exist_ok=True)
+        return os.path.join(self.media_dir, f"{str(prompt_id)[:8]}_{os.path.basename(filename)}")
+
+    def get_media(self, info, prompt_id=""):
+        """Stream output video dari /view ke file per chunk (memori tetap kecil). Return MediaOutput."""
+        data = {"filename": info["filename"], "subfolder": info.get("subfolder", ""), "type": info.get("type", "output")}
+        path = self._media_path(prompt_id, info["filename"])
+        digest, size = hashlib.sha256(), 0
+        resp = self.http.get(self._http_url("/view"), params=data, headers=self._auth_headers(),
+                             timeout=(5, 120), stream=True)
+        try:
+            resp.raise_for_status()
+            with open(f"{path}.part", "wb") as f:
+                for chunk in resp.iter_content(STREAM_CHUNK):
+                    f.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+        finally:
+            resp.close()
+        os.replace(f"{path}.part", path)
+        METRICS.inc("media_bytes", size)
+        return MediaOutput(path, info["filename"], size, digest.hexdigest(), info.get("format"))
 
 
     # -------------------------------
     # WebSocket
     # -------------------------------
     def connect_ws(self):
+        import websocket
         try:
             headers = []
             if OPEN_BUTTON_TOKEN:
                 headers.append(f"Authorization: Bearer {OPEN_BUTTON_TOKEN}")
-            self.ws = create_connection(
+            # clientId tetap sama saat reconnect -> ComfyUI terus mengirim event prompt kita ke socket baru
+            self.ws = websocket.create_connection(
                 self._ws_url(f"/ws?clientId={self.client_id}"),
                 header=headers
             )
         except Exception as e:
             raise ConnectionError(f"Error koneksi WebSocket: [red]{e}[/red]")
 
+    def _reconnect_ws(self):
+        """Reconnect dengan exponential backoff. Return False jika menyerah / sedang close()."""
+        delay = 0.5
+        for attempt in range(1, self.max_reconnect_attempts + 1):
+            if self._closing.wait(delay):
+                return False
+            try:
+                with self._ws_lock:
+                    self.connect_ws()
+                self.reconnect_count += 1
+                print(f"{Fore.YELLOW}🔌 WebSocket tersambung ulang (percobaan {attempt}){Style.RESET_ALL}")
+                self._resync_pending()
+                return True
+            except ConnectionError as e:
+                print(f"{Fore.RED}❌ Reconnect WebSocket gagal ({attempt}/{self.max_reconnect_attempts}): {e}{Style.RESET_ALL}")
+                delay = min(delay * 2, 30)
+        return False
+
+    def _resync_pending(self):
+        # Event yang terlewat selama socket putus: cek history untuk prompt yang masih pending
+        with self._lock:
+            pending = list(self._pending.items())
+        for prompt_id, state in pending:
+            try:
+                history = self.get_history(prompt_id)
+            except Exception:
+                continue
+            if prompt_id not in history:
+                continue
+            with self._lock:
+                if self._pending.pop(prompt_id, None) is None:
+                    continue
+            state["cached"] = True  # output 'executed' mungkin tidak lengkap -> pakai history
+            self._schedule_finish(prompt_id, state)
+
+    def _keepalive_loop(self):
+        while not self._closing.wait(self.ping_interval):
+            ws = self.ws
+            if ws is None:
+                continue
+            try:
+                ws.ping()
+            except Exception:
+                # reader akan mendeteksi socket mati dan reconnect
+                pass
+
+    # -------------------------------
+    # Context manager / close
+    # -------------------------------
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
 
     # -------------------------------
     # Eksekusi prompt & ambil gambar
     # -------------------------------
     def run_prompt(self, prompt):
-        if self.ws is None:
-            self.connect_ws()
         self.workflow = prompt
-        # Kirim prompt ke server
-        prompt_id = self.queue_prompt(prompt)['prompt_id']
-        #print(f"Prompt ID: {prompt_id}. Menunggu eksekusi selesai...", "info")
-
-        output_images = {}
+        try:
+            return self.submit_prompt(prompt).result()
+        except Exception as e:
+            print(f"Error saat menjalankan prompt: [red]{e}[/red]", "error")
+            return None
 
-        # Tunggu hingga prompt selesai dieksekusi
+    # -------------------------------
+    # Pipelined: banyak prompt in-flight
+    # -------------------------------
+    def submit_prompt(self, prompt, use_cache=True):
+        """
+        Queue prompt tanpa menunggu selesai.
+        Return Future -> dict {node_id: [image_bytes]} (sama seperti run_prompt), None jika gagal.
+        Jika ada result_cache dan workflow identik sudah pernah dibuat: Future langsung selesai
+        (prompt_id None), tanpa GPU.
+        """
+        use_cache = use_cache and self.result_cache is not None
+        if use_cache:
+            cached = self.result_cache.get(prompt)
+            if cached is not None:
+                future = self._new_future(None)
+                future.set_result(cached)
+                return future
+        self.start_reader()
+        submitted_at = time.time()
+        prompt_id = self.queue_prompt(prompt)['prompt_id']
+        future = self._new_future(prompt_id)
+        if use_cache:
+            future.add_done_callback(lambda f: self._cache_result(prompt, f))
+        return self._register_prompt(prompt_id, prompt, future, submitted_at)
+
+    def _new_future(self, prompt_id):
+        # Asal prompt ikut dibawa Future -> journal bisa mencatat endpoint + client_id untuk resume
+        future = Future()
+        future.prompt_id = prompt_id
+        future.client_id = self.client_id
+        future.server = self.server_address
+        return future
+
+    def _cache_result(self, prompt, future):
+        # Hanya hasil lengkap: output yang gagal didownload tidak boleh ikut di-cache
+        if future.cancelled() or future.exception() is not None or not getattr(future, "complete", True):
+            return
+        try:
+            self.result_cache.put(prompt, future.result())
+        except OSError as e:
+            print(f"{Fore.YELLOW}⚠ Gagal menyimpan ke cache hasil: {e}{Style.RESET_ALL}")
+
+    def queued_prompt_ids(self):
+        """prompt_id yang sedang jalan / menunggu di antrian ComfyUI (GET /queue)."""
+        resp = self.http.get(self._http_url("/queue"), headers=self._auth_headers())
+        resp.raise_for_status()
+        data = resp.json()
+        return {item[1] for key in ("queue_running", "queue_pending") for item in data.get(key, [])}
+
+    def reattach_prompt(self, prompt_id, prompt, server=None):
+        """
+        Pasang kembali prompt dari session sebelumnya (resume setelah crash).
+        Return Future seperti submit_prompt, atau None jika prompt sudah tidak ada di ComfyUI
+        (tidak di history maupun antrian, mis. ComfyUI ikut restart) -> harus di-submit ulang.
+        """
+        self.start_reader()
+        future = self._new_future(prompt_id)
+        self._register_prompt(prompt_id, prompt, future)
+        with self._lock:
+            state = self._pending.get(prompt_id)
+            if state is not None:
+                state["cached"] = True  # event 'executed' bisa terlewat saat worker mati -> pakai history
+        try:
+            if prompt_id in self.get_history(prompt_id):
+                self._resync_pending()
+            elif prompt_id not in self.queued_prompt_ids():
+                with self._lock:
+                    self._pending.pop(prompt_id, None)
+                return None
+        except Exception as e:
+            print(f"{Fore.YELLOW}⚠ Gagal cek prompt {prompt_id}: {e}{Style.RESET_ALL}")
+            with self._lock:
+                self._pending.pop(prompt_id, None)
+            return None
+        return future
+
+    def _register_prompt(self, prompt_id, prompt, future, submitted_at=None):
+        state = {"future": future, "workflow": prompt, "executed": {}, "cached": False, "error": None,
+                 "ws_nodes": self._ws_output_nodes(prompt), "ws_images": {},
+                 "t_submit": submitted_at or time.time()}
+        METRICS.inc("prompts_submitted")
+        with self._lock:
+            early = self._early_done.pop(prompt_id, None)
+            if early is not None:
+                for node_id, frame in early.pop("ws_frames", []):
+                    if node_id in state["ws_nodes"]:
+                        state["ws_images"].setdefault(node_id, []).append(frame)
+                state.update(early)
+                if "t_start" in early:
+                    # execution_start datang sebelum prompt terdaftar: queue_wait dicatat di sini
+                    METRICS.observe("queue_wait", max(0.0, early["t_start"] - state["t_submit"]))
+            finished = state.pop("done", False)
+            if not finished:
+                self._pending[prompt_id] = state
+        # Prompt sudah selesai sebelum sempat didaftarkan (mis. semua node ter-cache)
+        if finished:
+            self._schedule_finish(prompt_id, state)
+        return future
+
+    def start_reader(self):
+        if self._closing.is_set():
+            raise ConnectionError("ComfyGenerator sudah ditutup")
+        with self._ws_lock:
+            if self.ws is None:
+                self.connect_ws()
+        if self._reader is None or not self._reader.is_alive():
+            self._reader = threading.Thread(target=self._reader_loop, daemon=True)
+            self._reader.start()
+        if self.ping_interval and (self._keepalive is None or not self._keepalive.is_alive()):
+            self._keepalive = threading.Thread(target=self._keepalive_loop, daemon=True)
+            self._keepalive.start()
+
+    def _reader_loop(self):
+        # Satu-satunya pembaca ws: routing event executing/executed ke future per prompt_id
         while True:
             try:
                 out = self.ws.recv()
-                if isinstance(out, str):
-                    message = json.loads(out)
-                    if message.get('type') == 'executing':
-                        data = message.get('data', {})
-                        if data.get('node') is None and data.get('prompt_id') == prompt_id:
-                            #print(f"Prompt {prompt_id} selesai dieksekusi.", "info")
-                            break
             except Exception as e:
-                print(f"Error saat menerima data WebSocket: [red]{e}[/red]", "error")
-                return None
+                if self._closing.is_set():
+                    return
+                if self._reconnect_ws():
+                    continue
+                self.ws = None
+                self._fail_pending(e)
+                return
+            if not isinstance(out, str):
+                self._route_binary(out)
+                continue
+            try:
+                message = json.loads(out)
+            except ValueError:
+                continue
+            self._route_message(message)
+
+    def _route_message(self, message):
+        msg_type = message.get('type')
+        data = message.get('data') or {}
+        prompt_id = data.get('prompt_id')
+        if msg_type == 'progress':
+            METRICS.inc("comfy_progress_events")
+        if prompt_id is None:
+            return
+
+        with self._lock:
+            state = self._pending.get(prompt_id)
+            if state is None:
+                # Event datang sebelum submit_prompt mendaftarkan prompt_id
+                if len(self._early_done) > 256:
+                    self._early_done.clear()
+                state = self._early_done.setdefault(prompt_id, {"executed": {}, "cached": False, "error": None})
+
+            if msg_type == 'execution_start':
+                now = state["t_start"] = time.time()
+                idle_since, self._gpu_idle_since = self._gpu_idle_since, None
+                if idle_since is not None:
+                    # jeda antara prompt sebelumnya selesai dan prompt ini mulai = GPU menganggur
+                    METRICS.observe("gpu_idle", now - idle_since)
+                if "t_submit" in state:
+                    METRICS.observe("queue_wait", now - state["t_submit"])
+                return
+            elif msg_type == 'executing' and data.get('node') is not None:
+                # Frame biner tidak membawa prompt_id -> catat node yang sedang jalan
+                self._current_prompt = prompt_id
+                self._current_node = data['node']
+                return
+            elif msg_type == 'executed' and data.get('node') is not None:
+                state["executed"][data['node']] = data.get('output') or {}
+            elif msg_type == 'execution_cached' and data.get('nodes'):
+                state["cached"] = True
+            elif msg_type == 'execution_error':
+                state["error"] = data.get('exception_message') or "execution_error"
+            elif msg_type == 'executing' and data.get('node') is None:
+                self._gpu_idle_since = time.time()
+                if "t_start" in state:
+                    METRICS.observe("gpu_exec", self._gpu_idle_since - state["t_start"])
+                if prompt_id not in self._pending:
+                    state["done"] = True
+                    return
+                del self._pending[prompt_id]
+            else:
+                return
+
+        if msg_type == 'executing':
+            self._schedule_finish(prompt_id, state)
+
+    def _route_binary(self, out):
+        # Format ComfyUI: 4 byte event (1 = PREVIEW_IMAGE) + 4 byte format gambar + bytes gambar
+        if len(out) < 8 or int.from_bytes(out[:4], "big") != 1:
+            return
+        with self._lock:
+            state = self._pending.get(self._current_prompt)
+            if state is None:
+                # Prompt belum terdaftar (queue_prompt belum return): simpan dulu, disaring saat submit
+                early = self._early_done.get(self._current_prompt)
+                if early is not None:
+                    early.setdefault("ws_frames", []).append((self._current_node, bytes(out[8:])))
+                return
+            # Abaikan preview sampler: hanya frame dari node SaveImageWebsocket yang dihitung output
+            if self._current_node in state.get("ws_nodes", ()):
+                state["ws_images"].setdefault(self._current_node, []).append(bytes(out[8:]))
+
+    def _ws_output_nodes(self, prompt):
+        if self.output_mode != "ws" or not isinstance(prompt, dict):
+            return set()
+        return {node_id for node_id, node in prompt.items()
+                if isinstance(node, dict) and node.get("class_type") == "SaveImageWebsocket"}
+
+    def _schedule_finish(self, prompt_id, state):
+        # history + download di thread lain supaya reader tidak pernah terblokir
+        self._fetch_executor.submit(self._finish_prompt, prompt_id, state)
 
-        # Ambil history
-        try:
-            history = self.get_history(prompt_id)[prompt_id]
-        except Exception as e:
-            print(f"Error saat mengambil history: [red]{e}[/red]", "error")
+    @staticmethod
+    def _resolve(future, value):
+        if not future.done():
+            future.set_result(value)
+
+    def _plan_outputs(self, prompt_id, state):
+        """
+        Return (outputs yang perlu di-download lewat HTTP, perlu_history),
+        atau None jika eksekusi prompt gagal.
+        """
+        if state.get("error"):
+            print(f"Error eksekusi prompt {prompt_id}: [red]{state['error']}[/red]", "error")
             return None
 
-        # Download semua image
-        for node_id, node_output in history['outputs'].items():
+        ws_images = state.get("ws_images") or {}
+        if state.get("ws_nodes") and not ws_images:
+            print(f"{Fore.YELLOW}⚠ Frame gambar websocket tidak diterima untuk {prompt_id}, fallback ke HTTP{Style.RESET_ALL}")
+
+        outputs = state["executed"]
+        if ws_images and not state["cached"]:
+            # Semua output gambar sudah datang lewat websocket -> tanpa /history dan /view
+            return {node_id: out for node_id, out in outputs.items() if node_id not in ws_images}, False
+        # Node ter-cache tidak mengirim ulang output lewat 'executed' -> ambil dari history
+        return outputs, bool(state["cached"] or not outputs)
+
+    @staticmethod
+    def _image_refs(outputs):
+        """
+        [(node_id, info output, media)] sesuai urutan output, plus dict kosong per node.
+        media=True untuk video/animasi (MEDIA_OUTPUT_KEYS): di-stream ke disk, bukan bytes.
+        """
+        refs, output_images = [], {}
+        for node_id, node_output in outputs.items():
             if 'images' in node_output:
-                images_output = []
-                for image in node_output['images']:
-                    try:
-                        image_data = self.get_image(image['filename'], image['subfolder'], image['type'])
-                        images_output.append(image_data)
-                    except Exception as e:
-                        print(f"Error saat mengambil gambar: [red]{e}[/red]", "error")
-                output_images[node_id] = images_output
+                output_images[node_id] = []
+                refs.extend((node_id, image, False) for image in node_output['images'])
+            for key in MEDIA_OUTPUT_KEYS:
+                if node_output.get(key):
+                    output_images.setdefault(node_id, [])
+                    refs.extend((node_id, media, True) for media in node_output[key])
+        return refs, output_images
 
-        return output_images
+    @staticmethod
+    def _merge_images(ws_images, downloaded):
+        images = dict(ws_images or {})
+        for node_id, node_images in downloaded.items():
+            if node_images or node_id not in images:
+                images[node_id] = node_images
+        return images
+
+    def _finish_prompt(self, prompt_id, state):
+        future = state["future"]
+        plan = self._plan_outputs(prompt_id, state)
+        if plan is None:
+            self._resolve(future, None)
+            return
+        outputs, need_history = plan
+        if need_history:
+            try:
+                with METRICS.timer("history_fetch"):
+                    outputs = self.get_history(prompt_id)[prompt_id]['outputs']
+            except Exception as e:
+                print(f"Error saat mengambil history: [red]{e}[/red]", "error")
+                self._resolve(future, None)
+                return
+        with METRICS.timer("image_download"):
+            downloaded, missing = self._download_outputs(outputs, prompt_id)
+        # Hasil tidak lengkap tetap dikembalikan, tapi tidak boleh masuk ResultCache
+        future.complete = not missing
+        self._resolve(future, self._merge_images(state.get("ws_images"), downloaded))
+
+    def _download_outputs(self, outputs, prompt_id=""):
+        """Return ({node_id: [bytes / MediaOutput]}, jumlah output yang gagal didownload)."""
+        # Download semua output paralel (konkurensi terbatas), urutan per node tetap
+        refs, output_images = self._image_refs(outputs)
+        fetchers = [(lambda info=info: self.get_media(info, prompt_id)) if media else
+                    (lambda image=info: self.get_image(image['filename'], image['subfolder'], image['type']))
+                    for _, info, media in refs]
+
+        results = self.http.download_many(fetchers, max_workers=self.download_workers)
+        missing = 0
+        for (node_id, _, _), (image_data, error) in zip(refs, results):
+            if error is not None:
+                print(f"Error saat mengambil gambar: [red]{error}[/red]", "error")
+                missing += 1
+                continue
+            output_images[node_id].append(image_data)
+        return output_images, missing
+
+    def _fail_pending(self, error):
+        with self._lock:
+            pending = list(self._pending.values())
+            self._pending.clear()
+        for state in pending:
+            if not state["future"].done():
+                state["future"].set_exception(ConnectionError(f"WebSocket terputus: {error}"))
+
+    def close(self):
+        self._closing.set()
+        with self._ws_lock:
+            ws, self.ws = self.ws, None
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+        if self._reader is not None and self._reader is not threading.current_thread():
+            self._reader.join(timeout=5)
+        self._fail_pending("session ditutup")
+        self._fetch_executor.shutdown(wait=True)
 
     def _http_url(self, path: str) -> str:
         scheme = "https" if self.use_https else "http"
@@ -433,33 +1760,54 @@ class ComfyGenerator:
     # -------------------------------
     # Simpan gambar ke folder target
     # -------------------------------
-    def save_images(self, images, img_path="image"):
+    def save_images(self, images, img_path="image", workflow=None):
         saved_files = []
-        
+        # Mode pipelined: workflow per job dikirim eksplisit, self.workflow bisa milik prompt lain
+        workflow = self.workflow if workflow is None else workflow
+
+        # Convert ke string JSON + chunk PNG sekali per prompt (bukan per gambar)
+        if isinstance(workflow, dict):
+            workflow_str = json.dumps(workflow, ensure_ascii=True, separators=(",", ":"))
+        else:
+            workflow_str = str(workflow)
+        meta_chunks = png_workflow_chunks(workflow_str) if self.image_format == "PNG" else None
+
         for node_id, img_list in images.items():
             for index, image_data in enumerate(img_list):
                 try:
-                    image = Image.open(io.BytesIO(image_data))
-
-                    # Convert ke string JSON
-                    if isinstance(self.workflow, dict):
-                        workflow_str = json.dumps(self.workflow, ensure_ascii=True, separators=(",", ":"))
-                    else:
-                        workflow_str = str(self.workflow)
-
+                    if isinstance(image_data, MediaOutput):
+                        # Video: file hasil stream dipindah (bukan dibaca ulang), ekstensi asli
+                        stem, ext = os.path.splitext(img_path)[0], os.path.splitext(image_data.filename)[1]
+                        file_path = stem + ext
+                        if file_path in saved_files:
+                            file_path = f"{stem}_{len(saved_files)}{ext}"
+                        shutil.move(image_data.path, file_path)
+                        image_data.path = file_path
+                        saved_files.append(file_path)
+                        continue
                     if self.image_format == "JPEG":
+                        from PIL import Image
                         file_path = f"{img_path}"
+                        image = Image.open(io.BytesIO(image_data))
                         image.save(file_path, "JPEG")
 
                     elif self.image_format == "PNG":
                         file_path = f"{img_path}"
-                        meta = PngImagePlugin.PngInfo()
-                        meta.add_text("prompt", workflow_str)
-                        meta.add_itxt("prompt", workflow_str, lang="", tkey="", zip=False)
-                        meta.add_itxt("workflow", workflow_str, lang="", tkey="", zip=False)
-
-                        # Simpan langsung dengan metadata
-                        image.save(file_path, "PNG", pnginfo=meta)
+                        # Fast path: sisipkan chunk metadata ke bytes asli, tanpa decode/encode ulang
+                        png_bytes = embed_png_metadata(image_data, meta_chunks)
+                        if png_bytes is not None:
+                            with open(file_path, "wb") as f:
+                                f.write(png_bytes)
+                        else:
+                            from PIL import Image, PngImagePlugin
+                            image = Image.open(io.BytesIO(image_data))
+                            meta = PngImagePlugin.PngInfo()
+                            meta.add_text("prompt", workflow_str)
+                            meta.add_itxt("prompt", workflow_str, lang="", tkey="", zip=False)
+                            meta.add_itxt("workflow", workflow_str, lang="", tkey="", zip=False)
+
+                            # Simpan langsung dengan metadata
+                            image.save(file_path, "PNG", pnginfo=meta)
                         #print(f"✅ Workflow JSON tersimpan di {file_path}")
 
                     saved_files.append(file_path)
@@ -474,14 +1822,23 @@ class ComfyGenerator:
         Simpan workflow JSON ke metadata PNG (chunk 'prompt' + 'workflow').
         Ditulis ke tEXt dan iTXt supaya lebih kompatibel dengan ComfyUI.
         """
-        img = Image.open(image_path)
-
         # Convert ke string JSON (jaga kompatibilitas → pakai ensure_ascii=True)
         if isinstance(workflow_json, dict):
             workflow_str = json.dumps(workflow_json, ensure_ascii=True, separators=(",", ":"))
         else:
             workflow_str = str(workflow_json)
 
+        # Fast path: file sudah PNG -> sisipkan chunk tanpa decode pixel
+        with open(image_path, "rb") as f:
+            png_bytes = embed_png_metadata(f.read(), png_workflow_chunks(workflow_str))
+        if png_bytes is not None:
+            with open(output_path, "wb") as f:
+                f.write(png_bytes)
+            print(f"✅ Workflow JSON disimpan di metadata PNG: {output_path}")
+            return
+
+        from PIL import Image, PngImagePlugin
+        img = Image.open(image_path)
         meta = PngImagePlugin.PngInfo()
 
         # tEXt (Latin-1, basic)
@@ -496,28 +1853,397 @@ class ComfyGenerator:
         img.save(output_path, "PNG", pnginfo=meta)
         print(f"✅ Workflow JSON disimpan di metadata PNG: {output_path}")
 
-    def save_images_HD(self, images, prefix="image"):
-        saved_files = []
-        os.makedirs(self.target_folder, exist_ok=True)
 
-        for node_id, img_list in images.items():
-            for index, image_data in enumerate(img_list):
+class AsyncComfyGenerator(ComfyGenerator):
+    """
+    Versi asyncio dari ComfyGenerator (aiohttp). queue_prompt, get_history, get_image,
+    submit_prompt/run_prompt dan stream event websocket di-await dari satu event loop,
+    jadi beberapa server ComfyUI, job fetch dan upload bisa overlap tanpa thread.
+    Output run_prompt() sama dengan ComfyGenerator.run_prompt(): {node_id: [image_bytes]},
+    output video (MEDIA_OUTPUT_KEYS) sebagai MediaOutput (file di media_dir).
+
+        async with AsyncComfyGenerator("127.0.0.1:8188") as cg:
+            images = await cg.run_prompt(workflow)
+    """
+    def __init__(self, server_address="127.0.0.1:8188", target_folder="./target", image_format="JPEG",
+                 ping_interval=20, max_reconnect_attempts=10, output_mode="http", download_workers=4,
+                 timeout=60):
+        super().__init__(server_address=server_address, target_folder=target_folder, image_format=image_format,
+                         ping_interval=ping_interval, max_reconnect_attempts=max_reconnect_attempts,
+                         output_mode=output_mode, download_workers=download_workers)
+        try:
+            import aiohttp
+        except ImportError as e:
+            # Tidak pip install saat runtime: dependency opsional dipasang saat provisioning
+            raise ImportError("AsyncComfyGenerator butuh aiohttp; jalankan `python client.py preflight all` "
+                              "(atau pip install aiohttp) dulu") from e
+        self._aiohttp = aiohttp
+        self.timeout = timeout
+        self._session = None
+        self._reader_task = None
+        self._subscribers = set()
+        self._tasks = set()
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+        return False
+
+    # -------------------------------
+    # HTTP (aiohttp)
+    # -------------------------------
+    def _http_session(self):
+        if self._session is None:
+            self._session = self._aiohttp.ClientSession(
+                headers=self._auth_headers(), timeout=self._aiohttp.ClientTimeout(total=self.timeout)
+            )
+        return self._session
+
+    async def _request(self, method, path, **kwargs):
+        async with self._http_session().request(method, self._http_url(path), **kwargs) as resp:
+            resp.raise_for_status()
+            return await resp.read()
+
+    async def queue_prompt(self, prompt):
+        p = {"prompt": prompt, "client_id": self.client_id}
+        return json.loads(await self._request("POST", "/prompt", json=p))
+
+    async def get_image(self, filename, subfolder, folder_type):
+        data = {"filename": filename, "subfolder": subfolder, "type": folder_type}
+        return await self._request("GET", "/view", params=data)
+
+    async def get_history(self, prompt_id):
+        return json.loads(await self._request("GET", f"/history/{prompt_id}"))
+
+    async def get_media(self, info, prompt_id=""):
+        """Versi async ComfyGenerator.get_media: stream /view ke file per chunk."""
+        data = {"filename": info["filename"], "subfolder": info.get("subfolder", ""), "type": info.get("type", "output")}
+        path = self._media_path(prompt_id, info["filename"])
+        digest, size = hashlib.sha256(), 0
+        # timeout total per request tidak cocok untuk video panjang: batasi per chunk saja
+        timeout = self._aiohttp.ClientTimeout(total=None, sock_read=self.timeout)
+        async with self._http_session().get(self._http_url("/view"), params=data, timeout=timeout) as resp:
+            resp.raise_for_status()
+            with open(f"{path}.part", "wb") as f:
+                async for chunk in resp.content.iter_chunked(STREAM_CHUNK):
+                    f.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+        os.replace(f"{path}.part", path)
+        METRICS.inc("media_bytes", size)
+        return MediaOutput(path, info["filename"], size, digest.hexdigest(), info.get("format"))
+
+    async def cancel_prompt(self, prompt_id):
+        """Hapus prompt dari antrian ComfyUI; interrupt jika sedang dieksekusi."""
+        try:
+            await self._request("POST", "/queue", json={"delete": [prompt_id]})
+            if self._current_prompt == prompt_id:
+                await self._request("POST", "/interrupt", json={"prompt_id": prompt_id})
+        except Exception as e:
+            print(f"Error saat membatalkan prompt {prompt_id}: [red]{e}[/red]", "error")
+
+    # -------------------------------
+    # WebSocket
+    # -------------------------------
+    async def connect(self):
+        import asyncio
+        if self._closing.is_set():
+            raise ConnectionError("AsyncComfyGenerator sudah ditutup")
+        if self.ws is None:
+            await self._connect_ws()
+        if self._reader_task is None or self._reader_task.done():
+            self._reader_task = asyncio.ensure_future(self._reader_loop_async())
+
+    async def _connect_ws(self):
+        if self._session is None:
+            self._session = self._aiohttp.ClientSession(
+                headers=self._auth_headers(), timeout=self._aiohttp.ClientTimeout(total=self.timeout)
+            )
+        try:
+            # heartbeat = ping keepalive dari aiohttp; max_msg_size=0 untuk frame gambar besar
+            self.ws = await self._session.ws_connect(
+                self._ws_url(f"/ws?clientId={self.client_id}"),
+                heartbeat=self.ping_interval or None, max_msg_size=0
+            )
+        except Exception as e:
+            raise ConnectionError(f"Error koneksi WebSocket: [red]{e}[/red]")
+
+    async def _reader_loop_async(self):
+        WSMsgType = self._aiohttp.WSMsgType
+        while True:
+            try:
+                msg = await self.ws.receive()
+            except Exception as e:
+                msg = e
+            if not isinstance(msg, Exception):
+                if msg.type == WSMsgType.TEXT:
+                    try:
+                        message = json.loads(msg.data)
+                    except ValueError:
+                        continue
+                    self._route_message(message)
+                    for subscriber in list(self._subscribers):
+                        subscriber.put_nowait(message)
+                    continue
+                if msg.type == WSMsgType.BINARY:
+                    self._route_binary(msg.data)
+                    continue
+            if self._closing.is_set():
+                return
+            if await self._reconnect_async():
+                continue
+            self.ws = None
+            self._fail_pending(msg)
+            return
+
+    async def _reconnect_async(self):
+        import asyncio
+        delay = 0.5
+        for attempt in range(1, self.max_reconnect_attempts + 1):
+            await asyncio.sleep(delay)
+            if self._closing.is_set():
+                return False
+            try:
+                await self._connect_ws()
+            except ConnectionError as e:
+                print(f"{Fore.RED}❌ Reconnect WebSocket gagal ({attempt}/{self.max_reconnect_attempts}): {e}{Style.RESET_ALL}")
+                delay = min(delay * 2, 30)
+                continue
+            self.reconnect_count += 1
+            print(f"{Fore.YELLOW}🔌 WebSocket tersambung ulang (percobaan {attempt}){Style.RESET_ALL}")
+            # Event yang terlewat selama socket putus: cek history untuk prompt yang masih pending
+            for prompt_id, state in list(self._pending.items()):
                 try:
-                    image = Image.open(io.BytesIO(image_data))
-                    if self.image_format.upper() == "JPEG":
-                        file_name = f"{prefix}_{node_id}_{uuid.uuid4().hex}_{index + 1}.jpg"
-                    else:
-                        file_name = f"{prefix}_{node_id}_{uuid.uuid4().hex}_{index + 1}.png"
-
-                    file_path = os.path.join(self.target_folder, file_name)
-                    image.save(file_path, self.image_format.upper())
-                    saved_files.append(file_path)
+                    history = await self.get_history(prompt_id)
+                except Exception:
+                    continue
+                if prompt_id in history and self._pending.pop(prompt_id, None) is not None:
+                    state["cached"] = True
+                    self._schedule_finish(prompt_id, state)
+            return True
+        return False
+
+    async def events(self, prompt_id=None):
+        """Stream event JSON websocket (opsional hanya untuk satu prompt_id) sampai close()."""
+        import asyncio
+        subscriber = asyncio.Queue()
+        self._subscribers.add(subscriber)
+        try:
+            while True:
+                message = await subscriber.get()
+                if message is None:
+                    return
+                if prompt_id is None or (message.get('data') or {}).get('prompt_id') == prompt_id:
+                    yield message
+        finally:
+            self._subscribers.discard(subscriber)
+
+    # -------------------------------
+    # Eksekusi prompt
+    # -------------------------------
+    async def submit_prompt(self, prompt):
+        """
+        Queue prompt tanpa menunggu selesai. Return asyncio.Future -> dict output (None jika gagal).
+        future.cancel() menghapus prompt dari antrian ComfyUI.
+        """
+        import asyncio
+        await self.connect()
+        submitted_at = time.time()
+        prompt_id = (await self.queue_prompt(prompt))['prompt_id']
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(lambda f: self._on_prompt_done(prompt_id, f))
+        return self._register_prompt(prompt_id, prompt, future, submitted_at)
+
+    async def run_prompt(self, prompt):
+        import asyncio
+        self.workflow = prompt
+        try:
+            return await (await self.submit_prompt(prompt))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Error saat menjalankan prompt: [red]{e}[/red]", "error")
+            return None
+
+    def _on_prompt_done(self, prompt_id, future):
+        if future.cancelled():
+            with self._lock:
+                self._pending.pop(prompt_id, None)
+            self._spawn(self.cancel_prompt(prompt_id))
+
+    def _spawn(self, coro):
+        import asyncio
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def _schedule_finish(self, prompt_id, state):
+        self._spawn(self._finish_prompt_async(prompt_id, state))
+
+    async def _finish_prompt_async(self, prompt_id, state):
+        import asyncio
+        future = state["future"]
+        if future.done():
+            return
+        plan = self._plan_outputs(prompt_id, state)
+        if plan is None:
+            self._resolve(future, None)
+            return
+        outputs, need_history = plan
+        if need_history:
+            try:
+                with METRICS.timer("history_fetch"):
+                    outputs = (await self.get_history(prompt_id))[prompt_id]['outputs']
+            except Exception as e:
+                print(f"Error saat mengambil history: [red]{e}[/red]", "error")
+                self._resolve(future, None)
+                return
+
+        # Download paralel dengan konkurensi terbatas, urutan per node tetap
+        refs, output_images = self._image_refs(outputs)
+        limit = asyncio.Semaphore(self.download_workers)
+
+        async def fetch(info, media):
+            async with limit:
+                if media:
+                    return await self.get_media(info, prompt_id)
+                return await self.get_image(info['filename'], info['subfolder'], info['type'])
+
+        with METRICS.timer("image_download"):
+            results = await asyncio.gather(*(fetch(info, media) for _, info, media in refs), return_exceptions=True)
+        missing = 0
+        for (node_id, _, _), result in zip(refs, results):
+            if isinstance(result, BaseException):
+                print(f"Error saat mengambil gambar: [red]{result}[/red]", "error")
+                missing += 1
+                continue
+            output_images[node_id].append(result)
+        future.complete = not missing
+        self._resolve(future, self._merge_images(state.get("ws_images"), output_images))
+
+    async def close(self):
+        import asyncio
+        self._closing.set()
+        ws, self.ws = self.ws, None
+        if ws is not None:
+            await ws.close()
+        if self._reader_task is not None:
+            await asyncio.gather(self._reader_task, return_exceptions=True)
+        self._fail_pending("session ditutup")
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+        for subscriber in list(self._subscribers):
+            subscriber.put_nowait(None)
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        self._fetch_executor.shutdown(wait=False)
+
+
+class ComfyPool:
+    """
+    Beberapa ComfyUI (satu per GPU) di belakang antarmuka yang sama dengan ComfyGenerator,
+    supaya run_job_pipeline tidak perlu tahu ada berapa GPU. Tiap endpoint punya session
+    sendiri (websocket + client_id); prompt baru dikirim ke endpoint dengan prompt in-flight
+    paling sedikit (seri -> yang paling sedikit menerima prompt).
+    """
+    def __init__(self, servers, client_ids=None, **kwargs):
+        client_ids = client_ids or {}
+        self.sessions = [ComfyGenerator(server_address=server, client_id=client_ids.get(server), **kwargs)
+                         for server in servers]
+        self.result_cache = kwargs.get("result_cache")
+        self.stats = {session.server_address: {"submitted": 0, "completed": 0, "failed": 0, "latency_s": 0.0}
+                      for session in self.sessions}
+        self._lock = threading.Lock()
+        self._started = time.time()
+        for i, session in enumerate(self.sessions):
+            METRICS.gauge(f"endpoint{i}_in_flight", lambda session=session: len(session._pending))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    @property
+    def client_id(self):
+        return self.sessions[0].client_id
+
+    def session_for(self, server):
+        for session in self.sessions:
+            if session.server_address == server:
+                return session
+        return None
+
+    def _pick(self):
+        with self._lock:
+            return min(self.sessions, key=lambda s: (len(s._pending), self.stats[s.server_address]["submitted"]))
+
+    def _track(self, session, future):
+        if future.prompt_id is None:
+            return future  # cache hit, tidak memakai GPU
+        st = self.stats[session.server_address]
+        t0 = time.time()
+        with self._lock:
+            st["submitted"] += 1
+
+        def done(f):
+            ok = not f.cancelled() and f.exception() is None and f.result() is not None
+            with self._lock:
+                st["completed" if ok else "failed"] += 1
+                st["latency_s"] += time.time() - t0
+
+        future.add_done_callback(done)
+        return future
+
+    def submit_prompt(self, prompt, use_cache=True):
+        session = self._pick()
+        return self._track(session, session.submit_prompt(prompt, use_cache=use_cache))
+
+    def reattach_prompt(self, prompt_id, prompt, server=None):
+        session = self.session_for(server) or self.sessions[0]
+        future = session.reattach_prompt(prompt_id, prompt)
+        return self._track(session, future) if future is not None else None
+
+    def run_prompt(self, prompt):
+        try:
+            return self.submit_prompt(prompt).result()
+        except Exception as e:
+            print(f"Error saat menjalankan prompt: [red]{e}[/red]", "error")
+            return None
+
+    def save_images(self, images, img_path="image", workflow=None):
+        return self.sessions[0].save_images(images, img_path=img_path, workflow=workflow)
+
+    def report(self):
+        elapsed = max(time.time() - self._started, 1e-6)
+        for i, session in enumerate(self.sessions):
+            st = self.stats[session.server_address]
+            avg = st["latency_s"] / max(st["completed"] + st["failed"], 1)
+            print(f"{Fore.CYAN}🖥 GPU{i} {session.server_address}: {st['completed']} prompt selesai, "
+                  f"{st['failed']} gagal, {st['completed'] / elapsed:.2f} prompt/s, "
+                  f"latency rata-rata {avg:.1f}s{Style.RESET_ALL}")
+
+    def close(self):
+        for session in self.sessions:
+            session.close()
+
+
+def open_comfy(client_ids=None, result_cache=None):
+    """ComfyGenerator untuk satu COMFYUI_SERVER, atau ComfyPool jika COMFYUI_SERVERS berisi beberapa GPU."""
+    client_ids = client_ids or {}
+    kwargs = dict(target_folder=script_path, image_format="PNG", output_mode=OUTPUT_MODE,
+                  result_cache=result_cache)
+    if len(COMFYUI_SERVERS) > 1:
+        return ComfyPool(COMFYUI_SERVERS, client_ids=client_ids, **kwargs)
+    client_id = client_ids.get(COMFYUI_SERVER) or client_ids.get(None)
+    return ComfyGenerator(server_address=COMFYUI_SERVER, client_id=client_id, **kwargs)
 
-                   # print(f"[✓] Hasil Gambar: {file_name}", "success")
-                except Exception as e:
-                    print(f"Error saat menyimpan gambar: {e}", "error")
-        return saved_files
-    
 
 my_instance_active = my_instance_id()
 if my_instance_active:
@@ -534,53 +2260,865 @@ def decode_workflow_from_zb64(zb64_str: str) -> dict:
     raw = zlib.decompress(compressed).decode("utf-8")
     return json.loads(raw)
 
-def get_image_long_side(image_path):
-    img = Image.open(image_path)
-    width, height = img.size  # width = lebar, height = tinggi
-    longest_side = max(width, height)
-    return longest_side
+def png_size(image_bytes):
+    """(width, height) dari header IHDR tanpa decode pixel; None jika bukan PNG."""
+    if len(image_bytes) >= 24 and image_bytes.startswith(PNG_SIGNATURE) and image_bytes[12:16] == b"IHDR":
+        return struct.unpack(">II", image_bytes[16:24])
+    return None
+
+def get_image_bytes_long_side(image_bytes):
+    size = png_size(image_bytes)
+    if size is None:
+        from PIL import Image
+        # Format lain (mis. JPEG dari websocket): Image.open hanya membaca header
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            size = img.size
+    return max(size)
+
+def save_jpg_from_bytes(image_bytes, dest_path, quality=95):
+    """Decode sekali dari memori, tulis JPEG final sekali (tanpa PNG sementara di disk)."""
+    from PIL import Image
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        rgb = img if img.mode == "RGB" else img.convert("RGB")  # pastikan RGB untuk JPG
+        rgb.save(dest_path, "JPEG", quality=quality)
+
+class MultipartStream:
+    """
+    Body multipart/form-data yang dibaca bertahap dari disk (file tidak dimuat penuh ke memori).
+    Punya __len__ sehingga requests mengirim Content-Length dan membaca lewat read().
+    files: {name: path} atau {name: (path, offset, length)} untuk satu potongan file.
+    """
+    def __init__(self, fields, files):
+        boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={boundary}"
+        self._parts = []
+        for name, value in fields.items():
+            if value is None:
+                continue
+            self._parts.append(
+                f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode("utf-8")
+            )
+        for name, path in files.items():
+            if not path:
+                continue
+            path, offset, length = path if isinstance(path, tuple) else (path, 0, os.path.getsize(path))
+            self._parts.append(
+                f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; '
+                f'filename="{os.path.basename(path)}"\r\nContent-Type: application/octet-stream\r\n\r\n'.encode("utf-8")
+            )
+            self._parts.append([path, offset, length])
+            self._parts.append(b"\r\n")
+        self._parts.append(f"--{boundary}--\r\n".encode("utf-8"))
+        self._len = sum(len(p) if isinstance(p, bytes) else p[2] for p in self._parts)
+        self._fh = None
+
+    def __len__(self):
+        return self._len
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self._len
+        out = bytearray()
+        while len(out) < size and self._parts:
+            part = self._parts[0]
+            if isinstance(part, bytes):
+                take = part[:size - len(out)]
+                out += take
+                if len(take) < len(part):
+                    self._parts[0] = part[len(take):]
+                else:
+                    self._parts.pop(0)
+                continue
+            if self._fh is None:
+                self._fh = open(part[0], "rb")
+                self._fh.seek(part[1])
+            data = self._fh.read(min(size - len(out), part[2])) if part[2] else b""
+            part[2] -= len(data)
+            if data:
+                out += data
+            else:
+                self._fh.close()
+                self._fh = None
+                self._parts.pop(0)
+        return bytes(out)
 
-def convert_to_jpg_and_remove(src_path, dest_path):
-    img = Image.open(src_path).convert("RGB")  # pastikan RGB untuk JPG
-    img.save(dest_path, "JPEG", quality=95)
-    os.remove(src_path)
+    def close(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
 
-def start_generate_sd():
-    job_kosong = False
-    all_threads = []
-    url_workflow = f"http://{HOST_MY_PC_LOCAL}/vastai_server/get_workflow"
 
-    def upload_image(nomor, filename_only, img_relative_path, job_id):
+def upload_multipart(url, fields, files):
+    """POST multipart streaming. Return (response, jumlah byte body)."""
+    body = MultipartStream(fields, files)
+    try:
+        # retries=0: stream sudah terpakai, retry dilakukan UploadQueue dengan body baru
+        resp = HTTP.post(url, data=body, headers={"Content-Type": body.content_type},
+                         timeout=UPLOAD_TIMEOUT, retries=0)
+    finally:
+        body.close()
+    return resp, len(body)
+
+
+def post_upload(url, fields, files, legacy_payload):
+    """
+    Upload hasil ke job server. Mode multipart dulu; jika server belum mendukung
+    (404/415) pindah permanen ke JSON base64 lama dari legacy_payload().
+    400/422 = error biasa dari request ini (job tidak dikenal, field salah), dikembalikan apa adanya.
+    Return (response, jumlah byte terkirim).
+    """
+    global UPLOAD_MODE
+    if UPLOAD_MODE == "multipart":
+        resp, nbytes = upload_multipart(url, fields, files)
+        if resp.status_code not in (404, 415):
+            return resp, nbytes
+        print(f"{Fore.YELLOW}⚠ Server menolak multipart ({resp.status_code}), pakai upload JSON base64{Style.RESET_ALL}")
+        UPLOAD_MODE = "json"
+    payload = legacy_payload()
+    resp = HTTP.post(url, json_body=payload, timeout=UPLOAD_TIMEOUT, retries=0)
+    return resp, sum(len(v) for v in payload.values() if isinstance(v, str))
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for data in iter(lambda: f.read(STREAM_CHUNK), b""):
+            digest.update(data)
+    return digest.hexdigest()
+
+
+def upload_chunked(url, fields, path, sha256=None, chunk_mb=None):
+    """
+    Upload file besar (video) per chunk, resumable. Protokol job server:
+      POST url multipart (fields + upload_id, filename, total_size, sha256[, offset + CHUNK])
+      -> {"received": n}; tanpa CHUNK = tanya offset yang sudah diterima,
+      409 = offset tidak cocok (pakai "received" dari server), received == total_size = selesai.
+    upload_id stabil (job_id + sha256), jadi retry / restart worker melanjutkan dari offset server.
+    Return (response terakhir, byte terkirim) atau (None, 0) jika server belum mendukung
+    (404/405/501; caller pakai post_upload biasa).
+    """
+    global CHUNKED_UPLOAD
+    if not CHUNKED_UPLOAD:
+        return None, 0
+    total = os.path.getsize(path)
+    sha256 = sha256 or file_sha256(path)
+    chunk = max(1, int((chunk_mb or UPLOAD_CHUNK_MB) * 1024 * 1024))
+    base = dict(fields, upload_id=f"{fields.get('job_id')}-{sha256[:16]}", filename=os.path.basename(path),
+                total_size=total, sha256=sha256)
+    resp, sent = upload_multipart(url, base, {})
+    if resp.status_code in (404, 405, 501):
+        print(f"{Fore.YELLOW}⚠ Server belum mendukung upload_chunk ({resp.status_code}), pakai multipart biasa{Style.RESET_ALL}")
+        CHUNKED_UPLOAD = False
+        return None, 0
+    sent, last, conflicts = 0, -1, 0
+    while resp.status_code in (200, 409):
+        offset = int(resp.json().get("received", 0))
+        if offset >= total:
+            return resp, sent
+        if offset <= last and resp.status_code == 200:
+            raise ConnectionError(f"upload_chunk tidak maju di offset {offset}")
+        # 409 berulang di offset yang sama = server tidak pernah menerima chunk -> jangan loop selamanya
+        conflicts = conflicts + 1 if resp.status_code == 409 and offset <= last else 0
+        if conflicts >= 3:
+            raise ConnectionError(f"upload_chunk 409 berulang di offset {offset}")
+        last = offset
+        length = min(chunk, total - offset)
+        resp, nbytes = upload_multipart(url, dict(base, offset=offset), {"CHUNK": (path, offset, length)})
+        sent += nbytes
+    return resp, sent
+
+
+class UploadQueue:
+    """
+    Upload dengan worker pool tetap dan antrian terbatas.
+    submit() memblok saat antrian penuh -> loop generate ikut melambat (backpressure),
+    jadi memori dan jumlah thread tidak tumbuh tanpa batas saat upload lebih lambat dari GPU.
+    Task mengembalikan (ok, nbytes); task yang gagal di-retry dengan backoff.
+    """
+    def __init__(self, workers=UPLOAD_WORKERS, max_pending=UPLOAD_QUEUE_SIZE, retries=3, backoff=1.0):
+        self.retries = retries
+        self.backoff = backoff
+        self.queue = queue.Queue(maxsize=max(1, max_pending))
+        self.stats = {"uploaded": 0, "failed": 0, "retried": 0, "bytes": 0, "blocked_s": 0.0, "active": 0}
+        self._lock = threading.Lock()
+        self._started = time.time()
+        self._threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(max(1, workers))]
+        for t in self._threads:
+            t.start()
+        METRICS.gauge("upload_queue_depth", self.depth)
+
+    def submit(self, fn, *args, on_done=None):
+        """on_done(ok) dipanggil sekali setelah percobaan terakhir."""
+        t0 = time.time()
+        self.queue.put((fn, args, on_done))
+        waited = time.time() - t0
+        if waited > 0.05:
+            with self._lock:
+                self.stats["blocked_s"] += waited
+            print(f"{Fore.YELLOW}⏳ Antrian upload penuh, generate menunggu {waited:.1f}s{Style.RESET_ALL}")
+
+    def depth(self):
+        return self.queue.qsize() + self.stats["active"]
+
+    def _worker(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                return
+            fn, args, on_done = item
+            with self._lock:
+                self.stats["active"] += 1
+            ok, nbytes = False, 0
+            for attempt in range(self.retries + 1):
+                try:
+                    with METRICS.timer("upload"):
+                        ok, nbytes = fn(*args)
+                except Exception as e:
+                    print(f"{Fore.RED}[EXCEPTION]{Style.RESET_ALL} Upload gagal:", e)
+                    ok = False
+                if ok:
+                    break
+                if attempt < self.retries:
+                    METRICS.inc("upload_retries")
+                    with self._lock:
+                        self.stats["retried"] += 1
+                    time.sleep(self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5))
+            with self._lock:
+                self.stats["active"] -= 1
+                self.stats["uploaded" if ok else "failed"] += 1
+                self.stats["bytes"] += nbytes if ok else 0
+            METRICS.inc("uploads" if ok else "uploads_failed")
+            METRICS.inc("upload_bytes", nbytes if ok else 0)
+            if on_done is not None:
+                try:
+                    on_done(ok)
+                except Exception as e:
+                    print(f"{Fore.RED}[EXCEPTION]{Style.RESET_ALL} Callback upload gagal:", e)
+            self.queue.task_done()
+
+    def throughput(self):
+        elapsed = max(time.time() - self._started, 1e-6)
+        return self.stats["bytes"] / elapsed / (1024 * 1024)
+
+    def report(self):
+        st = self.stats
+        print(f"{Fore.CYAN}📊 Upload: {st['uploaded']} ok, {st['failed']} gagal, {st['retried']} retry, "
+              f"{st['bytes'] / (1024 * 1024):.1f} MB ({self.throughput():.2f} MB/s), "
+              f"antrian {self.depth()}, generate tertahan {st['blocked_s']:.1f}s{Style.RESET_ALL}")
+
+    def close(self):
+        """Tunggu semua upload selesai lalu hentikan worker."""
+        self.queue.join()
+        for _ in self._threads:
+            self.queue.put(None)
+        for t in self._threads:
+            t.join()
+
+
+class JobJournal:
+    """
+    Journal append-only (satu JSON per baris) untuk transisi state job:
+    leased -> queued (prompt_id) -> saved (argumen upload) -> uploaded,
+    atau failed / released. Ditulis + fsync sebelum lanjut, jadi setelah crash
+    atau preemption replay() tahu job mana yang harus dilanjutkan.
+    Baris terakhir yang terpotong (mati saat menulis) diabaikan.
+    """
+    TERMINAL = ("uploaded", "failed", "released")
+
+    def __init__(self, path, fsync=True):
+        self.path = path
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def record(self, job_id, state, **fields):
+        if job_id is None:
+            return
+        line = json.dumps(dict(fields, job_id=job_id, state=state, t=round(time.time(), 3)),
+                          separators=(",", ":"))
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line + "\n")
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+
+    def replay(self):
+        """Return {job_id: record gabungan} untuk job yang belum selesai, urut sesuai lease."""
+        jobs = {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                jobs.setdefault(entry["job_id"], {}).update(entry)
+        return {job_id: entry for job_id, entry in jobs.items() if entry["state"] not in self.TERMINAL}
+
+    def compact(self, unfinished):
+        """Tulis ulang journal hanya berisi job yang belum selesai (atomic replace)."""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for entry in unfinished.values():
+                f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        with self._lock:
+            self._file.close()
+            os.replace(tmp_path, self.path)
+            self._file = open(self.path, "a", encoding="utf-8")
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class IdlePolicy:
+    """
+    Kapan worker berhenti saat job server kosong. Tiap jawaban "empty" -> tunggu (backoff
+    IDLE_POLL_S) lalu poll lagi, sampai idle lebih lama dari grace period:
+    - IDLE_GRACE_S, atau otomatis = perkiraan cold start (COLD_START_S + waktu sampai job
+      pertama selesai), dibatasi IDLE_GRACE_RANGE;
+    - dipotong lagi oleh IDLE_MAX_COST / GPU_PRICE_PER_HOUR jika harga diketahui.
+    Waktu idle vs kerja dicatat untuk report() dan METRICS.
+    """
+    def __init__(self, grace=None, poll=None, price_per_hour=None, max_cost=None):
+        self.grace = IDLE_GRACE_S if grace is None else grace
+        self.poll_min, self.poll_max = poll or IDLE_POLL_S
+        self.price_per_hour = GPU_PRICE_PER_HOUR if price_per_hour is None else price_per_hour
+        self.max_cost = IDLE_MAX_COST if max_cost is None else max_cost
+        self.cold_start = None
+        self.started = time.time()
+        self.idle_total = 0.0
+        self.idle_periods = 0
+        self._idle_since = None
+        self._interval = self.poll_min
+        METRICS.gauge("idle_seconds", lambda: self.idle_seconds())
+
+    def first_job_done(self):
+        """Panggil saat job pertama selesai: cold start yang terukur di instance ini."""
+        if self.cold_start is None:
+            self.cold_start = COLD_START_S + time.time() - PROCESS_STARTED
+
+    def grace_seconds(self):
+        if self.grace is not None:
+            grace = self.grace
+        else:
+            low, high = IDLE_GRACE_RANGE
+            grace = min(max(self.cold_start or COLD_START_S, low), high)
+        if self.price_per_hour and self.max_cost is not None:
+            grace = min(grace, self.max_cost / self.price_per_hour * 3600)
+        return grace
+
+    def poll_hint(self):
+        """Detik yang boleh ditahan server (long-poll) untuk request berikutnya, 0 jika tidak idle."""
+        return self._interval if self._idle_since is not None else 0
+
+    def wait(self, stop_event, spent=0.0):
+        """
+        Job server kosong. Tunggu sebelum poll berikutnya; return False jika grace habis
+        (atau stop_event di-set) -> worker berhenti. `spent`: lama request barusan
+        (server long-poll sudah menahan request selama itu, tidak perlu tidur lagi).
+        """
+        now = time.time()
+        if self._idle_since is None:
+            self._idle_since = now
+            self.idle_periods += 1
+            grace = self.grace_seconds()
+            if grace > 0:
+                print(f"{Fore.YELLOW}💤 Job server kosong, menunggu job baru maksimal {grace:.0f}s "
+                      f"sebelum berhenti{Style.RESET_ALL}")
+        remaining = self.grace_seconds() - (now - self._idle_since)
+        if remaining <= 0:
+            self._end_idle(now)
+            return False
+        METRICS.inc("idle_polls")
+        stopped = stop_event.wait(min(max(self._interval - spent, 0), remaining))
+        self._interval = min(self._interval * 2, self.poll_max)
+        if stopped:
+            self._end_idle(time.time())
+        return not stopped
+
+    def active(self):
+        """Ada job lagi: akhiri periode idle."""
+        if self._idle_since is not None:
+            waited = time.time() - self._idle_since
+            print(f"{Fore.GREEN}▶ Job baru setelah idle {waited:.0f}s{Style.RESET_ALL}")
+            self._end_idle(time.time())
+
+    def _end_idle(self, now):
+        waited = now - self._idle_since
+        self.idle_total += waited
+        METRICS.observe("idle_wait", waited)
+        self._idle_since = None
+        self._interval = self.poll_min
+
+    def idle_seconds(self):
+        current = time.time() - self._idle_since if self._idle_since is not None else 0.0
+        return self.idle_total + current
+
+    def report(self):
+        total = max(time.time() - self.started, 1e-6)
+        idle = self.idle_seconds()
+        line = (f"⏳ Idle {idle:.0f}s ({idle / total:.0%}) vs kerja {total - idle:.0f}s "
+                f"dalam {self.idle_periods} periode idle")
+        if self.cold_start is not None:
+            line += f", cold start ~{self.cold_start:.0f}s"
+        if self.price_per_hour:
+            line += f", biaya idle ~${idle / 3600 * self.price_per_hour:.3f}"
+        print(f"{Fore.CYAN}{line}{Style.RESET_ALL}")
+
+
+class JobPrefetcher:
+    """
+    Ambil job dari job server di thread terpisah dan simpan di buffer,
+    supaya GPU tidak menganggur selama request job berikutnya.
+
+    Mode lease (batch > 1): /lease_jobs mengambil `batch` task sekaligus, /heartbeat
+    memperpanjang lease task yang belum selesai, dan /release_jobs mengembalikan task
+    yang belum dimulai saat berhenti. Jika server belum punya endpoint lease (404),
+    otomatis kembali ke /get_job satu per satu.
+
+    Server kosong tidak langsung berarti selesai: IdlePolicy menentukan berapa lama poll
+    diulang (payload membawa wait_s supaya server yang mendukung long-poll bisa menahan request).
+    extra_fields() dipanggil per request untuk field tambahan (mis. WORKFLOW_HASHES).
+    journal_data(data) memangkas job sebelum dicatat "leased" (mis. WorkflowCache.journal_data).
+    """
+    def __init__(self, url_get_job, post_str, depth=PIPELINE_DEPTH, announce=False, batch=None,
+                 lease_seconds=None, journal=None, idle=None, extra_fields=None, journal_data=None):
+        self.url_get_job = url_get_job
+        self.extra_fields = extra_fields
+        self.journal_data = journal_data
+        self.journal = journal
+        self.idle = idle or IdlePolicy()
+        self.post_str = post_str
+        self.announce = announce
+        self.batch = max(1, batch or JOB_BATCH)
+        self.lease_seconds = lease_seconds or LEASE_SECONDS
+        base_url = url_get_job.rsplit("/", 1)[0]
+        self.url_lease = f"{base_url}/lease_jobs"
+        self.url_heartbeat = f"{base_url}/heartbeat"
+        self.url_release = f"{base_url}/release_jobs"
+        self.lease_supported = self.batch > 1
+        self.leased = {}  # job_id -> waktu lease (belum selesai di-upload)
+        self.queue = queue.Queue(maxsize=max(1, depth, self.batch))
+        self.exhausted = False
+        self._unplaced = []
+        self._lock = threading.Lock()
+        self._release_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        self._heartbeat = None
+        if self.lease_supported:
+            self._heartbeat = threading.Thread(target=self._heartbeat_loop, daemon=True)
+            self._heartbeat.start()
+
+    def _loop(self):
+        try:
+            self._fetch_loop()
+        finally:
+            if self._stop.is_set():
+                # lease_jobs (long-poll) bisa selesai setelah stop() berhenti menunggu thread ini:
+                # batch yang baru di-lease langsung dikembalikan
+                self._release_unstarted()
+
+    def _fetch_loop(self):
+        while not self._stop.is_set():
+            try:
+                if self.announce and not self.idle.poll_hint():
+                    print(f"{Fore.CYAN}🌐 Requesting job from server...{Style.RESET_ALL}")
+                t0 = time.time()
+                with METRICS.timer("job_fetch"):
+                    jobs = self._lease() if self.lease_supported else self._get_one()
+                METRICS.inc("jobs_fetched", len(jobs or ()))
+                # ===================== error / no job =====================
+                if jobs is None:
+                    break
+                if not jobs:
+                    if self.idle.wait(self._stop, spent=time.time() - t0):
+                        continue
+                    break
+                self.idle.active()
+                if self.journal is not None:
+                    for data in jobs:
+                        self.journal.record(self.job_id(data), "leased",
+                                            data=self.journal_data(data) if self.journal_data else data)
+                for i, data in enumerate(jobs):
+                    if not self._put(data):
+                        self._unplaced = jobs[i:]
+                        return
+            except Exception as e:
+                print(f"{Fore.RED}[EXCEPTION]{Style.RESET_ALL} Error saat request:", e)
+                break
+        self._put(None)
+
+    def _payload(self, **fields):
+        payload = dict(self.post_str, **fields)
+        if self.extra_fields is not None:
+            payload.update(self.extra_fields())
+        wait_s = self.idle.poll_hint()
+        if wait_s:
+            payload["wait_s"] = wait_s
+        return payload
+
+    def _get_one(self):
+        # Tanpa retry: get_job tanpa lease, response yang hilang = job sudah diambil dari antrian server
+        response = HTTP.post(self.url_get_job, json_body=self._payload())
+        if response.status_code != 200:
+            print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} Gagal request ({response.status_code}) {response.text}")
+            return None
+        METRICS.inc("job_payload_bytes", len(response.content))
+        data = response.json()
+        if data.get("status") == "empty":
+            return []
+        return [data]
+
+    def _lease(self):
+        payload = self._payload(count=self.batch, lease_s=self.lease_seconds)
+        # Tanpa retry: lease_jobs yang diulang setelah response hilang me-lease batch kedua,
+        # batch pertama tidak pernah dipakai / di-heartbeat. heartbeat & release aman di-retry (per job_id).
+        response = HTTP.post(self.url_lease, json_body=payload, retries=0)
+        if response.status_code in (404, 405, 501):
+            print(f"{Fore.YELLOW}⚠ Server belum mendukung lease_jobs, kembali ke get_job{Style.RESET_ALL}")
+            self.lease_supported = False
+            return self._get_one()
+        if response.status_code != 200:
+            print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} Gagal request ({response.status_code}) {response.text}")
+            return None
+        METRICS.inc("job_payload_bytes", len(response.content))
+        data = response.json()
+        if data.get("status") == "empty":
+            return []
+        jobs = data.get("jobs", [])
+        now = time.time()
+        with self._lock:
+            for job in jobs:
+                self.leased[self.job_id(job)] = now
+        return jobs
+
+    @staticmethod
+    def job_id(data):
+        return (data.get("task") or {}).get("job_id")
+
+    def finished(self, job_id):
+        """Job selesai (di-upload atau gagal permanen): berhenti heartbeat untuk job ini."""
+        with self._lock:
+            self.leased.pop(job_id, None)
+
+    def adopt(self, job_ids):
+        """Job dari journal (session sebelumnya) ikut di-heartbeat sampai selesai."""
+        now = time.time()
+        with self._lock:
+            for job_id in job_ids:
+                self.leased[job_id] = now
+
+    def _heartbeat_loop(self):
+        while not self._closed.wait(max(1.0, self.lease_seconds / 3)):
+            with self._lock:
+                job_ids = list(self.leased)
+            if not job_ids or not self.lease_supported:
+                continue
+            try:
+                payload = dict(self.post_str, job_ids=job_ids, lease_s=self.lease_seconds)
+                resp = HTTP.post(self.url_heartbeat, json_body=payload, retries=HTTP.retries)
+                lost = resp.json().get("lost", []) if resp.status_code == 200 else []
+                with self._lock:
+                    # job yang selesai selama heartbeat berjalan bukan lease hilang
+                    lost = [job_id for job_id in lost if job_id in self.leased]
+                if lost:
+                    print(f"{Fore.YELLOW}⚠ Lease hilang untuk {len(lost)} job: {lost[:5]}{Style.RESET_ALL}")
+            except Exception as e:
+                print(f"{Fore.RED}[EXCEPTION]{Style.RESET_ALL} Heartbeat gagal:", e)
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self.queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(self, timeout=None):
+        """
+        Return data job berikutnya, None jika job habis / error.
+        Raise queue.Empty jika belum ada job dalam `timeout` detik.
+        """
+        if self.exhausted:
+            return None
+        data = self.queue.get(timeout=timeout)
+        if data is None:
+            self.exhausted = True
+        return data
+
+    def stop(self):
+        """Berhenti mengambil job; task yang sudah di-lease tapi belum dimulai dikembalikan."""
+        self._stop.set()
+        self._thread.join(timeout=5)
+        self._release_unstarted()
+
+    def _release_unstarted(self):
+        # Isi buffer + sisa batch yang belum sempat masuk buffer = belum dimulai.
+        # Dipanggil dari stop() dan dari thread fetch saat keluar: lock -> tiap job dikembalikan sekali
+        with self._release_lock:
+            unstarted = [self.job_id(data) for data in self._unplaced]
+            self._unplaced = []
+            while True:
+                try:
+                    data = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if data is not None:
+                    unstarted.append(self.job_id(data))
+        if not self.lease_supported or not unstarted:
+            return
+        for job_id in unstarted:
+            self.finished(job_id)
+            if self.journal is not None:
+                self.journal.record(job_id, "released")
         try:
+            HTTP.post(self.url_release, json_body=dict(self.post_str, job_ids=unstarted), retries=HTTP.retries)
+            print(f"{Fore.YELLOW}↩ {len(unstarted)} job dikembalikan ke server{Style.RESET_ALL}")
+        except Exception as e:
+            print(f"{Fore.RED}[EXCEPTION]{Style.RESET_ALL} Release job gagal:", e)
+
+    def close(self):
+        """Panggil setelah semua upload selesai: hentikan heartbeat."""
+        self.stop()
+        # Poll yang masih berjalan: tunggu sampai selesai supaya hasil lease-nya sempat dikembalikan
+        self._thread.join(timeout=sum(JOB_TIMEOUT))
+        self._closed.set()
+
+
+def open_journal():
+    """
+    Buka journal + replay session sebelumnya.
+    Return (journal, job belum selesai, {server ComfyUI: client_id lama}).
+    """
+    if not JOURNAL_FILE:
+        return None, {}, {}
+    journal = JobJournal(os.path.join(script_path, JOURNAL_FILE))
+    unfinished = journal.replay()
+    journal.compact(unfinished)
+    client_ids = {entry.get("server"): entry["client_id"] for entry in unfinished.values() if entry.get("client_id")}
+    if unfinished:
+        print(f"{Fore.CYAN}♻ Journal: {len(unfinished)} job belum selesai dari session sebelumnya{Style.RESET_ALL}")
+    return journal, unfinished, client_ids
+
+
+def upload_callback(prefetcher, journal, job_id):
+    """on_done untuk UploadQueue: catat hasil upload di journal dan stop heartbeat job."""
+    def on_done(ok):
+        if journal is not None:
+            journal.record(job_id, "uploaded" if ok else "upload_failed")
+        prefetcher.finished(job_id)
+    return on_done
+
+
+def resume_jobs(journal, unfinished, prefetcher, uploads, upload_fn):
+    """
+    Lanjutkan job dari journal: file yang sudah tersimpan langsung di-upload ulang,
+    job yang baru di-lease / masih di ComfyUI dikembalikan untuk run_job_pipeline(resumed=...).
+    """
+    prefetcher.adopt(unfinished)
+    resumed = []
+    for job_id, entry in unfinished.items():
+        upload_args = entry.get("upload")
+        if entry["state"] in ("saved", "upload_failed") and upload_args:
+            if all(os.path.exists(path) for path in entry.get("files", [])):
+                print(f"{Fore.CYAN}♻ Upload ulang hasil job {job_id}{Style.RESET_ALL}")
+                uploads.submit(upload_fn, *upload_args, on_done=upload_callback(prefetcher, journal, job_id))
+                continue
+            print(f"{Fore.YELLOW}⚠ File hasil job {job_id} hilang, generate ulang{Style.RESET_ALL}")
+            entry.pop("prompt_id", None)
+        if entry.get("data"):
+            resumed.append(entry)
+        else:
+            journal.record(job_id, "failed")
+            prefetcher.finished(job_id)
+    return resumed
+
+
+def install_signal_handlers():
+    """SIGTERM (stop/preempt instance) -> drain: tidak ambil job baru, selesaikan prompt + upload."""
+    def handle_sigterm(signum, frame):
+        if not SHUTDOWN.is_set():
+            print(f"{Fore.YELLOW}🛑 SIGTERM diterima: menyelesaikan job berjalan dan upload, lalu berhenti...{Style.RESET_ALL}")
+        SHUTDOWN.set()
+
+    signal.signal(signal.SIGTERM, handle_sigterm)
+
+
+def run_job_pipeline(cg, prefetcher, prepare_job, finish_job, depth=PIPELINE_DEPTH, journal=None, resumed=()):
+    """
+    Jaga sampai `depth` prompt tetap antri di ComfyUI.
+    prepare_job(data) -> (workflow, ctx), None untuk berhenti mengambil job baru,
+    atau False untuk melewati job ini saja (lease dibiarkan kedaluwarsa di server).
+    finish_job(ctx, workflow, images) dipanggil sesuai urutan selesai (bisa out-of-order).
+    resumed: entry journal (lihat resume_jobs) yang dilanjutkan sebelum job baru;
+    prompt yang masih ada di ComfyUI dipasang ulang, sisanya di-submit ulang.
+    """
+    depth = max(1, depth)
+    in_flight = {}
+    accepting = True
+    submitted_at = {}
+    first_job = True
+    METRICS.gauge("prompts_in_flight", lambda: len(in_flight))
+
+    def submit(workflow, ctx, prompt_id=None, server=None):
+        future = cg.reattach_prompt(prompt_id, workflow, server=server) if prompt_id else None
+        if future is None:
+            future = cg.submit_prompt(workflow)
+            if journal is not None:
+                journal.record(ctx.get("job_id"), "queued", prompt_id=future.prompt_id,
+                               client_id=future.client_id, server=future.server)
+        in_flight[future] = (ctx, workflow)
+        submitted_at[future] = time.time()
+
+    for entry in resumed:
+        try:
+            prepared = prepare_job(entry["data"])
+            if prepared:
+                submit(*prepared, prompt_id=entry.get("prompt_id"), server=entry.get("server"))
+                continue
+        except Exception as e:
+            print(f"{Fore.RED}[EXCEPTION]{Style.RESET_ALL} Gagal melanjutkan job {entry.get('job_id')}:", e)
+        # Tidak bisa dilanjutkan (None / False / error): tutup di journal dan berhenti heartbeat,
+        # supaya job tidak di-resume ulang di setiap restart
+        if journal is not None:
+            journal.record(entry.get("job_id"), "failed")
+        prefetcher.finished(entry.get("job_id"))
+
+    while True:
+        if accepting and SHUTDOWN.is_set():
+            print(f"{Fore.YELLOW}🛑 Drain: menunggu {len(in_flight)} prompt selesai{Style.RESET_ALL}")
+            accepting = False
+
+        # ----- isi antrian ComfyUI sampai depth -----
+        while accepting and len(in_flight) < depth:
+            try:
+                data = prefetcher.get(timeout=0.05 if in_flight else 0.5)
+            except queue.Empty:
+                break
+            if data is None:
+                accepting = False
+                break
+            try:
+                prepared = prepare_job(data)
+                if prepared is None:
+                    accepting = False
+                    break
+                if prepared is False:
+                    continue
+                submit(*prepared)
+            except Exception as e:
+                print(f"{Fore.RED}[EXCEPTION]{Style.RESET_ALL} Error saat request:", e)
+                accepting = False
+                break
+
+        if not in_flight:
+            if accepting:
+                continue
+            break
+
+        # ----- tangani prompt yang sudah selesai -----
+        timeout = 0.25 if accepting and len(in_flight) < depth else None
+        done, _ = wait(list(in_flight), timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            ctx, workflow = in_flight.pop(future)
+            started = submitted_at.pop(future)
+            if first_job:
+                print(f"{Fore.CYAN}⏱ Job pertama selesai dalam {time.time() - started:.1f}s "
+                      f"(sejak submit){Style.RESET_ALL}")
+                prefetcher.idle.first_job_done()
+                first_job = False
+            try:
+                images = future.result()
+            except Exception as e:
+                print(f"Error saat menerima data WebSocket: [red]{e}[/red]", "error")
+                images = None
+            try:
+                finish_job(ctx, workflow, images)
+            except Exception as e:
+                print(f"{Fore.RED}[EXCEPTION]{Style.RESET_ALL} Error saat memproses hasil:", e)
+                accepting = False
+            # job_total: submit -> hasil disimpan & masuk antrian upload
+            METRICS.observe("job_total", time.time() - started)
+            METRICS.inc("jobs_completed" if images else "jobs_failed")
+            if journal is not None and not images:
+                journal.record(ctx.get("job_id"), "failed")
+
+    prefetcher.stop()
+
+
+def start_generate_sd(depth=None):
+    depth = depth or PIPELINE_DEPTH
+    uploads = UploadQueue()
+    url_workflow = f"http://{HOST_MY_PC_LOCAL}/vastai_server/get_workflow"
+
+    def upload_media(nomor, job_id, media):
+        """Upload output video per chunk (resumable); server lama -> multipart biasa."""
+        url_upload_chunk = f"http://{HOST_MY_PC_LOCAL}/vastai_server/upload_chunk"
+        url_receive_files_image = f"http://{HOST_MY_PC_LOCAL}/vastai_server/receive_files_image"
+        total = 0
+        for path, sha256 in media:
+            fields = {"nomor": nomor, "WORKER_ID": WORKER_ID, "job_id": job_id, "filename": os.path.basename(path)}
+            resp_upload, nbytes = upload_chunked(url_upload_chunk, fields, path, sha256=sha256)
+            if resp_upload is None:
+                resp_upload, nbytes = upload_multipart(url_receive_files_image, fields, {"IMAGE": path})
+            if resp_upload.status_code != 200:
+                print(f"{Fore.CYAN}🎞 File Video  :{Style.RESET_ALL} {os.path.basename(path)}")
+                print(f"{Fore.RED}📤 Upload      : ❌ Gagal ({resp_upload.status_code}) {resp_upload.text}{Style.RESET_ALL}")
+                return False, total
+            total += nbytes
+            print(f"{Fore.CYAN}🎞 File Video  :{Style.RESET_ALL} {Fore.WHITE}{os.path.basename(path)}{Style.RESET_ALL} "
+                  f"({os.path.getsize(path) / (1024 * 1024):.1f} MB)")
+            print(f"{Fore.GREEN}📤 Upload      : ✅ Berhasil dikirim ke server{Style.RESET_ALL}")
+        return True, total
+
+    def upload_image(nomor, filename_only, img_relative_path, job_id, media=None):
+        if media:
+            ok, nbytes = upload_media(nomor, job_id, media)
+            if not ok or not img_relative_path:
+                return ok, nbytes
+            ok, image_bytes = upload_image(nomor, filename_only, img_relative_path, job_id)
+            return ok, nbytes + image_bytes
+
+        def legacy_payload():
             with open(img_relative_path, "rb") as f:
                 img_bytes = f.read()
             img_b64 = base64.b64encode(img_bytes).decode("utf-8")
+            return dict(fields, IMAGE_BASE64=img_b64)
 
-            upload_payload = {
-                "nomor": nomor,
-                "WORKER_ID": WORKER_ID,
-                "job_id": job_id,
-                "filename": filename_only,
-                "IMAGE_BASE64": img_b64
-            }
+        fields = {
+            "nomor": nomor,
+            "WORKER_ID": WORKER_ID,
+            "job_id": job_id,
+            "filename": filename_only,
+        }
 
-            url_receive_files_image = f"http://{HOST_MY_PC_LOCAL}/vastai_server/receive_files_image"
-            resp_upload = requests.post(url_receive_files_image, json=upload_payload)
+        url_receive_files_image = f"http://{HOST_MY_PC_LOCAL}/vastai_server/receive_files_image"
+        resp_upload, nbytes = post_upload(url_receive_files_image, fields, {"IMAGE": img_relative_path}, legacy_payload)
 
-            if resp_upload.status_code == 200:
-                print(f"{Fore.CYAN}📁 File Gambar :{Style.RESET_ALL} {Fore.WHITE}{filename_only}{Style.RESET_ALL}")
-                print(f"{Fore.GREEN}📤 Upload      : ✅ Berhasil dikirim ke server{Style.RESET_ALL}")
-            else:
-                print(f"{Fore.CYAN}📁 File Gambar :{Style.RESET_ALL} {filename_only}")
-                print(f"{Fore.RED}📤 Upload      : ❌ Gagal ({resp_upload.status_code}) {resp_upload.text}{Style.RESET_ALL}")
-        except Exception as e:
-            print(f"{Fore.RED}[EXCEPTION]{Style.RESET_ALL} Upload gagal:", e)
+        if resp_upload.status_code == 200:
+            print(f"{Fore.CYAN}📁 File Gambar :{Style.RESET_ALL} {Fore.WHITE}{filename_only}{Style.RESET_ALL}")
+            print(f"{Fore.GREEN}📤 Upload      : ✅ Berhasil dikirim ke server{Style.RESET_ALL}")
+            return True, nbytes
+        print(f"{Fore.CYAN}📁 File Gambar :{Style.RESET_ALL} {filename_only}")
+        print(f"{Fore.RED}📤 Upload      : ❌ Gagal ({resp_upload.status_code}) {resp_upload.text}{Style.RESET_ALL}")
+        return False, 0
 
     # pastikan workflow.txt ada
     if not os.path.exists(WORKFLOW_FILE):
         print(f"{Fore.CYAN}[REQ]{Style.RESET_ALL} Requesting {WORKFLOW_FILE} dari server...")
         try:
-            response = requests.get(url_workflow)
+            response = HTTP.get(url_workflow)
             if response.status_code == 200:
                 with open(WORKFLOW_FILE, "wb") as f:
                     f.write(response.content)
@@ -593,103 +3131,124 @@ def start_generate_sd():
             sys.exit(1)
 
     system = platform.system().lower()
-    if "linux" in system:
-        loras = get_lora_list(WORKFLOW_FILE)
-        lora_dir = "/workspace/ComfyUI/models/loras"
-        for filename in loras:
-            file_path = os.path.join(lora_dir, filename)
-            if not os.path.exists(file_path):
-                print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} File lora tidak ditemukan: {file_path}")
-                sys.exit(1)
+    if "linux" in system and not ensure_models(WORKFLOW_FILE):
+        sys.exit(1)
+
+    # Parse workflow.json sekali untuk semua job
+    template = WorkflowTemplate.from_file(WORKFLOW_FILE)
 
     url_get_job = f"http://{HOST_MY_PC_LOCAL}/vastai_server/get_job"
     post_str = {"WORKER_ID": WORKER_ID}
 
-    while not job_kosong:
-        try:
-            response = requests.post(url_get_job, json=post_str)
-
-            if response.status_code != 200:
-                print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} Gagal request ({response.status_code}) {response.text}")
-                break
-
-            data = response.json()
-
-            # ===================== no job =====================
-            if data.get("status") == "empty":
-                job_kosong = True
-                break
-
-            # ===================== got a job =====================
-            if data.get("status") == "ok":
-                task = data.get("task", {})
-
-                job_id = task.get("job_id", "")
-                text_prompt = task.get("text_prompt", "")
-                char_name_input = task.get("char_name_input", "")
-                seed = task.get("seed", "")
-                nomor = task.get("number", "")
-
-                short_prompt = (text_prompt[:60] + "...") if len(text_prompt) > 60 else text_prompt
-
-                print(f"{Fore.YELLOW}============================================================{Style.RESET_ALL}")
-                print(f"{Fore.CYAN}🆔 JOB      :{Style.RESET_ALL} {job_id}  ({nomor})")
-                print(f"{Fore.MAGENTA}📜 PROMPT   :{Style.RESET_ALL} {short_prompt}")
-                print(f"{Fore.BLUE}👤 CHAR     :{Style.RESET_ALL} {char_name_input}")
-                print(f"{Fore.GREEN}🎲 SEED     :{Style.RESET_ALL} {seed}")
-                print(f"{Fore.YELLOW}============================================================{Style.RESET_ALL}")
-
-                # ----- generate image -----
-                resolution = "SD"
-                image_format = "PNG"
-                PROJECT_PATH = f"./{char_name_input}"
-                os.makedirs(PROJECT_PATH, exist_ok=True)
-
-                wf = LoadWorkFlow(
-                    workflow_path=WORKFLOW_FILE,
-                    resolution=resolution
-                )
-                wf.seed(seed)
-                wf.positive_prompt(text_prompt)
-
-                cg = ComfyGenerator(
-                    server_address=COMFYUI_SERVER,
-                    target_folder=PROJECT_PATH,
-                    image_format=image_format
-                )
-
-                images = cg.run_prompt(wf.workflow())
-
-                if images:
-                    filename_only = f"{char_name_input}_{nomor}.png"
-                    img_relative_path = os.path.join(PROJECT_PATH, filename_only)
-                    cg.save_images(images, img_path=img_relative_path)
-
-                    # ----- Upload di thread terpisah -----
-                    proses = threading.Thread(
-                        target=upload_image,
-                        args=(nomor, filename_only, img_relative_path, job_id),
-                        daemon=True  # agar thread tidak mencegah exit program
-                    )
-                    all_threads.append(proses)
-                    proses.start()
-
-                continue
-
-            # ===================== undefined =====================
+    def prepare_job(data):
+        # ===================== undefined =====================
+        if data.get("status") != "ok":
             print(f"{Fore.RED}[WARN]{Style.RESET_ALL} Response tidak dikenal:", data)
-            break
-
-        except Exception as e:
-            print(f"{Fore.RED}[EXCEPTION]{Style.RESET_ALL} Error saat request:", e)
-            break
+            return None
 
-    # loop menunggu selesai upload semua
-    for proses in all_threads:
-        proses.join()
+        # ===================== got a job =====================
+        task = data.get("task", {})
+
+        job_id = task.get("job_id", "")
+        text_prompt = task.get("text_prompt", "")
+        char_name_input = task.get("char_name_input", "")
+        seed = task.get("seed", "")
+        nomor = task.get("number", "")
+
+        short_prompt = (text_prompt[:60] + "...") if len(text_prompt) > 60 else text_prompt
+
+        print(f"{Fore.YELLOW}============================================================{Style.RESET_ALL}")
+        print(f"{Fore.CYAN}🆔 JOB      :{Style.RESET_ALL} {job_id}  ({nomor})")
+        print(f"{Fore.MAGENTA}📜 PROMPT   :{Style.RESET_ALL} {short_prompt}")
+        print(f"{Fore.BLUE}👤 CHAR     :{Style.RESET_ALL} {char_name_input}")
+        print(f"{Fore.GREEN}🎲 SEED     :{Style.RESET_ALL} {seed}")
+        print(f"{Fore.YELLOW}============================================================{Style.RESET_ALL}")
+
+        # ----- generate image -----
+        resolution = "SD"
+        PROJECT_PATH = f"./{char_name_input}"
+        os.makedirs(PROJECT_PATH, exist_ok=True)
+
+        wf = LoadWorkFlow(
+            template=template,
+            resolution=resolution
+        )
+        wf.seed(seed)
+        wf.positive_prompt(text_prompt)
+        if OUTPUT_MODE == "ws":
+            wf.use_websocket_output()
+
+        ctx = {
+            "job_id": job_id,
+            "nomor": nomor,
+            "char_name_input": char_name_input,
+            "project_path": PROJECT_PATH,
+        }
+        return wf.workflow(), ctx
+
+    def finish_job(ctx, workflow, images):
+        if not images:
+            prefetcher.finished(ctx["job_id"])
+            return
+        filename_only = f"{ctx['char_name_input']}_{ctx['nomor']}.png"
+        img_relative_path = os.path.join(ctx["project_path"], filename_only)
+        with METRICS.timer("image_save"):
+            cg.save_images(images, img_path=img_relative_path, workflow=workflow)
+
+        # Workflow video (Wan I2V / VHS): file sudah di disk, diupload per chunk
+        outputs = [data for img_list in images.values() for data in img_list]
+        media = [[m.path, m.sha256] for m in outputs if isinstance(m, MediaOutput)]
+        if len(media) < len(outputs):
+            files = [img_relative_path]
+        else:
+            files, img_relative_path = [], None
+
+        # ----- Upload lewat antrian terbatas (memblok jika penuh) -----
+        upload_args = [ctx["nomor"], filename_only, img_relative_path, ctx["job_id"]]
+        if media:
+            upload_args.append(media)
+            files += [path for path, _ in media]
+        if journal is not None:
+            journal.record(ctx["job_id"], "saved", upload=upload_args, files=files)
+        uploads.submit(upload_image, *upload_args, on_done=upload_callback(prefetcher, journal, ctx["job_id"]))
+
+    # Satu session ComfyGenerator (satu websocket) untuk semua job, `depth` prompt in-flight
+    # Job yang belum selesai dari session sebelumnya (crash / preemption) dilanjutkan dulu
+    journal, unfinished, client_ids = open_journal()
+    # Job yang di-issue ulang (workflow identik) diambil dari cache, tidak di-generate lagi
+    result_cache = None
+    if RESULT_CACHE_DIR:
+        result_cache = ResultCache(os.path.join(script_path, RESULT_CACHE_DIR), RESULT_CACHE_MB * 1024 * 1024)
+    # Satu session per ComfyUI/GPU; depth berlaku per GPU
+    with open_comfy(client_ids, result_cache=result_cache) as cg:
+        sessions = getattr(cg, "sessions", [cg])
+        prefetcher = JobPrefetcher(url_get_job, post_str, depth=depth * len(sessions), journal=journal)
+        resumed = resume_jobs(journal, unfinished, prefetcher, uploads, upload_image) if unfinished else []
+        # Warm-up jalan di ComfyUI selagi prefetcher mengambil job pertama
+        if WARMUP and not resumed:
+            for session in sessions:
+                start_warmup(session, template)
+        run_job_pipeline(cg, prefetcher, prepare_job, finish_job, depth=depth * len(sessions),
+                         journal=journal, resumed=resumed)
+        if len(sessions) > 1:
+            cg.report()
+
+    # loop menunggu selesai upload semua (lease tetap di-heartbeat sampai upload selesai)
+    uploads.close()
+    uploads.report()
+    METRICS.report()
+    prefetcher.idle.report()
+    if result_cache is not None:
+        result_cache.report()
+    prefetcher.close()
+    if journal is not None:
+        journal.close()
     # ===================== no job =====================
     print(f"{Fore.YELLOW}============================================================{Style.RESET_ALL}")
-    print(f"{Fore.GREEN}✅ Tidak ada job lagi (habis).{Style.RESET_ALL}")
+    if SHUTDOWN.is_set():
+        print(f"{Fore.GREEN}🛑 Drain selesai (SIGTERM), semua upload sudah dikirim.{Style.RESET_ALL}")
+    else:
+        print(f"{Fore.GREEN}✅ Tidak ada job lagi (habis).{Style.RESET_ALL}")
     my_instance_active = my_instance_id()
     if my_instance_active:
         destroy_instance(my_instance_active)
@@ -697,128 +3256,172 @@ def start_generate_sd():
     print(f"{Fore.YELLOW}============================================================{Style.RESET_ALL}")
 
 
-def start_generate_hd():
-    job_kosong = False
-    all_threads = []
+def start_generate_hd(depth=None):
+    depth = depth or PIPELINE_DEPTH
+    uploads = UploadQueue()
     url_get_job = f"http://{HOST_MY_PC_LOCAL}/vastai_server/get_job"
+    url_workflow = f"http://{HOST_MY_PC_LOCAL}/vastai_server/get_workflow"
     post_str = {"WORKER_ID": WORKER_ID}
+    # Workflow upscale hampir selalu sama: di-cache per hash, job cukup membawa hash + patch
+    workflow_cache = None
+    if WORKFLOW_CACHE_DIR:
+        workflow_cache = WorkflowCache(os.path.join(script_path, WORKFLOW_CACHE_DIR), WORKFLOW_CACHE_SIZE,
+                                       url_workflow=url_workflow)
 
     # ----- Nested function: upload HD+SD images -----
     def upload_hd_image(job_id, prefix, file_path_sd, file_path_hd=None):
-        try:
+        if not (file_path_hd and os.path.exists(file_path_hd)):
+            file_path_hd = None
+
+        def legacy_payload():
             def compress_b64(file_path):
                 with open(file_path, "rb") as f:
-                    return zlib.compress(f.read())
-
-            img_sd_b64 = base64.b64encode(compress_b64(file_path_sd)).decode("utf-8")
-            img_hd_b64 = None
-            if file_path_hd and os.path.exists(file_path_hd):
-                img_hd_b64 = base64.b64encode(compress_b64(file_path_hd)).decode("utf-8")
-
-            upload_payload = {
-                "WORKER_ID": WORKER_ID,
-                "job_id": job_id,
-                "filename": prefix,
-                "IMAGE_SD_BASE64": img_sd_b64,
-                "IMAGE_HD_BASE64": img_hd_b64
-            }
-
-            url_receive_files_image_hd = f"http://{HOST_MY_PC_LOCAL}/vastai_server/receive_files_image_hd"
-            print(f"{Fore.CYAN}📤 Uploading SD+HD images to server...{Style.RESET_ALL}")
-            resp_upload = requests.post(url_receive_files_image_hd, json=upload_payload)
-
-            if resp_upload.status_code == 200:
-                print(f"{Fore.GREEN}✅ Upload successful: SD+HD images sent!{Style.RESET_ALL}")
-                print(f"{Fore.GREEN}SD Path:{Style.RESET_ALL} {file_path_sd}")
-                if file_path_hd:
-                    print(f"{Fore.GREEN}HD Path:{Style.RESET_ALL} {file_path_hd}")
-                print(f"{Fore.YELLOW}{'-'*50}{Style.RESET_ALL}")
-            else:
-                print(f"{Fore.RED}❌ Upload failed: {resp_upload.status_code} {resp_upload.text}{Style.RESET_ALL}")
-        except Exception as e:
-            print(f"{Fore.RED}[EXCEPTION]{Style.RESET_ALL} Upload failed:", e)
-
-    while not job_kosong:
-        try:
-            print(f"{Fore.CYAN}🌐 Requesting job from server...{Style.RESET_ALL}")
-            response = requests.post(url_get_job, json=post_str)
-            if response.status_code != 200:
-                print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} Gagal request ({response.status_code}) {response.text}")
-                break
-
-            data = response.json()
-
-            # ===================== no job =====================
-            if data.get("status") == "empty":
-                job_kosong = True
-                break
-
-            # ===================== got a job =====================
-            print(f"{Fore.CYAN}🔹 Job received:{Style.RESET_ALL}")
-            task = data.get("task", {})
-            job_id = task.get("job_id")
-            nomor = task.get("number")
-            prefix_path = task.get("png_file")
-
-            WORKFLOW_RAW = data.get("WORKFLOW")
-            WORKFLOW_DICT = decode_workflow_from_zb64(WORKFLOW_RAW)
-            prefix = os.path.splitext(os.path.basename(prefix_path))[0]
+                    return base64.b64encode(zlib.compress(f.read())).decode("utf-8")
 
-            print(f"{Fore.CYAN}Number       :{Style.RESET_ALL} {nomor}")
-            print(f"{Fore.CYAN}Job ID       :{Style.RESET_ALL} {job_id}")
-            print(f"{Fore.CYAN}File to HD   :{Style.RESET_ALL} {prefix_path}")
-            print(f"{Fore.CYAN}Prefix       :{Style.RESET_ALL} {prefix}")
+            return dict(fields,
+                        IMAGE_SD_BASE64=compress_b64(file_path_sd),
+                        IMAGE_HD_BASE64=compress_b64(file_path_hd) if file_path_hd else None)
 
-            wf = LoadWorkFlow(workflow_json=WORKFLOW_DICT, resolution="HD")
-            cg = ComfyGenerator(server_address=COMFYUI_SERVER, target_folder=script_path, image_format="PNG")
-
-            print(f"{Fore.CYAN}🖌 Generating HD images...{Style.RESET_ALL}")
-            images = cg.run_prompt(wf.workflow())
-
-            if not images:
-                print(f"{Fore.RED}❌ Tidak ada gambar dihasilkan.{Style.RESET_ALL}")
-                continue
+        fields = {
+            "WORKER_ID": WORKER_ID,
+            "job_id": job_id,
+            "filename": prefix,
+        }
 
-            # Save HD & SD
-            file_cg = cg.save_images_HD(images, prefix=prefix)
-            sd_folder = os.path.join(script_path, "sd")
-            hd_folder = os.path.join(script_path, "hd")
-            os.makedirs(sd_folder, exist_ok=True)
-            os.makedirs(hd_folder, exist_ok=True)
-
-            file_path_sd, file_path_hd = None, None
-            if len(file_cg) >= 2:
-                is_hd_img = get_image_long_side(file_cg[0]) > get_image_long_side(file_cg[1])
-                file_path_sd = os.path.join(sd_folder, f"{prefix}_SD.jpg")
-                file_path_hd = os.path.join(hd_folder, f"{prefix}_HD.jpg")
-                if is_hd_img:
-                    convert_to_jpg_and_remove(file_cg[1], file_path_sd)
-                    convert_to_jpg_and_remove(file_cg[0], file_path_hd)
+        url_receive_files_image_hd = f"http://{HOST_MY_PC_LOCAL}/vastai_server/receive_files_image_hd"
+        print(f"{Fore.CYAN}📤 Uploading SD+HD images to server...{Style.RESET_ALL}")
+        resp_upload, nbytes = post_upload(url_receive_files_image_hd, fields,
+                                          {"IMAGE_SD": file_path_sd, "IMAGE_HD": file_path_hd}, legacy_payload)
+
+        if resp_upload.status_code == 200:
+            print(f"{Fore.GREEN}✅ Upload successful: SD+HD images sent!{Style.RESET_ALL}")
+            print(f"{Fore.GREEN}SD Path:{Style.RESET_ALL} {file_path_sd}")
+            if file_path_hd:
+                print(f"{Fore.GREEN}HD Path:{Style.RESET_ALL} {file_path_hd}")
+            print(f"{Fore.YELLOW}{'-'*50}{Style.RESET_ALL}")
+            return True, nbytes
+        print(f"{Fore.RED}❌ Upload failed: {resp_upload.status_code} {resp_upload.text}{Style.RESET_ALL}")
+        return False, 0
+
+    def prepare_job(data):
+        # ===================== got a job =====================
+        print(f"{Fore.CYAN}🔹 Job received:{Style.RESET_ALL}")
+        task = data.get("task", {})
+        job_id = task.get("job_id")
+        nomor = task.get("number")
+        prefix_path = task.get("png_file")
+
+        if workflow_cache is not None:
+            template = workflow_cache.template(data)
+        else:
+            template = WorkflowTemplate(decode_workflow_from_zb64(data.get("WORKFLOW")))
+        prefix = os.path.splitext(os.path.basename(prefix_path))[0]
+
+        print(f"{Fore.CYAN}Number       :{Style.RESET_ALL} {nomor}")
+        print(f"{Fore.CYAN}Job ID       :{Style.RESET_ALL} {job_id}")
+        print(f"{Fore.CYAN}File to HD   :{Style.RESET_ALL} {prefix_path}")
+        print(f"{Fore.CYAN}Prefix       :{Style.RESET_ALL} {prefix}")
+
+        if template is None:
+            print(f"{Fore.RED}❌ Workflow {str(data.get('WORKFLOW_HASH'))[:12]} tidak tersedia, job dilewati.{Style.RESET_ALL}")
+            prefetcher.finished(job_id)
+            if journal is not None:
+                journal.record(job_id, "failed")
+            return False
+
+        wf = LoadWorkFlow(template=template, resolution="HD")
+        if wf.apply_patch(data.get("WORKFLOW_PATCH")):
+            print(f"{Fore.YELLOW}⚠ Sebagian WORKFLOW_PATCH tidak dikenali, diabaikan{Style.RESET_ALL}")
+        if OUTPUT_MODE == "ws":
+            wf.use_websocket_output()
+
+        print(f"{Fore.CYAN}🖌 Generating HD images...{Style.RESET_ALL}")
+        return wf.workflow(), {"job_id": job_id, "prefix": prefix}
+
+    def finish_job(ctx, workflow, images):
+        job_id, prefix = ctx["job_id"], ctx["prefix"]
+        if not images:
+            print(f"{Fore.RED}❌ Tidak ada gambar dihasilkan.{Style.RESET_ALL}")
+            prefetcher.finished(job_id)
+            return
+
+        # Upscale hanya mengirim gambar: file video hasil stream dihapus supaya media_dir tidak bocor
+        outputs = []
+        for image_data in (data for img_list in images.values() for data in img_list):
+            if isinstance(image_data, MediaOutput):
+                try:
+                    os.remove(image_data.path)
+                except OSError:
+                    pass
+            else:
+                outputs.append(image_data)
+
+        # Klasifikasi SD/HD dari header IHDR, JPEG langsung dari bytes yang diterima
+        if not outputs:
+            print(f"{Fore.RED}❌ Tidak ada gambar dihasilkan.{Style.RESET_ALL}")
+            prefetcher.finished(job_id)
+            if journal is not None:
+                journal.record(job_id, "failed")
+            return
+        sd_folder = os.path.join(script_path, "sd")
+        hd_folder = os.path.join(script_path, "hd")
+        os.makedirs(sd_folder, exist_ok=True)
+        os.makedirs(hd_folder, exist_ok=True)
+
+        file_path_sd, file_path_hd = None, None
+        try:
+            file_path_sd = os.path.join(sd_folder, f"{prefix}_SD.jpg")
+            with METRICS.timer("image_save"):
+                if len(outputs) >= 2:
+                    sd_bytes, hd_bytes = outputs[0], outputs[1]
+                    if get_image_bytes_long_side(outputs[0]) > get_image_bytes_long_side(outputs[1]):
+                        sd_bytes, hd_bytes = outputs[1], outputs[0]
+                    file_path_hd = os.path.join(hd_folder, f"{prefix}_HD.jpg")
+                    save_jpg_from_bytes(sd_bytes, file_path_sd)
+                    save_jpg_from_bytes(hd_bytes, file_path_hd)
                 else:
-                    convert_to_jpg_and_remove(file_cg[0], file_path_sd)
-                    convert_to_jpg_and_remove(file_cg[1], file_path_hd)
-            elif len(file_cg) == 1:
-                file_path_sd = os.path.join(sd_folder, f"{prefix}_SD.jpg")
-                convert_to_jpg_and_remove(file_cg[0], file_path_sd)
-
-            # ----- Upload di thread terpisah -----
-            proses = threading.Thread(
-                target=upload_hd_image,
-                args=(job_id, prefix, file_path_sd, file_path_hd),
-                daemon=True
-            )
-            all_threads.append(proses)
-            proses.start()
-
+                    save_jpg_from_bytes(outputs[0], file_path_sd)
         except Exception as e:
-            print(f"{Fore.RED}[EXCEPTION]{Style.RESET_ALL} Error saat request:", e)
-            break
+            print(f"Error saat menyimpan gambar: {e}", "error")
+            prefetcher.finished(job_id)
+            if journal is not None:
+                journal.record(job_id, "failed")
+            return
+
+        # ----- Upload lewat antrian terbatas (memblok jika penuh) -----
+        upload_args = [job_id, prefix, file_path_sd, file_path_hd]
+        if journal is not None:
+            journal.record(job_id, "saved", upload=upload_args, files=[p for p in (file_path_sd, file_path_hd) if p])
+        uploads.submit(upload_hd_image, *upload_args, on_done=upload_callback(prefetcher, journal, job_id))
+
+    journal, unfinished, client_ids = open_journal()
+    with open_comfy(client_ids) as cg:
+        sessions = getattr(cg, "sessions", [cg])
+        advertise = (lambda: {"WORKFLOW_HASHES": workflow_cache.hashes()}) if workflow_cache is not None else None
+        prefetcher = JobPrefetcher(url_get_job, post_str, depth=depth * len(sessions), announce=True,
+                                   journal=journal, extra_fields=advertise,
+                                   journal_data=workflow_cache.journal_data if workflow_cache is not None else None)
+        resumed = resume_jobs(journal, unfinished, prefetcher, uploads, upload_hd_image) if unfinished else []
+        run_job_pipeline(cg, prefetcher, prepare_job, finish_job, depth=depth * len(sessions),
+                         journal=journal, resumed=resumed)
+        if len(sessions) > 1:
+            cg.report()
 
     # ===================== no job =====================
-    for proses in all_threads:
-        proses.join()
+    uploads.close()
+    uploads.report()
+    METRICS.report()
+    if workflow_cache is not None:
+        workflow_cache.report()
+    prefetcher.idle.report()
+    prefetcher.close()
+    if journal is not None:
+        journal.close()
     print(f"{Fore.YELLOW}{'='*60}{Style.RESET_ALL}")
-    print(f"{Fore.GREEN}✅ Tidak ada job lagi (habis).{Style.RESET_ALL}")
+    if SHUTDOWN.is_set():
+        print(f"{Fore.GREEN}🛑 Drain selesai (SIGTERM), semua upload sudah dikirim.{Style.RESET_ALL}")
+    else:
+        print(f"{Fore.GREEN}✅ Tidak ada job lagi (habis).{Style.RESET_ALL}")
     my_instance_active = my_instance_id()
     if my_instance_active:
         destroy_instance(my_instance_active)
@@ -831,7 +3434,7 @@ def start():
     payload = {"is_upscale": is_upscale}
 
     try:
-        response = requests.post(url_generate_type, json=payload)
+        response = HTTP.post(url_generate_type, json_body=payload)
         if response.status_code == 200:
             data = response.json()  # ambil response JSON dari server
             # print("Response:", data)
@@ -859,8 +3462,48 @@ if __name__ == "__main__":
     for arg in sys.argv[1:]:
         if arg.startswith("API="):
             VASTAI_API_KEY = arg.split("=", 1)[1]
-            break
-
-    check_comfyui_ready(COMFYUI_SERVER)
+        elif arg.startswith("DEPTH="):
+            PIPELINE_DEPTH = max(1, int(arg.split("=", 1)[1]))
+        elif arg == "GZIP=yes":
+            GZIP_JSON = True
+        elif arg.startswith("BATCH="):
+            JOB_BATCH = max(1, int(arg.split("=", 1)[1]))
+        elif arg.startswith("OUTPUT="):
+            OUTPUT_MODE = arg.split("=", 1)[1].lower()
+        elif arg == "WARMUP=no":
+            WARMUP = False
+        elif arg.startswith("SERVERS="):
+            COMFYUI_SERVERS = [s for s in arg.split("=", 1)[1].split(",") if s]
+            COMFYUI_SERVER = COMFYUI_SERVERS[0]
+        elif arg == "CACHE=no":
+            RESULT_CACHE_DIR = None
+        elif arg.startswith("CHUNK_MB="):
+            UPLOAD_CHUNK_MB = float(arg.split("=", 1)[1])
+        elif arg.startswith("CACHE_MB="):
+            RESULT_CACHE_MB = int(arg.split("=", 1)[1])
+        elif arg == "WF_CACHE=no":
+            WORKFLOW_CACHE_DIR = None
+        elif arg == "JOURNAL=no":
+            JOURNAL_FILE = None
+        elif arg.startswith("IDLE="):
+            value = arg.split("=", 1)[1]
+            IDLE_GRACE_S = None if value == "auto" else float(value)
+        elif arg.startswith("PRICE="):
+            GPU_PRICE_PER_HOUR = float(arg.split("=", 1)[1])
+        elif arg.startswith("IDLE_MAX_COST="):
+            IDLE_MAX_COST = float(arg.split("=", 1)[1])
+        elif arg.startswith("MODELS="):
+            MODEL_MANIFEST = arg.split("=", 1)[1]
+        elif arg.startswith("METRICS="):
+            value = arg.split("=", 1)[1]
+            METRICS_PORT = 0 if value == "no" else int(value)
+        elif arg.startswith("METRICS_HOST="):
+            METRICS_HOST = arg.split("=", 1)[1]
+
+    if METRICS_PORT:
+        METRICS.serve()
+    install_signal_handlers()
+    for server in COMFYUI_SERVERS:
+        check_comfyui_ready(server)
     print(f"{Fore.GREEN}✅ ComfyUI siap, mulai generate HD...{Style.RESET_ALL}")
     start()
\ No newline at end of file
@@ -68,6 +68,7 @@ function provisioning_start() {
     provisioning_get_apt_packages
     provisioning_get_nodes
     provisioning_get_pip_packages
+    provisioning_get_models_parallel
     provisioning_get_files \
         "${COMFYUI_DIR}/models/checkpoints" \
         "${CHECKPOINT_MODELS[@]}"
@@ -177,6 +178,17 @@ function provisioning_get_nodes() {
     done
 }
 
+# model_provisioner.py + models.json (chunk paralel, resume, sha256). File yang sudah ada
+# dilewati oleh provisioning_get_files dan blok wget di bawah, jadi ini cukup dijalankan lebih dulu.
+function provisioning_get_models_parallel() {
+    provisioner="${MODEL_PROVISIONER:-${WORKSPACE}/model_provisioner.py}"
+    manifest="${MODEL_MANIFEST:-${WORKSPACE}/models.json}"
+    if [[ -f $provisioner && -f $manifest ]]; then
+        printf "Downloading models (paralel) dari %s...\n" "${manifest}"
+        python "${provisioner}" --manifest "${manifest}" --all --comfy-dir "${COMFYUI_DIR}"
+    fi
+}
+
 function provisioning_get_files() {
     if [[ -z $2 ]]; then return 1; fi
     
@@ -186,6 +198,10 @@ function provisioning_get_files() {
     arr=("$@")
     printf "Downloading %s model(s) to %s...\n" "${#arr[@]}" "$dir"
     for url in "${arr[@]}"; do
+        if [[ -f "${dir}/${url##*/}" ]]; then
+            printf "✅ %s already exists. Skipping download.\n" "${url##*/}"
+            continue
+        fi
         printf "Downloading: %s\n" "${url}"
         provisioning_download "${url}" "${dir}"
         printf "\n"
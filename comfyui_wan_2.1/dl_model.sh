@@ -1,5 +1,17 @@
 #!/bin/bash
 
+# Pakai model_provisioner.py (chunk paralel, resume, sha256) jika ada; wget -c sebagai fallback
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+PROVISIONER="${MODEL_PROVISIONER:-${SCRIPT_DIR}/../model_provisioner.py}"
+if [[ -f $PROVISIONER ]]; then
+    echo "⬇️  Downloading Wan 2.1 models (paralel)..."
+    if python "$PROVISIONER" --manifest "${SCRIPT_DIR}/models.json" --all --comfy-dir /workspace/ComfyUI; then
+        echo "✅ Done downloading all Wan 2.1 models!"
+        exit 0
+    fi
+    echo "⚠️  Provisioner gagal, lanjut dengan wget..."
+fi
+
 echo "⬇️  Downloading Wan 2.1 I2V base model..."
 mkdir -p /workspace/ComfyUI/models/diffusion_models
 cd /workspace/ComfyUI/models/diffusion_models
@@ -0,0 +1,491 @@
+# File Name : model_provisioner.py
+"""
+Provisioner model ComfyUI: baca model yang dibutuhkan workflow (ckpt, LoRA Power Lora Loader,
+VAE, CLIP vision, text encoder, ...), lalu download yang belum ada secara paralel:
+- tiap file dipecah jadi chunk Range, semua chunk semua file berbagi satu pool koneksi
+  (model untuk job pertama lebih dulu, yang terbesar lebih dulu);
+- resume: progress chunk disimpan di <part>.json, restart hanya mengambil chunk yang belum;
+- sha256 dihitung selagi download (chunk berurutan dibaca ulang dari page cache) dan
+  dicocokkan dengan manifest / header X-Linked-Etag Hugging Face;
+- store content-addressed (<store>/sha256/ab/<hash>), file di models/ hanya hardlink/symlink,
+  jadi file yang sama dengan nama lain tidak didownload dua kali.
+
+    python model_provisioner.py workflow.json --manifest models.json
+    python model_provisioner.py --manifest comfyui_wan_2.1/models.json --all
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+COMFYUI_DIR = "/workspace/ComfyUI"
+MODEL_STORE = "/workspace/model_store"
+CONNECTIONS = 8  # koneksi paralel total (semua file)
+CHUNK_MB = 32
+RETRIES = 5
+TIMEOUT = (10, 60)
+MODEL_EXTENSIONS = (".safetensors", ".ckpt", ".pt", ".pth", ".bin", ".gguf", ".sft", ".onnx")
+
+# input key -> folder di models/ (default), bisa di-override per class_type
+INPUT_FOLDERS = {
+    "ckpt_name": "checkpoints",
+    "unet_name": "diffusion_models",
+    "vae_name": "vae",
+    "lora_name": "loras",
+    "clip_name": "text_encoders",
+    "clip_name1": "text_encoders",
+    "clip_name2": "text_encoders",
+    "clip_name3": "text_encoders",
+    "control_net_name": "controlnet",
+}
+CLASS_FOLDERS = {
+    "CLIPVisionLoader": {"clip_name": "clip_vision"},
+    "UpscaleModelLoader": {"model_name": "upscale_models"},
+    "WanVideoModelLoader": {"model": "diffusion_models"},
+    "WanVideoVAELoader": {"model_name": "vae"},
+    "WanVideoLoraSelect": {"lora": "loras"},
+    "LoadWanVideoT5TextEncoder": {"model_name": "text_encoders"},
+    "LoadWanVideoClipTextEncoder": {"model_name": "clip_vision"},
+}
+LORA_LOADER_TITLE = "Power Lora Loader (rgthree)"
+
+
+class RangeNotSupported(IOError):
+    """Server menjawab request Range dengan file utuh (bukan 206): file harus diambil satu stream."""
+
+
+def required_models(workflow):
+    """[(folder, nama file)] yang dibutuhkan workflow (format API), urut sesuai node, tanpa duplikat."""
+    needed = []
+    for node in workflow.values():
+        if not isinstance(node, dict):
+            continue
+        inputs = node.get("inputs", {})
+        folders = dict(INPUT_FOLDERS, **CLASS_FOLDERS.get(node.get("class_type"), {}))
+        for key, value in inputs.items():
+            if key in folders and isinstance(value, str) and value.lower().endswith(MODEL_EXTENSIONS):
+                needed.append((folders[key], value))
+        if node.get("_meta", {}).get("title") == LORA_LOADER_TITLE:
+            for key, lora in inputs.items():
+                if key.startswith("lora_") and isinstance(lora, dict) and lora.get("on") and lora.get("lora"):
+                    needed.append(("loras", lora["lora"]))
+    return list(dict.fromkeys(needed))
+
+
+def load_manifest(source, session=None):
+    """
+    Manifest JSON (path atau URL): {"base_url": opsional, "models": [{"name", "folder", "url",
+    "sha256", "size"}]}. File tanpa entry dicari di <base_url>/<folder>/<name>.
+    """
+    if not source:
+        return {"models": []}
+    if re.match(r"https?://", source):
+        response = (session or requests).get(source, timeout=TIMEOUT)
+        response.raise_for_status()
+        return response.json()
+    with open(source, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def resolve(needed, manifest):
+    """Gabungkan kebutuhan workflow dengan manifest -> list spec {name, folder, url, sha256, size}."""
+    by_name = {(m.get("folder"), m["name"]): m for m in manifest.get("models", [])}
+    by_name.update({(None, m["name"]): m for m in manifest.get("models", [])})
+    base_url = manifest.get("base_url")
+    specs = []
+    for folder, name in needed:
+        entry = by_name.get((folder, name)) or by_name.get((None, name))
+        if entry is not None:
+            specs.append(dict(entry, folder=entry.get("folder") or folder))
+        elif base_url:
+            specs.append({"name": name, "folder": folder, "url": f"{base_url.rstrip('/')}/{folder}/{name}"})
+        else:
+            specs.append({"name": name, "folder": folder, "url": None})
+    return specs
+
+
+class ModelStore:
+    """Store content-addressed: <root>/sha256/<2 huruf>/<hash>; download setengah jadi di <root>/tmp."""
+    def __init__(self, root):
+        self.root = root
+        self.tmp = os.path.join(root, "tmp")
+
+    def blob(self, sha256):
+        return os.path.join(self.root, "sha256", sha256[:2], sha256)
+
+    def has(self, sha256):
+        return bool(sha256) and os.path.exists(self.blob(sha256))
+
+    def add(self, path, sha256):
+        blob = self.blob(sha256)
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        os.replace(path, blob)
+        return blob
+
+    @staticmethod
+    def link(blob, target):
+        """Pasang blob di path model ComfyUI: hardlink (satu filesystem) atau symlink."""
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp = f"{target}.link-{os.getpid()}"
+        try:
+            os.link(blob, tmp)
+        except OSError:
+            os.symlink(blob, tmp)
+        os.replace(tmp, target)
+
+
+class _FileJob:
+    """
+    State satu file: chunk yang sudah selesai + offset chunk yang terputus di tengah
+    (disimpan ke <part>.json) dan hasher berurutan.
+    """
+    def __init__(self, spec, part, size, chunk_size):
+        self.spec = spec
+        self.part = part
+        self.size = size
+        self.chunk_size = chunk_size
+        self.count = max(1, -(-size // chunk_size))
+        self.state_path = part + ".json"
+        self.done = set()
+        self.progress = {}  # index chunk -> offset absolut yang sudah tertulis (chunk belum selesai)
+        self.error = None
+        self.started = time.time()
+        self.cond = threading.Condition()
+        if os.path.exists(self.state_path) and os.path.exists(part):
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("url") == spec["url"] and state.get("size") == size and state.get("chunk") == chunk_size:
+                self.done = set(state.get("done", []))
+                self.progress = {int(i): offset for i, offset in state.get("partial", {}).items()}
+        if not self.done and not self.progress:
+            with open(part, "wb") as f:
+                f.truncate(size)
+        self.resumed = len(self.done) + len(self.progress)
+
+    def span(self, index):
+        start = index * self.chunk_size
+        return start, min(start + self.chunk_size, self.size) - 1
+
+    def save(self):
+        with self.cond:
+            tmp = self.state_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"url": self.spec["url"], "size": self.size, "chunk": self.chunk_size,
+                           "done": sorted(self.done), "partial": dict(self.progress)}, f)
+            os.replace(tmp, self.state_path)
+
+    def mark(self, index):
+        with self.cond:
+            self.done.add(index)
+            self.progress.pop(index, None)
+            self.save()
+            self.cond.notify_all()
+
+    def fail(self, error):
+        with self.cond:
+            self.error = error
+            self.cond.notify_all()
+
+    def hash_in_order(self):
+        """sha256 seluruh file, chunk demi chunk segera setelah chunk itu selesai didownload."""
+        digest = hashlib.sha256()
+        # Tanpa buffer: buffer read-ahead bisa berisi chunk berikutnya yang belum ditulis
+        with open(self.part, "rb", buffering=0) as f:
+            for index in range(self.count):
+                with self.cond:
+                    while index not in self.done and self.error is None:
+                        self.cond.wait()
+                    if self.error is not None:
+                        return None
+                start, end = self.span(index)
+                f.seek(start)
+                remaining = end - start + 1
+                while remaining:
+                    data = f.read(min(remaining, 8 << 20))
+                    if not data:
+                        raise IOError(f"file part terpotong: {self.part}")
+                    digest.update(data)
+                    remaining -= len(data)
+        return digest.hexdigest()
+
+
+class ModelProvisioner:
+    """
+    Download paralel + resume + verifikasi hash ke ModelStore, lalu link ke models/ ComfyUI.
+    ensure(specs) -> dict hasil per (folder, nama file); spec tanpa url hanya dicek keberadaannya.
+    """
+    def __init__(self, comfy_dir=COMFYUI_DIR, store=MODEL_STORE, connections=CONNECTIONS,
+                 chunk_mb=CHUNK_MB, retries=None, token=None, log=print):
+        self.models_dir = os.path.join(comfy_dir, "models")
+        self.store = ModelStore(store)
+        self.connections = max(1, connections)
+        self.chunk_size = max(1, int(chunk_mb * 1024 * 1024))
+        self.retries = RETRIES if retries is None else retries
+        self.token = token if token is not None else os.getenv("HF_TOKEN") or None
+        self.log = log
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.connections)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.bytes_downloaded = 0
+        self._lock = threading.Lock()
+
+    def target(self, spec):
+        return os.path.join(self.models_dir, spec["folder"], spec["name"])
+
+    def _headers(self, url):
+        if self.token and re.match(r"https://([a-zA-Z0-9_-]+\.)?huggingface\.co(/|$|\?)", url):
+            return {"Authorization": f"Bearer {self.token}"}
+        return {}
+
+    def _probe(self, url):
+        """HEAD: (ukuran, sha256 dari server jika ada, mendukung Range?)."""
+        response = self.session.head(url, headers=self._headers(url), allow_redirects=True, timeout=TIMEOUT)
+        response.raise_for_status()
+        # Hugging Face: X-Linked-Etag (sha256 file LFS) / X-Linked-Size ada di response redirect pertama
+        headers = {}
+        for hop in [response] + response.history[::-1]:
+            for key, value in hop.headers.items():
+                headers.setdefault(key.lower(), value)
+        size = int(headers.get("x-linked-size") or response.headers.get("Content-Length") or 0)
+        etag = (headers.get("x-linked-etag") or headers.get("etag") or "").strip('W/"')
+        sha256 = etag.lower() if re.fullmatch(r"[0-9a-fA-F]{64}", etag) else None
+        ranges = headers.get("accept-ranges", "").lower() == "bytes"
+        return size, sha256, ranges
+
+    def ensure(self, specs):
+        """
+        Pastikan semua spec ada di models/. Return {(folder, nama): {"status", "seconds", "bytes"}}
+        (nama file yang sama bisa ada di beberapa folder).
+        """
+        results = {}
+        jobs = []
+        parts = {}  # part -> key spec yang mendownload (file identik di folder lain cukup di-link)
+        duplicates = []
+        t0 = time.time()
+        for spec in specs:
+            name = (spec["folder"], spec["name"])
+            target = self.target(spec)
+            if os.path.exists(target):
+                results[name] = {"status": "ada", "seconds": 0.0, "bytes": 0}
+                continue
+            if not spec.get("url"):
+                results[name] = {"status": "hilang", "seconds": 0.0, "bytes": 0}
+                continue
+            sha256 = (spec.get("sha256") or "").lower() or None
+            size = spec.get("size") or 0
+            ranges = True
+            if not sha256 or not size:
+                try:
+                    size, probed_sha, ranges = self._probe(spec["url"])
+                    sha256 = sha256 or probed_sha
+                except Exception as e:
+                    results[name] = {"status": f"gagal: {e}", "seconds": 0.0, "bytes": 0}
+                    continue
+            if self.store.has(sha256):
+                self.store.link(self.store.blob(sha256), target)
+                results[name] = {"status": "store", "seconds": 0.0, "bytes": 0}
+                continue
+            spec = dict(spec, sha256=sha256, size=size)
+            key = sha256 or hashlib.sha1(spec["url"].encode("utf-8")).hexdigest()
+            os.makedirs(self.store.tmp, exist_ok=True)
+            part = os.path.join(self.store.tmp, key + ".part")
+            if part in parts:
+                duplicates.append((spec, parts[part]))
+                continue
+            parts[part] = name
+            # Tanpa ukuran / Range: satu stream saja (chunk = seluruh file)
+            # File kecil tetap dibagi ke semua koneksi (minimal 1 MB per chunk)
+            chunk_size = min(self.chunk_size, max(1 << 20, -(-size // self.connections)))
+            if not ranges or not size:
+                chunk_size = max(size, 1 << 62)
+            jobs.append(_FileJob(spec, part, size, chunk_size))
+
+        if jobs:
+            self._download(jobs, results)
+        for spec, source in duplicates:
+            result = results[source]
+            if result.get("sha256"):
+                self.store.link(self.store.blob(result["sha256"]), self.target(spec))
+                result = {"status": "store", "seconds": 0.0, "bytes": 0}
+            results[(spec["folder"], spec["name"])] = result
+        total = time.time() - t0
+        mb = self.bytes_downloaded / 1e6
+        if jobs:
+            self.log(f"📦 Model: {len(jobs)} file, {mb:.0f} MB dalam {total:.1f}s ({mb / max(total, 1e-6):.0f} MB/s)")
+        return results
+
+    def _download(self, jobs, results):
+        retry = self._download_round(jobs, results)
+        if retry:
+            # Server mengabaikan Range: ulangi file itu sebagai satu stream, tanpa retry per chunk
+            for job in retry:
+                self.log(f"⚠ {job.spec['name']}: server mengabaikan Range, download ulang sebagai satu stream")
+            self._download_round([_FileJob(job.spec, job.part, job.size, job.size) for job in retry], results)
+
+    def _download_round(self, jobs, results):
+        """Download semua chunk `jobs`; return job yang harus diulang tanpa Range."""
+        retry = []
+        # Job pertama butuh semua file ini: yang terbesar menentukan waktu selesai -> mulai duluan
+        order = sorted(jobs, key=lambda job: -job.size)
+        for job in order:
+            if job.resumed:
+                self.log(f"♻ Lanjutkan {job.spec['name']}: {job.resumed}/{job.count} chunk sudah ada")
+            else:
+                self.log(f"⬇️  {job.spec['name']} ({job.size / 1e6:.0f} MB, {job.count} chunk)")
+        with ThreadPoolExecutor(max_workers=self.connections, thread_name_prefix="model-dl") as pool, \
+                ThreadPoolExecutor(max_workers=len(jobs), thread_name_prefix="model-hash") as hashers:
+            hashes = [hashers.submit(job.hash_in_order) for job in order]
+            # round-robin antar file supaya tiap file langsung mulai (bukan antri di belakang file lain)
+            pending = [[i for i in range(job.count) if i not in job.done] for job in order]
+            futures = []
+            while any(pending):
+                for job, indices in zip(order, pending):
+                    if indices:
+                        futures.append(pool.submit(self._fetch_chunk, job, indices.pop(0)))
+            for future in futures:
+                future.result()
+            for job, hashed in zip(order, hashes):
+                actual = hashed.result()
+                if isinstance(job.error, RangeNotSupported):
+                    retry.append(job)
+                    continue
+                results[(job.spec["folder"], job.spec["name"])] = self._finish(job, actual)
+        return retry
+
+    def _fetch_chunk(self, job, index):
+        if job.error is not None:
+            return
+        start, end = job.span(index)
+        headers = self._headers(job.spec["url"])
+        if job.count > 1 or job.size:
+            headers["Range"] = f"bytes={start}-{end}"
+        # Lanjut dari offset chunk yang terputus (hanya jika ukuran diketahui / Range dipakai)
+        offset = job.progress.get(index, start) if "Range" in headers else start
+        for attempt in range(self.retries + 1):
+            try:
+                if offset > start:
+                    headers["Range"] = f"bytes={offset}-{end}"
+                with self.session.get(job.spec["url"], headers=headers, stream=True, timeout=TIMEOUT,
+                                      allow_redirects=True) as response:
+                    response.raise_for_status()
+                    if "Range" in headers and response.status_code != 206:
+                        if job.count > 1:
+                            # jangan download file utuh per chunk (dan per retry): ulangi sebagai satu stream
+                            raise RangeNotSupported(f"server mengabaikan Range ({response.status_code})")
+                        offset = 0  # server kirim file utuh dari awal
+                    elif "Range" not in headers:
+                        offset = 0
+                    with open(job.part, "r+b") as f:
+                        f.seek(offset)
+                        for data in response.iter_content(1 << 20):
+                            f.write(data)
+                            offset += len(data)
+                            if "Range" in headers:
+                                job.progress[index] = offset
+                            with self._lock:
+                                self.bytes_downloaded += len(data)
+                if not job.size:
+                    job.size = offset  # ukuran baru diketahui setelah stream selesai
+                elif offset != end + 1:
+                    raise IOError(f"chunk {index} terpotong ({offset - start}/{end - start + 1} byte)")
+                job.mark(index)
+                return
+            except RangeNotSupported as e:
+                job.fail(e)
+                return
+            except Exception as e:
+                job.save()
+                if attempt == self.retries:
+                    job.fail(e)
+                    return
+                time.sleep(min(2 ** attempt, 30) * 0.5)
+
+    def _finish(self, job, actual):
+        name = job.spec["name"]
+        seconds = round(time.time() - job.started, 2)
+        if job.error is not None or actual is None:
+            self.log(f"❌ {name}: download gagal ({job.error})")
+            return {"status": f"gagal: {job.error}", "seconds": seconds, "bytes": 0}
+        expected = job.spec.get("sha256")
+        if expected and actual != expected:
+            # Data rusak: mulai dari nol di run berikutnya
+            for path in (job.part, job.state_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self.log(f"❌ {name}: sha256 tidak cocok ({actual[:12]} != {expected[:12]})")
+            return {"status": "hash salah", "seconds": seconds, "bytes": 0}
+        blob = self.store.add(job.part, actual)
+        os.remove(job.state_path)
+        self.store.link(blob, self.target(job.spec))
+        self.log(f"✅ {name} siap dalam {seconds:.1f}s (sha256 {actual[:12]})")
+        return {"status": "download", "seconds": seconds, "bytes": job.size, "sha256": actual}
+
+
+def provision_workflow(workflow, manifest=None, include_all=False, **kwargs):
+    """
+    Download model untuk workflow (dict format API). include_all: sisa isi manifest ikut
+    didownload setelah model workflow. Return (provisioner, specs, results).
+    """
+    provisioner = ModelProvisioner(**kwargs)
+    manifest = manifest if isinstance(manifest, dict) else load_manifest(manifest, provisioner.session)
+    specs = resolve(required_models(workflow or {}), manifest)
+    results = provisioner.ensure(specs)
+    if include_all:
+        names = {(spec["folder"], spec["name"]) for spec in specs}
+        # entry manifest tanpa folder hanya bisa dicocokkan lewat nama file
+        extra = [dict(m) for m in manifest.get("models", [])
+                 if (m.get("folder"), m["name"]) not in names
+                 and (m.get("folder") or m["name"] not in {name for _, name in names})]
+        results.update(provisioner.ensure(extra))
+        specs += extra
+    return provisioner, specs, results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="⬇️  Download model ComfyUI yang dibutuhkan workflow (paralel, resume, sha256).",
+        epilog="""
+💡 CONTOH PENGGUNAAN:
+
+1. Model untuk workflow.json, URL dari manifest:
+   python model_provisioner.py workflow.json --manifest models.json
+
+2. Semua model di manifest (provisioning instance baru):
+   python model_provisioner.py --manifest comfyui_wan_2.1/models.json --all
+""",
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    parser.add_argument("workflow", nargs="?", help="workflow.json (format API)")
+    parser.add_argument("--manifest", help="models.json (path atau URL)")
+    parser.add_argument("--all", action="store_true", help="download juga model manifest yang tidak dipakai workflow")
+    parser.add_argument("--comfy-dir", default=COMFYUI_DIR)
+    parser.add_argument("--store", default=MODEL_STORE, help="store content-addressed")
+    parser.add_argument("--connections", type=int, default=CONNECTIONS)
+    parser.add_argument("--chunk-mb", type=float, default=CHUNK_MB)
+    args = parser.parse_args()
+
+    workflow = {}
+    if args.workflow:
+        with open(args.workflow, "r", encoding="utf-8") as f:
+            workflow = json.load(f)
+    _, specs, results = provision_workflow(
+        workflow, args.manifest, include_all=args.all or not args.workflow,
+        comfy_dir=args.comfy_dir, store=args.store, connections=args.connections, chunk_mb=args.chunk_mb,
+    )
+    failed = [key for key, result in results.items() if result["status"] not in ("ada", "store", "download")]
+    for folder, name in failed:
+        print(f"❌ {folder}/{name}: {results[(folder, name)]['status']}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
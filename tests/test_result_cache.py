@@ -0,0 +1,58 @@
+# File Name : tests/test_result_cache.py
+"""ResultCache hanya menyimpan hasil yang lengkap (semua output di history berhasil didownload)."""
+import contextlib
+import io
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import client  # noqa: E402
+from fake_comfyui import FakeComfyUI  # noqa: E402
+
+WORKFLOW = {"3": {"class_type": "KSampler", "inputs": {"seed": 1}}}
+
+
+def run_once(fake, cache, tmp_path):
+    cg = client.ComfyGenerator(server_address=fake.address, target_folder=str(tmp_path), result_cache=cache)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            return cg.submit_prompt(WORKFLOW).result(timeout=30)
+    finally:
+        cg.close()
+
+
+def test_partial_download_not_cached(tmp_path):
+    cache = client.ResultCache(str(tmp_path / "cache"))
+    with FakeComfyUI(exec_delay=0.01, image_sizes=[(8, 8), (16, 16)], missing_images={1}) as fake:
+        images = run_once(fake, cache, tmp_path)
+    assert len(images[fake.output_node]) == 1
+    assert cache.stats["stored"] == 0
+    assert cache.get(WORKFLOW) is None
+
+
+def test_complete_download_cached(tmp_path):
+    cache = client.ResultCache(str(tmp_path / "cache"))
+    with FakeComfyUI(exec_delay=0.01, image_sizes=[(8, 8), (16, 16)]) as fake:
+        images = run_once(fake, cache, tmp_path)
+        assert cache.stats["stored"] == 1
+        again = run_once(fake, cache, tmp_path)
+        assert fake.stats["prompt"] == 1
+    assert again == images
+
+
+def test_leftover_tmp_dir_not_loaded(tmp_path):
+    folder = tmp_path / "cache"
+    cache = client.ResultCache(str(folder))
+    cache.put(WORKFLOW, {"9": [b"png"]})
+    key = client.ResultCache.key(WORKFLOW)
+    entry_dir = folder / key[:2] / key
+    # crash di antara manifest ditulis dan rename: direktori .tmp- lengkap tertinggal
+    leftover = folder / key[:2] / f"{key}.tmp-deadbeef"
+    os.rename(entry_dir, leftover)
+    reloaded = client.ResultCache(str(folder))
+    assert reloaded.get(WORKFLOW) is None
+    assert len(reloaded._entries) == 0
+    assert not leftover.exists()
@@ -0,0 +1,43 @@
+# File Name : tests/test_zip_folder.py
+"""zip_folder_fast menghasilkan ZIP valid (testzip) lewat jalur cepat maupun fallback zf.write."""
+import os
+import sys
+import zipfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import vast_tools  # noqa: E402
+
+FILES = {
+    "prompt.txt": b"a cat, best quality\n" * 500,
+    "images/0001.png": os.urandom(4096),
+    "images/sub/0002.jpg": os.urandom(1024),
+    "empty.json": b"",
+}
+
+
+def make_folder(root):
+    for name, data in FILES.items():
+        path = os.path.join(root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+
+
+@pytest.mark.parametrize("packed", [True, False])
+def test_round_trip(tmp_path, monkeypatch, packed):
+    if not packed:
+        monkeypatch.setattr(vast_tools, "_can_write_packed", lambda zf: False)
+    folder = tmp_path / "data"
+    make_folder(str(folder))
+    zip_path = str(tmp_path / "data.zip")
+    stats = vast_tools.zip_folder_fast(zip_path, str(folder), workers=2)
+    assert stats["files"] == len(FILES)
+    with zipfile.ZipFile(zip_path) as zf:
+        assert zf.testzip() is None
+        for name, data in FILES.items():
+            assert zf.read(name) == data
+        assert zf.getinfo("prompt.txt").compress_type == zipfile.ZIP_DEFLATED
+        assert zf.getinfo("images/0001.png").compress_type == zipfile.ZIP_STORED
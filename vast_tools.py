@@ -1,24 +1,703 @@
-# Auto-install huggingface_hub jika belum ada
-try:
-    from huggingface_hub import upload_file
-except ImportError:
-    import subprocess
-    import sys
-    print("📦 huggingface_hub belum terinstall. Menginstall terlebih dahulu...")
-    subprocess.check_call([sys.executable, "-m", "pip", "install", "huggingface_hub"])
-    from huggingface_hub import upload_file
-
 import argparse
 import os
 import sys
 import shutil
 import datetime
+import fnmatch
+import hashlib
+import json
+import struct
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import zlib
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+# Format yang sudah terkompresi: deflate hanya membuang CPU -> ZIP_STORED
+STORED_EXTENSIONS = {
+    ".jpg", ".jpeg", ".png", ".webp", ".gif", ".avif", ".heic",
+    ".mp4", ".webm", ".mkv", ".mov", ".mp3", ".ogg", ".flac", ".m4a",
+    ".zip", ".7z", ".gz", ".bz2", ".xz", ".zst",
+    ".safetensors", ".ckpt", ".pt", ".pth", ".gguf",
+}
+ZIP_WORKERS = os.cpu_count() or 1
+ZIP_BIG_FILE = 64 * 1024 * 1024  # file lebih besar di-stream langsung (tidak dibaca ke memori)
+ZIP_WINDOW_BYTES = 384 * 1024 * 1024  # batas ukuran file yang sedang dikompres / menunggu ditulis
+HASH_WORKERS = max(4, os.cpu_count() or 1)  # hashing juga menunggu disk, bukan hanya CPU
+MANIFEST_NAME = "manifest.json"  # di repo: <nama folder>/manifest.json
+SHARD_MB = 1024  # batas ukuran isi per shard (--shard_mb)
+PARALLEL_UPLOADS = 2  # upload shard bersamaan (--parallel_uploads)
+UPLOAD_RETRIES = 3
+HF_ENDPOINT = os.getenv("HF_ENDPOINT", "https://huggingface.co")
+PARALLEL_DOWNLOADS = 4  # archive/shard yang didownload + diekstrak bersamaan
+
+def load_huggingface_hub():
+    """Import huggingface_hub saat dibutuhkan (bukan saat import), install jika belum ada."""
+    try:
+        import huggingface_hub
+    except ImportError:
+        import subprocess
+        print("📦 huggingface_hub belum terinstall. Menginstall terlebih dahulu...")
+        subprocess.check_call([sys.executable, "-m", "pip", "install", "huggingface_hub"])
+        import huggingface_hub
+    return huggingface_hub
+
+def _zip_entries(folder_path):
+    """(path, arcname, is_dir) seluruh isi folder, urut seperti make_archive (os.walk, sorted)."""
+    for root, dirs, files in os.walk(folder_path):
+        dirs.sort()
+        rel = os.path.relpath(root, folder_path)
+        if rel != ".":
+            yield root, rel, True
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            yield path, os.path.normpath(os.path.join(rel, name)), False
+
+
+def _pack_file(path, arcname, level):
+    """Worker: baca file + crc32, deflate jika bukan media. Return (ZipInfo, data siap tulis)."""
+    zinfo = zipfile.ZipInfo.from_file(path, arcname)
+    with open(path, "rb") as f:
+        raw = f.read()
+    zinfo.file_size = len(raw)
+    zinfo.CRC = zlib.crc32(raw)
+    if os.path.splitext(arcname)[1].lower() in STORED_EXTENSIONS:
+        zinfo.compress_type = zipfile.ZIP_STORED
+        data = raw
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        data = compressor.compress(raw) + compressor.flush()
+        zinfo.compress_type = zipfile.ZIP_DEFLATED
+        if len(data) >= len(raw):  # tidak mengecil -> simpan apa adanya
+            zinfo.compress_type = zipfile.ZIP_STORED
+            data = raw
+    zinfo.compress_size = len(data)
+    return zinfo, data
+
+
+def _can_write_packed(zf):
+    """_write_packed memakai internals ZipFile CPython; jika tidak ada -> zf.write biasa."""
+    return all(hasattr(zf, name) for name in ("_writecheck", "_didModify", "start_dir", "fp", "NameToInfo"))
+
+
+def _write_packed(zf, zinfo, data):
+    """Tulis entry yang sudah dikompres worker (zipfile tidak punya API publik untuk ini)."""
+    zinfo.header_offset = zf.start_dir
+    zf._writecheck(zinfo)
+    zf._didModify = True
+    zf.fp.seek(zf.start_dir)
+    zf.fp.write(zinfo.FileHeader())  # zip64 otomatis dari file_size/compress_size
+    zf.fp.write(data)
+    zf.filelist.append(zinfo)
+    zf.NameToInfo[zinfo.filename] = zinfo
+    zf.start_dir = zf.fp.tell()
+
+
+def zip_folder_fast(zip_path, folder_path, workers=None, level=6, entries=None):
+    """
+    ZIP satu pass: media (STORED_EXTENSIONS) disimpan tanpa kompresi, sisanya di-deflate
+    paralel di thread pool (zlib melepas GIL), entry ditulis berurutan begitu siap.
+    entries: list (path, arcname, is_dir) jika hanya sebagian isi folder (default: semua).
+    Return statistik {"files", "bytes", "stored", "seconds", "mb_s"}.
+    """
+    workers = workers or ZIP_WORKERS
+    t0 = time.time()
+    stats = {"files": 0, "bytes": 0, "stored": 0}
+    # future berurutan; dibatasi total byte (bukan jumlah entry) supaya RSS tidak ikut jumlah core
+    window = []
+    in_flight = [0]
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED, allowZip64=True) as zf, \
+            ThreadPoolExecutor(max_workers=workers) as pool:
+        packed = _can_write_packed(zf)
+
+        def drain(limit=None):
+            """Tulis entry siap sampai byte in-flight <= limit (None = semua); file kecil juga dibatasi jumlahnya."""
+            while window and (limit is None or in_flight[0] > limit or len(window) > workers * 64):
+                future, size = window.pop(0)
+                zinfo, data = future.result()
+                in_flight[0] -= size
+                _write_packed(zf, zinfo, data)
+                stats["stored"] += zinfo.compress_type == zipfile.ZIP_STORED
+
+        for path, arcname, is_dir in (_zip_entries(folder_path) if entries is None else entries):
+            if is_dir:
+                drain()
+                zf.write(path, arcname)
+                continue
+            stats["files"] += 1
+            size = os.path.getsize(path)
+            stats["bytes"] += size
+            if size > ZIP_BIG_FILE or not packed:
+                # file besar: stream dari disk tanpa dibaca utuh ke memori
+                drain()
+                media = os.path.splitext(arcname)[1].lower() in STORED_EXTENSIONS
+                zf.write(path, arcname, compress_type=zipfile.ZIP_STORED if media else zipfile.ZIP_DEFLATED)
+                stats["stored"] += media
+                continue
+            # raw + hasil kompres per entry: tunggu dulu jika window penuh
+            drain(max(0, ZIP_WINDOW_BYTES // 2 - size))
+            window.append((pool.submit(_pack_file, path, arcname, level), size))
+            in_flight[0] += size
+        drain()
+    stats["seconds"] = time.time() - t0
+    stats["mb_s"] = stats["bytes"] / 1e6 / max(stats["seconds"], 1e-6)
+    return stats
+
+
+# -------------------------------
+# Upload incremental (manifest)
+# -------------------------------
+class HfTarget:
+    """Repo Hugging Face sebagai target upload; stand-in lokal: benchmarks/fake_upload_target.py."""
+    def __init__(self, repo_id, repo_type="dataset", token=None):
+        self.repo_id = repo_id
+        self.repo_type = repo_type
+        self.token = token
+
+    def upload_file(self, local_path, path_in_repo):
+        return load_huggingface_hub().upload_file(
+            path_or_fileobj=local_path,
+            path_in_repo=path_in_repo,
+            repo_id=self.repo_id,
+            repo_type=self.repo_type,
+            token=self.token
+        )
+
+    def download_file(self, path_in_repo, local_path):
+        """Download ke local_path; return False jika file belum ada di repo."""
+        hub = load_huggingface_hub()
+        from huggingface_hub.utils import EntryNotFoundError
+        try:
+            cached = hub.hf_hub_download(repo_id=self.repo_id, filename=path_in_repo,
+                                         repo_type=self.repo_type, token=self.token)
+        except EntryNotFoundError:
+            return False
+        shutil.copyfile(cached, local_path)
+        return True
+
+
+def hash_file(path, block=1024 * 1024):
+    """sha256 streaming (hashlib melepas GIL untuk blok besar -> paralel di thread pool)."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for data in iter(lambda: f.read(block), b""):
+            digest.update(data)
+    return digest.hexdigest()
+
+
+def scan_changes(folder_path, manifest_files, workers=None):
+    """
+    Bandingkan isi folder dengan manifest {arcname: {"size", "mtime_ns", "sha256"}}.
+    size + mtime sama -> dianggap tidak berubah (tanpa hash); sisanya di-hash paralel.
+    Return (files baru untuk manifest, arcname yang berubah/baru, arcname yang dihapus, byte di-hash).
+    """
+    current = {}
+    candidates = []
+    for path, arcname, is_dir in _zip_entries(folder_path):
+        if is_dir:
+            continue
+        arcname = arcname.replace(os.sep, "/")
+        st = os.stat(path)
+        entry = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+        old = manifest_files.get(arcname)
+        if old and old["size"] == entry["size"] and old["mtime_ns"] == entry["mtime_ns"]:
+            current[arcname] = old
+        else:
+            current[arcname] = entry
+            candidates.append((path, arcname))
 
-def zip_folder(folder_path):
+    hashed_bytes = 0
+    changed = []
+    with ThreadPoolExecutor(max_workers=workers or HASH_WORKERS) as pool:
+        for (path, arcname), digest in zip(candidates, pool.map(lambda c: hash_file(c[0]), candidates)):
+            entry = current[arcname]
+            entry["sha256"] = digest
+            hashed_bytes += entry["size"]
+            old = manifest_files.get(arcname)
+            if old and old.get("sha256") == digest:
+                entry["archive"] = old.get("archive")  # hanya mtime yang berubah (touch/copy)
+            else:
+                changed.append(arcname)
+    deleted = sorted(set(manifest_files) - set(current))
+    return current, changed, deleted, hashed_bytes
+
+
+def upload_incremental(folder_path, target, workers=None):
+    """
+    Upload hanya file baru/berubah sejak upload terakhir: <folder>/delta_<waktu>.zip berisi
+    delta, lalu <folder>/manifest.json (daftar semua file + archive tempat versi terakhirnya).
+    Manifest diupload paling akhir, jadi selalu hanya menunjuk archive yang sudah ada di repo.
+    Return statistik, atau None jika tidak ada perubahan (upload dilewati).
+    """
+    t0 = time.time()
+    prefix = os.path.basename(os.path.normpath(folder_path))
+    manifest_path = f"{prefix}/{MANIFEST_NAME}"
+    with tempfile.TemporaryDirectory(prefix="vast_tools_") as tmp:
+        local_manifest = os.path.join(tmp, MANIFEST_NAME)
+        manifest = {"version": 1, "files": {}, "archives": []}
+        if target.download_file(manifest_path, local_manifest):
+            with open(local_manifest, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+
+        files, changed, deleted, hashed_bytes = scan_changes(folder_path, manifest["files"], workers)
+        hash_seconds = time.time() - t0
+        print(f"🔎 {len(files)} file, {len(changed)} baru/berubah, {len(deleted)} dihapus "
+              f"(hash {hashed_bytes / 1e6:.0f} MB dalam {hash_seconds:.1f}s)")
+        if not changed and not deleted:
+            if files != manifest["files"]:
+                # hanya mtime yang berubah (touch/copy): simpan mtime baru supaya run berikutnya tidak hash ulang
+                manifest["files"] = files
+                with open(local_manifest, "w", encoding="utf-8") as f:
+                    json.dump(manifest, f, indent=1, sort_keys=True)
+                target.upload_file(local_manifest, manifest_path)
+                print("✅ Isi tidak berubah, hanya manifest (mtime) yang diperbarui.")
+            else:
+                print("✅ Tidak ada perubahan sejak upload terakhir, upload dilewati.")
+            return None
+
+        stats = {"files": len(files), "changed": len(changed), "deleted": len(deleted),
+                 "hashed_bytes": hashed_bytes, "uploaded_bytes": 0}
+        if changed:
+            now = datetime.datetime.now().strftime("%Y_%m_%d_%H_%M_%S")
+            archive = f"delta_{now}.zip"
+            existing = {a["name"] for a in manifest["archives"]}
+            n = 1
+            while archive in existing:  # dua run dalam detik yang sama
+                n += 1
+                archive = f"delta_{now}_{n}.zip"
+            zip_path = os.path.join(tmp, archive)
+            entries = [(os.path.join(folder_path, *name.split("/")), name, False) for name in changed]
+            zip_folder_fast(zip_path, folder_path, entries=entries)
+            stats["uploaded_bytes"] += os.path.getsize(zip_path)
+            print(f"⬆️  Mengupload delta {archive} ({len(changed)} file, {os.path.getsize(zip_path) / 1e6:.1f} MB)...")
+            target.upload_file(zip_path, f"{prefix}/{archive}")
+            for name in changed:
+                files[name]["archive"] = archive
+            manifest["archives"].append({"name": archive, "files": len(changed), "created": now})
+
+        manifest["files"] = files
+        with open(local_manifest, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        stats["uploaded_bytes"] += os.path.getsize(local_manifest)
+        target.upload_file(local_manifest, manifest_path)
+    stats["seconds"] = time.time() - t0
+    print(f"✅ Upload incremental selesai dalam {stats['seconds']:.1f}s "
+          f"({stats['uploaded_bytes'] / 1e6:.1f} MB diupload)")
+    return stats
+
+
+# -------------------------------
+# Upload sharded (resumable)
+# -------------------------------
+def plan_shards(folder_path, shard_bytes):
+    """Bagi isi folder (urut os.walk) jadi list shard [(path, arcname, is_dir)] dengan isi <= shard_bytes."""
+    shards, current, size = [], [], 0
+    for path, arcname, is_dir in _zip_entries(folder_path):
+        file_size = 0 if is_dir else os.path.getsize(path)
+        if current and size + file_size > shard_bytes:
+            shards.append(current)
+            current, size = [], 0
+        current.append((path, arcname, is_dir))
+        size += file_size
+    if current:
+        shards.append(current)
+    return shards
+
+
+def _plan_fingerprint(folder_path, shards):
+    """Hash isi rencana shard (nama, ukuran, mtime): state lama hanya dipakai jika folder sama."""
+    digest = hashlib.sha256()
+    for index, shard in enumerate(shards):
+        for path, arcname, is_dir in shard:
+            st = os.stat(path)
+            digest.update(f"{index}\0{arcname}\0{0 if is_dir else st.st_size}\0{st.st_mtime_ns}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ShardState:
+    """State lokal upload sharded (JSON, ditulis atomic): nama upload + shard yang sudah terkirim."""
+    def __init__(self, path, fingerprint, name, count):
+        self.path = path
+        self.lock = threading.Lock()
+        self.data = {"fingerprint": fingerprint, "name": name, "shards": count, "done": []}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                old = json.load(f)
+            if old.get("fingerprint") == fingerprint and old.get("shards") == count:
+                self.data = old
+
+    @property
+    def name(self):
+        return self.data["name"]
+
+    def done(self):
+        return set(self.data["done"])
+
+    def mark(self, index):
+        with self.lock:
+            self.data["done"] = sorted(set(self.data["done"]) | {index})
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.data, f)
+            os.replace(tmp, self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def upload_sharded(folder_path, target, shard_mb=None, parallel_uploads=None, state_path=None):
+    """
+    Upload folder sebagai <nama>_<waktu>/part_NNNNN.zip: shard k diupload selagi shard k+1
+    dibuat, maksimal `parallel_uploads` upload bersamaan, dan paling banyak parallel_uploads + 1
+    shard ada di disk sementara. Shard yang sudah terkirim dicatat di state_path, jadi run ulang
+    melanjutkan dari shard yang belum. <nama>/shards.json diupload paling akhir.
+    Return statistik, atau None jika ada shard yang gagal (jalankan ulang untuk melanjutkan).
+    """
+    t0 = time.time()
+    shard_bytes = int((shard_mb or SHARD_MB) * 1024 * 1024)
+    parallel_uploads = max(1, parallel_uploads or PARALLEL_UPLOADS)
+    folder_path = os.path.abspath(folder_path)
+    prefix = os.path.basename(os.path.normpath(folder_path))
+    state_path = state_path or os.path.join(os.path.dirname(folder_path), f".{prefix}.shards.json")
+
+    shards = plan_shards(folder_path, shard_bytes)
+    now = datetime.datetime.now().strftime("%Y_%m_%d_%H_%M_%S")
+    state = ShardState(state_path, _plan_fingerprint(folder_path, shards), f"{prefix}_{now}", len(shards))
+    done = state.done()
+    if done:
+        print(f"♻ Melanjutkan {state.name}: {len(done)}/{len(shards)} shard sudah terupload")
+    else:
+        print(f"📦 {len(shards)} shard (maks {shard_bytes / 1e6:.0f} MB) -> {state.name}/")
+
+    stats = {"shards": len(shards), "uploaded": 0, "skipped": len(done), "uploaded_bytes": 0, "peak_tmp_bytes": 0}
+    slots = threading.Semaphore(parallel_uploads + 1)  # shard di disk: sedang diupload + sedang dibuat
+    errors = []
+    tmp_bytes = [0]
+    stats_lock = threading.Lock()
+
+    def send(index, zip_path):
+        size = os.path.getsize(zip_path)
+        try:
+            for attempt in range(UPLOAD_RETRIES + 1):
+                try:
+                    target.upload_file(zip_path, f"{state.name}/part_{index:05d}.zip")
+                    break
+                except Exception as e:
+                    if attempt == UPLOAD_RETRIES:
+                        raise
+                    print(f"⚠️ Upload shard {index} gagal ({e}), coba lagi...")
+                    time.sleep(2 ** attempt)
+            state.mark(index)
+            with stats_lock:
+                stats["uploaded"] += 1
+                stats["uploaded_bytes"] += size
+            print(f"⬆️  Shard {index + 1}/{len(shards)} terupload ({size / 1e6:.0f} MB)")
+        except Exception as e:
+            errors.append((index, e))
+            print(f"❌ Upload shard {index} gagal: {e}")
+        finally:
+            os.remove(zip_path)
+            with stats_lock:
+                tmp_bytes[0] -= size
+            slots.release()
+
+    with tempfile.TemporaryDirectory(prefix="vast_tools_shards_") as tmp, \
+            ThreadPoolExecutor(max_workers=parallel_uploads) as pool:
+        for index, entries in enumerate(shards):
+            if index in done:
+                continue
+            slots.acquire()
+            if errors:  # shard gagal: berhenti membuat shard baru, run ulang melanjutkan
+                slots.release()
+                break
+            zip_path = os.path.join(tmp, f"part_{index:05d}.zip")
+            zip_folder_fast(zip_path, folder_path, entries=entries)
+            with stats_lock:
+                tmp_bytes[0] += os.path.getsize(zip_path)
+                stats["peak_tmp_bytes"] = max(stats["peak_tmp_bytes"], tmp_bytes[0])
+            pool.submit(send, index, zip_path)
+
+    stats["seconds"] = time.time() - t0
+    if errors or len(state.done()) < len(shards):
+        print(f"❌ {len(shards) - len(state.done())} shard belum terupload; jalankan ulang untuk melanjutkan "
+              f"(state: {state_path})")
+        return None
+
+    with tempfile.TemporaryDirectory(prefix="vast_tools_") as tmp:
+        index_path = os.path.join(tmp, "shards.json")
+        with open(index_path, "w", encoding="utf-8") as f:
+            # members: isi tiap shard, supaya download dengan --include bisa melewati shard yang tidak perlu
+            json.dump({"name": state.name, "parts": [f"part_{i:05d}.zip" for i in range(len(shards))],
+                       "members": [[arcname.replace(os.sep, "/") for _, arcname, is_dir in shard if not is_dir]
+                                   for shard in shards]}, f, indent=1)
+        target.upload_file(index_path, f"{state.name}/shards.json")
+    state.remove()
+    stats["seconds"] = time.time() - t0
+    print(f"✅ Upload sharded selesai: {stats['uploaded']} shard diupload, {stats['skipped']} dilewati, "
+          f"{stats['uploaded_bytes'] / 1e6:.0f} MB dalam {stats['seconds']:.1f}s "
+          f"({stats['uploaded_bytes'] / 1e6 / max(stats['seconds'], 1e-6):.0f} MB/s)")
+    return stats
+
+
+# -------------------------------
+# Download + extract streaming
+# -------------------------------
+class RepoSource:
+    """Baca file repo HF lewat URL resolve/ (HF_ENDPOINT bisa diarahkan ke stand-in lokal)."""
+    def __init__(self, repo_id, repo_type="dataset", token=None, endpoint=None, revision="main"):
+        self.repo_id = repo_id
+        self.repo_type = repo_type
+        self.token = token or os.getenv("HF_TOKEN") or None
+        self.endpoint = (endpoint or HF_ENDPOINT).rstrip("/")
+        self.revision = revision
+
+    def url(self, path_in_repo):
+        kind = {"dataset": "datasets/", "space": "spaces/"}.get(self.repo_type, "")
+        return f"{self.endpoint}/{kind}{self.repo_id}/resolve/{self.revision}/{urllib.parse.quote(path_in_repo)}"
+
+    def open(self, path_in_repo):
+        headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
+        return urllib.request.urlopen(urllib.request.Request(self.url(path_in_repo), headers=headers), timeout=60)
+
+    def read_json(self, path_in_repo):
+        """Isi JSON, atau None jika file tidak ada di repo."""
+        try:
+            with self.open(path_in_repo) as response:
+                return json.load(response)
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                return None
+            raise
+
+
+class _ByteStream:
+    """Pembungkus response HTTP: read_exact + unread (sisa data setelah akhir stream deflate)."""
+    def __init__(self, fp):
+        self.fp = fp
+        self.pending = b""
+        self.count = 0
+
+    def read(self, n):
+        if self.pending:
+            data, self.pending = self.pending[:n], self.pending[n:]
+            return data
+        data = self.fp.read(n)
+        self.count += len(data)
+        return data
+
+    def read_exact(self, n):
+        parts = []
+        while n:
+            data = self.read(min(n, 1 << 20))
+            if not data:
+                raise EOFError("archive terpotong")
+            parts.append(data)
+            n -= len(data)
+        return b"".join(parts)
+
+    def unread(self, data):
+        self.pending = data + self.pending
+
+
+def _safe_path(dest, name):
+    """Path tujuan member ZIP; tolak path absolut / '..' (zip slip)."""
+    path = os.path.normpath(os.path.join(dest, *name.split("/")))
+    if os.path.isabs(name) or not path.startswith(os.path.normpath(dest) + os.sep):
+        raise ValueError(f"path member tidak aman: {name}")
+    return path
+
+
+def extract_zip_stream(fp, dest, wanted=lambda name: True):
+    """
+    Ekstrak ZIP dari stream (tanpa seek): baca local header satu per satu dan tulis member
+    selagi byte-nya datang. Member yang tidak `wanted(name)` dibaca lalu dibuang.
+    Return {"files", "bytes" (hasil ekstrak), "read" (byte archive)}.
+    """
+    stream = _ByteStream(fp)
+    stats = {"files": 0, "bytes": 0}
+    while True:
+        signature = stream.read_exact(4)
+        if signature != b"PK\x03\x04":
+            break  # central directory: semua member sudah lewat
+        (_, flags, method, _, _, crc, csize, usize, name_len, extra_len) = struct.unpack(
+            "<HHHHHIIIHH", stream.read_exact(26))
+        name = stream.read_exact(name_len).decode("utf-8" if flags & 0x800 else "cp437")
+        extra = stream.read_exact(extra_len)
+        if 0xFFFFFFFF in (csize, usize):
+            # zip64 extra (id 1): usize lalu csize, hanya yang bernilai 0xFFFFFFFF di header
+            pos = 0
+            while pos + 4 <= len(extra):
+                tag, size = struct.unpack("<HH", extra[pos:pos + 4])
+                if tag == 1:
+                    values = list(struct.unpack(f"<{size // 8}Q", extra[pos + 4:pos + 4 + size // 8 * 8]))
+                    if usize == 0xFFFFFFFF:
+                        usize = values.pop(0)
+                    if csize == 0xFFFFFFFF:
+                        csize = values.pop(0)
+                    break
+                pos += 4 + size
+        descriptor = bool(flags & 0x08)
+        if method not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED) or (descriptor and method == zipfile.ZIP_STORED):
+            raise ValueError(f"member {name} tidak bisa diekstrak streaming (method {method}, flags {flags:#x})")
+
+        keep = wanted(name)
+        path = _safe_path(dest, name) if keep else None
+        if name.endswith("/"):
+            if keep:
+                os.makedirs(path, exist_ok=True)
+            stream.read_exact(csize)
+            continue
+        out = None
+        if keep:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            out = open(path + ".part", "wb")
+        actual_crc = 0
+        try:
+            decompressor = zlib.decompressobj(-15) if method == zipfile.ZIP_DEFLATED else None
+            remaining = csize
+            while (remaining > 0) if not descriptor else not decompressor.eof:
+                data = stream.read(min(remaining, 1 << 20) if not descriptor else 1 << 16)
+                if not data:
+                    raise EOFError(f"archive terpotong di {name}")
+                remaining -= len(data)
+                if decompressor is not None:
+                    data = decompressor.decompress(data)
+                    if descriptor and decompressor.unused_data:
+                        stream.unread(decompressor.unused_data)
+                if out is not None:
+                    out.write(data)
+                    actual_crc = zlib.crc32(data, actual_crc)
+                    stats["bytes"] += len(data)
+            tail = decompressor.flush() if decompressor is not None else b""
+            if out is not None and tail:
+                out.write(tail)
+                actual_crc = zlib.crc32(tail, actual_crc)
+                stats["bytes"] += len(tail)
+            if descriptor:
+                header = stream.read_exact(4)
+                if header == b"PK\x07\x08":
+                    header = stream.read_exact(4)
+                crc = struct.unpack("<I", header)[0]
+                stream.read_exact(16 if usize == 0xFFFFFFFF else 8)
+        finally:
+            if out is not None:
+                out.close()
+        if keep:
+            if actual_crc != crc:
+                os.remove(path + ".part")
+                raise ValueError(f"CRC tidak cocok: {name}")
+            os.replace(path + ".part", path)
+            stats["files"] += 1
+    stats["read"] = stream.count
+    return stats
+
+
+def download_and_extract(source, path_in_repo, dest, include=None, parallel=None):
+    """
+    Download archive dari repo dan ekstrak selagi diterima (tanpa ZIP utuh di disk).
+    path_in_repo: file .zip, folder upload sharded (<name>/shards.json, shard diambil paralel),
+    atau folder upload incremental (<folder>/manifest.json, tiap file dari delta terakhirnya).
+    include: list pola glob (fnmatch) nama member; None = semua.
+    """
+    t0 = time.time()
+    patterns = list(include or [])
+
+    def matches(name):
+        return not patterns or any(fnmatch.fnmatch(name, p) for p in patterns)
+
+    # (path archive di repo, set member yang diambil atau None = semua yang cocok)
+    archives = []
+    path_in_repo = path_in_repo.strip("/")
+    if path_in_repo.endswith(".zip"):
+        archives.append((path_in_repo, None))
+    else:
+        index = source.read_json(f"{path_in_repo}/shards.json")
+        manifest = None if index is not None else source.read_json(f"{path_in_repo}/{MANIFEST_NAME}")
+        if index is not None:
+            members = index.get("members") or [None] * len(index["parts"])
+            for part, names in zip(index["parts"], members):
+                if names is not None and not any(matches(name) for name in names):
+                    continue  # shard tanpa file yang dibutuhkan
+                archives.append((f"{path_in_repo}/{part}", None))
+        elif manifest is not None:
+            by_archive = {}
+            for name, entry in manifest["files"].items():
+                if matches(name):
+                    by_archive.setdefault(entry["archive"], set()).add(name)
+            archives = [(f"{path_in_repo}/{archive}", names) for archive, names in sorted(by_archive.items())]
+        else:
+            raise FileNotFoundError(f"{path_in_repo}: bukan .zip, shards.json, atau {MANIFEST_NAME}")
+
+    print(f"⬇️  {len(archives)} archive dari {source.repo_id}/{path_in_repo} -> {dest}")
+    os.makedirs(dest, exist_ok=True)
+
+    def fetch(item):
+        archive, names = item
+        wanted = (lambda name: name in names) if names is not None else matches
+        with source.open(archive) as response:
+            return extract_zip_stream(response, dest, wanted)
+
+    totals = {"archives": len(archives), "files": 0, "bytes": 0, "read": 0}
+    with ThreadPoolExecutor(max_workers=max(1, parallel or PARALLEL_DOWNLOADS)) as pool:
+        for result in pool.map(fetch, archives):
+            for key in ("files", "bytes", "read"):
+                totals[key] += result[key]
+    totals["seconds"] = time.time() - t0
+    totals["mb_s"] = totals["read"] / 1e6 / max(totals["seconds"], 1e-6)
+    print(f"✅ {totals['files']} file diekstrak ({totals['bytes'] / 1e6:.0f} MB) dari "
+          f"{totals['read'] / 1e6:.0f} MB download dalam {totals['seconds']:.1f}s ({totals['mb_s']:.0f} MB/s)")
+    return totals
+
+
+def download_main(argv):
+    parser = argparse.ArgumentParser(
+        prog="vast_tools.py download",
+        description="⬇️  Download archive dari repo Hugging Face dan ekstrak selagi diterima.",
+        epilog="""
+💡 CONTOH PENGGUNAAN:
+
+1. Folder hasil upload sharded / incremental, semua file:
+   python vast_tools.py download --repo_id=username/repo --path=dataset_2025_01_01_00_00_00 --dest=/workspace/data
+
+2. Hanya LoRA yang dibutuhkan workflow:
+   python vast_tools.py download --repo_id=username/repo --path=lora_pack --dest=/workspace/ComfyUI/models/loras --include="char_a*.safetensors" --include="style_*.safetensors"
+""",
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("--repo_id", required=True, help="ID repositori HF (misal: PapaRazi/id-tts-v2)")
+    parser.add_argument("--repo_type", default="dataset", choices=["dataset", "model"],
+                        help="Jenis repositori: 'dataset' atau 'model' (default: dataset)")
+    parser.add_argument("--token", help="Token HF (default: env HF_TOKEN)")
+    parser.add_argument("--path", required=True, help="File .zip atau folder upload sharded/incremental di repo")
+    parser.add_argument("--dest", required=True, help="Folder tujuan ekstrak")
+    parser.add_argument("--include", action="append", help="Pola glob nama file yang diekstrak (boleh berulang)")
+    parser.add_argument("--parallel_downloads", type=int, default=PARALLEL_DOWNLOADS,
+                        help="Jumlah archive yang didownload bersamaan (default: 4)")
+    args = parser.parse_args(argv)
+    try:
+        download_and_extract(RepoSource(args.repo_id, args.repo_type, args.token), args.path, args.dest,
+                             include=args.include, parallel=args.parallel_downloads)
+    except Exception as e:
+        print(f"❌ Download gagal: {e}")
+        sys.exit(1)
+
+
+def zip_folder(folder_path, mode="fast"):
+    """mode "fast" = zip_folder_fast (paralel, media STORED), "legacy" = shutil.make_archive."""
     now = datetime.datetime.now().strftime("%Y_%m_%d_%H_%M_%S")
     folder_name = os.path.basename(os.path.normpath(folder_path))
     zip_filename = f"{folder_name}_{now}"
-    zip_path = shutil.make_archive(base_name=zip_filename, format="zip", root_dir=folder_path)
+    if mode == "legacy":
+        return shutil.make_archive(base_name=zip_filename, format="zip", root_dir=folder_path)
+    zip_path = os.path.abspath(zip_filename + ".zip")
+    stats = zip_folder_fast(zip_path, folder_path)
+    print(f"🗜️  {stats['files']} file, {stats['bytes'] / 1e6:.0f} MB dalam {stats['seconds']:.1f}s "
+          f"({stats['mb_s']:.0f} MB/s, {stats['stored']} file media tanpa kompresi)")
     return zip_path
 
 def main():
@@ -40,6 +719,11 @@ Gunakan salah satu dari:
 --auto_del_path   🧨 Jika 'yes', folder sumber akan dihapus setelah upload (default: no).
 --repo_id         📂 ID repositori tujuan di Hugging Face (misal: PapaRazi/id-tts-v2).
 --repo_type       🏷️  Jenis repo: dataset atau model (default: dataset).
+--zip_mode        🗜️  fast (paralel, media tanpa kompresi) atau legacy (shutil.make_archive), default: fast.
+--incremental     🔁 Jika 'yes', --path2zip hanya mengupload file baru/berubah + manifest (default: no).
+--sharded         🧩 Jika 'yes', --path2zip diupload per shard ZIP (paralel, bisa dilanjutkan) (default: no).
+--shard_mb        📏 Ukuran isi maksimal per shard dalam MB (default: 1024).
+--parallel_uploads ⏫ Jumlah shard yang diupload bersamaan (default: 2).
 
 💡 CONTOH PENGGUNAAN:
 
@@ -49,8 +733,20 @@ Gunakan salah satu dari:
 2. Upload folder, auto-zip:
    python upload.py --token=hf_abc123 --path2zip=/data/folder --repo_id=username/repo --repo_type=dataset
 
-3. Upload folder dan hapus sumber:
+3. Upload folder secara incremental (hanya file baru/berubah sejak upload terakhir):
+   python upload.py --token=hf_abc123 --path2zip=/data/folder --repo_id=username/repo --incremental=yes
+
+4. Upload folder besar per shard 512 MB, 3 upload bersamaan (run ulang = lanjut):
+   python upload.py --token=hf_abc123 --path2zip=/data/folder --repo_id=username/repo --sharded=yes --shard_mb=512 --parallel_uploads=3
+
+5. Upload folder dan hapus sumber:
    python upload.py --token=hf_abc123 --path2zip=/data/folder --repo_id=username/repo --repo_type=dataset --auto_del_path=yes
+
+6. Download + ekstrak streaming (lihat: python upload.py download --help):
+   python upload.py download --repo_id=username/repo --path=folder --dest=/workspace/data
+
+7. Cek/install dependency saja (saat provisioning):
+   python upload.py preflight
 """,
         formatter_class=argparse.RawTextHelpFormatter
     )
@@ -63,6 +759,15 @@ Gunakan salah satu dari:
     parser.add_argument("--repo_id", required=True, help="ID repositori HF (misal: PapaRazi/id-tts-v2)")
     parser.add_argument("--repo_type", default="dataset", choices=["dataset", "model"],
                         help="Jenis repositori: 'dataset' atau 'model' (default: dataset)")
+    parser.add_argument("--zip_mode", default="fast", choices=["fast", "legacy"],
+                        help="Cara membuat ZIP untuk --path2zip (default: fast)")
+    parser.add_argument("--incremental", choices=["yes", "no"], default="no",
+                        help="Jika 'yes', --path2zip hanya mengupload delta + manifest (default: no)")
+    parser.add_argument("--sharded", choices=["yes", "no"], default="no",
+                        help="Jika 'yes', --path2zip diupload per shard ZIP dan bisa dilanjutkan (default: no)")
+    parser.add_argument("--shard_mb", type=float, default=SHARD_MB, help="Ukuran maksimal per shard (MB)")
+    parser.add_argument("--parallel_uploads", type=int, default=PARALLEL_UPLOADS,
+                        help="Jumlah shard yang diupload bersamaan (default: 2)")
 
     args = parser.parse_args()
 
@@ -78,8 +783,25 @@ Gunakan salah satu dari:
         if not os.path.isdir(args.path2zip):
             print(f"❌ Folder tidak ditemukan: {args.path2zip}")
             sys.exit(1)
+        if args.incremental == "yes" or args.sharded == "yes":
+            target = HfTarget(args.repo_id, args.repo_type, args.token)
+            try:
+                if args.incremental == "yes":
+                    upload_incremental(args.path2zip, target)
+                elif upload_sharded(args.path2zip, target, args.shard_mb, args.parallel_uploads) is None:
+                    sys.exit(1)
+            except Exception as e:
+                print(f"❌ Upload gagal: {e}")
+                sys.exit(1)
+            if args.auto_del_path == "yes":
+                try:
+                    shutil.rmtree(args.path2zip)
+                    print(f"🧨 Folder sumber dihapus: {args.path2zip}")
+                except Exception as e:
+                    print(f"⚠️ Gagal menghapus folder sumber: {e}")
+            return
         print(f"🗜️  Membuat ZIP dari folder: {args.path2zip}")
-        args.file = zip_folder(args.path2zip)
+        args.file = zip_folder(args.path2zip, mode=args.zip_mode)
         cleanup_zip = True
         if args.auto_del_path == "yes":
             cleanup_folder = True
@@ -90,7 +812,7 @@ Gunakan salah satu dari:
 
     try:
         print(f"⬆️  Mengupload {args.file} ke repo {args.repo_id} ({args.repo_type})...")
-        url = upload_file(
+        url = load_huggingface_hub().upload_file(
             path_or_fileobj=args.file,
             path_in_repo=os.path.basename(args.file),
             repo_id=args.repo_id,
@@ -119,5 +841,9 @@ if __name__ == "__main__":
     if len(sys.argv) == 1:
         print("⚠️  Tidak ada argumen diberikan.\n")
         os.system(f"python {sys.argv[0]} --help")
+    elif sys.argv[1] == "preflight":
+        print(f"✅ Preflight OK: huggingface_hub {load_huggingface_hub().__version__}")
+    elif sys.argv[1] == "download":
+        download_main(sys.argv[2:])
     else:
         main()